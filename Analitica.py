@@ -0,0 +1,165 @@
+from collections import namedtuple
+
+import numpy as np
+
+from Conexion import conexion
+from Funciones import cacheado
+
+DIAS_SEMANA = ("Lunes", "Martes", "Miércoles", "Jueves", "Viernes", "Sábado", "Domingo")
+
+# Percentiles del monto que se informan por defecto
+PERCENTILES = (25, 50, 75, 90)
+
+# Movimientos de un tipo en forma de columnas, ordenados por fecha. dia es el
+# número de día desde 1970-01-01 y mes el número de mes desde 1970-01;
+# centavos es el monto en centavos enteros; categoria y usuario son índices
+# en las listas categorias y usuarios. Las sumas se hacen en centavos y se
+# pasan a pesos al devolverlas; np.bincount acumula en float64, que es exacto
+# para enteros menores que 2**53.
+Columnas = namedtuple("Columnas", "dia mes centavos categoria usuario categorias usuarios")
+
+def fecha_a_dia(fecha):
+    """Convierte una fecha YYYY-MM-DD en número de día desde 1970-01-01"""
+    return int(np.datetime64(fecha, "D").astype(np.int64))
+
+def dia_a_fecha(dia):
+    """Convierte un número de día en fecha YYYY-MM-DD"""
+    return str(np.datetime64(int(dia), "D"))
+
+def mes_a_texto(mes):
+    """Convierte un número de mes desde 1970-01 en YYYY-MM"""
+    return str(np.datetime64(int(mes), "M"))
+
+def _codificar(valores):
+    """Devuelve (nombres ordenados, códigos) con un código entero por valor distinto"""
+    vistos = {}
+    codigos = np.fromiter((vistos.setdefault(v, len(vistos)) for v in valores),
+                          dtype=np.int32, count=len(valores))
+    nombres = sorted(vistos)
+    # Renumera los códigos según el orden alfabético de los nombres
+    orden = np.empty(len(nombres), dtype=np.int32)
+    for nuevo, nombre in enumerate(nombres):
+        orden[vistos[nombre]] = nuevo
+    return nombres, orden[codigos]
+
+@cacheado(lambda tipo="gastos": tipo)
+def cargar_columnas(tipo="gastos"):
+    """Carga fecha, centavos, categoría y usuario de ingresos o gastos en arreglos NumPy
+
+    Se lee todo en una sola consulta; el resultado queda en la caché de
+    Funciones, que se invalida con cada escritura.
+    """
+    categoria = "categoria" if tipo == "gastos" else "''"
+    with conexion() as conn:
+        filas = conn.execute(f"""
+            SELECT dia, centavos, {categoria}, COALESCE(usuario, '')
+            FROM {tipo}
+            WHERE dia IS NOT NULL
+        """).fetchall()
+
+    if filas:
+        dias, montos, categorias, usuarios = zip(*filas)
+    else:
+        dias, montos, categorias, usuarios = (), (), (), ()
+    dia = np.fromiter(dias, dtype=np.int32, count=len(filas))
+    mes = dia.astype("datetime64[D]").astype("datetime64[M]").astype(np.int32)
+    centavos = np.fromiter(montos, dtype=np.int64, count=len(filas))
+    nombres_categoria, categoria = _codificar(categorias)
+    nombres_usuario, usuario = _codificar(usuarios)
+    # Ordenar aquí es más rápido que un ORDER BY que recorre el índice de fechas
+    orden = np.argsort(dia, kind="stable")
+    dia, mes, centavos, categoria, usuario = (a[orden] for a in (dia, mes, centavos, categoria, usuario))
+    # Los arreglos se comparten entre llamadas: se protegen contra escritura
+    for arreglo in (dia, mes, centavos, categoria, usuario):
+        arreglo.flags.writeable = False
+    return Columnas(dia, mes, centavos, categoria, usuario, nombres_categoria, nombres_usuario)
+
+def rango(columnas, inicio, fin):
+    """Devuelve el slice de los movimientos entre dos fechas YYYY-MM-DD, inclusive"""
+    desde = np.searchsorted(columnas.dia, fecha_a_dia(inicio), side="left")
+    hasta = np.searchsorted(columnas.dia, fecha_a_dia(fin), side="right")
+    return slice(desde, hasta)
+
+def pivote_categoria_mes(columnas, inicio, fin):
+    """Suma los montos por categoría y mes; devuelve (categorias, meses, matriz)
+
+    La matriz tiene una fila por categoría con movimientos en el rango y una
+    columna por mes, incluidos los meses sin movimientos.
+    """
+    s = rango(columnas, inicio, fin)
+    mes = columnas.mes[s]
+    if not len(mes):
+        return [], [], np.zeros((0, 0))
+    primero = int(mes[0])
+    n_meses = int(mes[-1]) - primero + 1
+    n_categorias = len(columnas.categorias)
+    indice = columnas.categoria[s].astype(np.int64) * n_meses + (mes - primero)
+    matriz = np.bincount(indice, weights=columnas.centavos[s],
+                         minlength=n_categorias * n_meses).reshape(n_categorias, n_meses)
+    presentes = np.bincount(columnas.categoria[s], minlength=n_categorias) > 0
+    categorias = [c for c, presente in zip(columnas.categorias, presentes) if presente]
+    meses = [mes_a_texto(m) for m in range(primero, primero + n_meses)]
+    return categorias, meses, matriz[presentes] / 100
+
+def _centavos_diarios(columnas, inicio, fin):
+    """Devuelve los centavos de cada día entre inicio y fin como enteros"""
+    d0, d1 = fecha_a_dia(inicio), fecha_a_dia(fin)
+    s = rango(columnas, inicio, fin)
+    return np.bincount(columnas.dia[s] - d0, weights=columnas.centavos[s],
+                       minlength=d1 - d0 + 1).astype(np.int64)
+
+def gasto_diario(columnas, inicio, fin):
+    """Devuelve el total de cada día entre inicio y fin, incluidos los días sin movimientos"""
+    return _centavos_diarios(columnas, inicio, fin) / 100
+
+def gasto_movil(columnas, inicio, fin, ventana=30):
+    """Suma móvil de los últimos 'ventana' días para cada día entre inicio y fin"""
+    # Se incluyen los días previos a inicio para que la primera ventana esté completa
+    previo = dia_a_fecha(fecha_a_dia(inicio) - ventana + 1)
+    acumulado = np.concatenate(([0], np.cumsum(_centavos_diarios(columnas, previo, fin))))
+    return (acumulado[ventana:] - acumulado[:-ventana]) / 100
+
+def percentiles(columnas, inicio, fin, q=PERCENTILES):
+    """Devuelve {percentil: monto} de los movimientos del rango"""
+    centavos = columnas.centavos[rango(columnas, inicio, fin)]
+    if not len(centavos):
+        return {p: 0.0 for p in q}
+    return dict(zip(q, (np.percentile(centavos, q) / 100).tolist()))
+
+def promedio_por_dia_semana(columnas, inicio, fin):
+    """Promedio diario por día de la semana (lunes primero) en el rango"""
+    d0, d1 = fecha_a_dia(inicio), fecha_a_dia(fin)
+    s = rango(columnas, inicio, fin)
+    # 1970-01-01 fue jueves: (dia + 3) % 7 da 0 para el lunes
+    totales = np.bincount((columnas.dia[s] + 3) % 7, weights=columnas.centavos[s], minlength=7)
+    dias = np.bincount((np.arange(d0, d1 + 1) + 3) % 7, minlength=7)
+    return np.divide(totales, dias * 100, out=np.zeros(7), where=dias > 0)
+
+def estadisticas_periodo(inicio, fin, tipo="gastos"):
+    """Calcula las estadísticas de la pestaña de reportes para un rango de fechas"""
+    columnas = cargar_columnas(tipo)
+    s = rango(columnas, inicio, fin)
+    centavos = columnas.centavos[s]
+    if len(centavos):
+        # Rangos abiertos ("Todos") se acotan al primer movimiento
+        inicio = max(inicio, dia_a_fecha(columnas.dia[s][0]))
+    movil = gasto_movil(columnas, inicio, fin)
+    categorias, meses, matriz = pivote_categoria_mes(columnas, inicio, fin)
+
+    mayor = None
+    if matriz.size:
+        fila, columna = np.unravel_index(np.argmax(matriz), matriz.shape)
+        mayor = (categorias[fila], meses[columna], float(matriz[fila, columna]))
+
+    return {
+        "cantidad": int(len(centavos)),
+        "total": int(centavos.sum()) / 100,
+        "promedio": float(centavos.mean()) / 100 if len(centavos) else 0.0,
+        "percentiles": percentiles(columnas, inicio, fin),
+        "movil_actual": float(movil[-1]) if len(movil) else 0.0,
+        "movil_maximo": float(movil.max()) if len(movil) else 0.0,
+        "movil_maximo_fecha": dia_a_fecha(fecha_a_dia(fin) - len(movil) + 1 + int(movil.argmax()))
+                              if len(movil) else fin,
+        "por_dia_semana": list(zip(DIAS_SEMANA, promedio_por_dia_semana(columnas, inicio, fin).tolist())),
+        "mayor_categoria_mes": mayor,
+    }
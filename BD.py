@@ -1,20 +1,213 @@
-
 import sqlite3
 import os
+import sys
+from datetime import datetime
+from functools import partial
 
 # Define la database path
 DB_PATH = os.path.join("MGF", "gastos.db")
 
-def create_database():
-    """Creates the database and necessary tables if they don't exist."""
-    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-    
-    # Connecta a la database
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    # Create  table de ingresos
-    cursor.execute("""
+def _resumen_triggers(tabla, tipo, categoria, monto="monto"):
+    """Builds the triggers that keep resumen_mensual in sync with a table."""
+    def clave(fila):
+        return (f"tipo = '{tipo}' AND mes = substr({fila}.fecha, 1, 7) "
+                f"AND categoria = {categoria.format(fila=fila)} AND usuario = COALESCE({fila}.usuario, '')")
+
+    sumar = f"""
+            INSERT INTO resumen_mensual (tipo, mes, categoria, usuario, total, cantidad)
+            VALUES ('{tipo}', substr(NEW.fecha, 1, 7), {categoria.format(fila="NEW")},
+                    COALESCE(NEW.usuario, ''), NEW.{monto}, 1)
+            ON CONFLICT (tipo, mes, categoria, usuario)
+            DO UPDATE SET total = total + excluded.total, cantidad = cantidad + 1;"""
+    restar = f"""
+            UPDATE resumen_mensual SET total = total - OLD.{monto}, cantidad = cantidad - 1
+            WHERE {clave("OLD")};
+            DELETE FROM resumen_mensual WHERE {clave("OLD")} AND cantidad <= 0;"""
+    return (
+        f"CREATE TRIGGER IF NOT EXISTS trg_{tabla}_resumen_insert AFTER INSERT ON {tabla} "
+        f"BEGIN {sumar} END",
+        f"CREATE TRIGGER IF NOT EXISTS trg_{tabla}_resumen_delete AFTER DELETE ON {tabla} "
+        f"BEGIN {restar} END",
+        f"CREATE TRIGGER IF NOT EXISTS trg_{tabla}_resumen_update AFTER UPDATE ON {tabla} "
+        f"BEGIN {restar} {sumar} END",
+    )
+
+def _busqueda_tabla(tabla):
+    """Builds the FTS5 table that indexes a table's text columns and fills it."""
+    fts = f"busqueda_{tabla}"
+    return (
+        # Tabla de contenido externo: el texto se lee de la tabla original
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+        f"descripcion, notas, content='{tabla}', content_rowid='id', "
+        f"tokenize='unicode61 remove_diacritics 2')",
+        # Indexa las filas que ya existían
+        f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')",
+    )
+
+def _busqueda_triggers(tabla):
+    """Builds the triggers that keep a table's FTS5 index in sync."""
+    fts = f"busqueda_{tabla}"
+    insertar = f"INSERT INTO {fts} (rowid, descripcion, notas) VALUES (NEW.id, NEW.descripcion, NEW.notas);"
+    borrar = (f"INSERT INTO {fts} ({fts}, rowid, descripcion, notas) "
+              f"VALUES ('delete', OLD.id, OLD.descripcion, OLD.notas);")
+    return (
+        f"CREATE TRIGGER IF NOT EXISTS trg_{tabla}_busqueda_insert AFTER INSERT ON {tabla} "
+        f"BEGIN {insertar} END",
+        f"CREATE TRIGGER IF NOT EXISTS trg_{tabla}_busqueda_delete AFTER DELETE ON {tabla} "
+        f"BEGIN {borrar} END",
+        f"CREATE TRIGGER IF NOT EXISTS trg_{tabla}_busqueda_update AFTER UPDATE OF descripcion, notas "
+        f"ON {tabla} BEGIN {borrar} {insertar} END",
+    )
+
+def rebuild_monthly_summary(conn, monto="centavos"):
+    """Recomputes resumen_mensual from scratch inside the current transaction."""
+    conn.execute("DELETE FROM resumen_mensual")
+    conn.execute(f"""
+        INSERT INTO resumen_mensual (tipo, mes, categoria, usuario, total, cantidad)
+        SELECT 'ingreso', substr(fecha, 1, 7), '', COALESCE(usuario, ''), SUM({monto}), COUNT(*)
+        FROM ingresos
+        GROUP BY 2, 4
+        UNION ALL
+        SELECT 'gasto', substr(fecha, 1, 7), categoria, COALESCE(usuario, ''), SUM({monto}), COUNT(*)
+        FROM gastos
+        GROUP BY 2, 3, 4
+    """)
+
+# Número de día (desde 1970-01-01) de una fecha; NULL si no es una fecha válida
+DIA_DE_FECHA = "CAST(julianday(fecha) - 2440587.5 AS INTEGER)"
+
+def normalize_dates(conn):
+    """Rewrites fechas such as 2024-1-5 as YYYY-MM-DD so they get a day number.
+
+    Rows whose fecha is not a date at all are moved to {tabla}_fecha_invalida:
+    with dia NULL they would drop out of every listing while resumen_mensual
+    kept counting them under a bogus mes.
+    """
+    for tabla in ("ingresos", "gastos"):
+        filas = conn.execute(f"""
+            SELECT id, fecha FROM {tabla}
+            WHERE julianday(fecha) IS NULL OR date(fecha) IS NOT fecha
+        """).fetchall()
+        corregidas, invalidas = [], []
+        for id_, fecha in filas:
+            try:
+                corregidas.append((datetime.strptime(fecha.strip()[:10], "%Y-%m-%d").strftime("%Y-%m-%d"), id_))
+            except (AttributeError, ValueError):
+                invalidas.append((id_,))
+        # Los triggers de resumen_mensual mueven cada fila a su mes correcto
+        conn.executemany(f"UPDATE {tabla} SET fecha = ? WHERE id = ?", corregidas)
+        if invalidas:
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {tabla}_fecha_invalida AS SELECT * FROM {tabla} WHERE 0")
+            conn.executemany(f"INSERT INTO {tabla}_fecha_invalida SELECT * FROM {tabla} WHERE id = ?", invalidas)
+            # Al borrarlas, los triggers las descuentan de resumen_mensual y de la búsqueda
+            conn.executemany(f"DELETE FROM {tabla} WHERE id = ?", invalidas)
+
+def _tabla_en_centavos(tabla, columnas, copiadas):
+    """Builds the steps that rebuild a table storing monto as INTEGER centavos.
+
+    SQLite cannot change a column's type in place, so the rows are copied to a
+    new table. Ids are kept, so the FTS5 index stays valid, and monto remains
+    as a generated column for the queries and reports that read it.
+    """
+    nueva = f"{tabla}_centavos"
+    return (
+        f"CREATE TABLE {nueva} ({columnas})",
+        f"""
+        INSERT INTO {nueva} ({copiadas}, centavos)
+        SELECT {copiadas}, CAST(round(monto * 100) AS INTEGER) FROM {tabla}
+        """,
+        # El contador de AUTOINCREMENT pasa a la tabla nueva para no reutilizar ids borrados
+        f"DELETE FROM sqlite_sequence WHERE name = '{nueva}'",
+        f"UPDATE sqlite_sequence SET name = '{nueva}' WHERE name = '{tabla}'",
+        # Borrar la tabla se lleva sus índices y triggers; se vuelven a crear después
+        f"DROP TABLE {tabla}",
+        f"ALTER TABLE {nueva} RENAME TO {tabla}",
+    )
+
+# Pasos de la migración 8, que pasa los montos a centavos enteros
+_PASOS_CENTAVOS = (
+    *_tabla_en_centavos("ingresos", f"""
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        fecha TEXT NOT NULL,
+        centavos INTEGER NOT NULL,
+        descripcion TEXT,
+        usuario TEXT,
+        notas TEXT,
+        monto REAL GENERATED ALWAYS AS (centavos / 100.0) VIRTUAL,
+        dia INTEGER GENERATED ALWAYS AS ({DIA_DE_FECHA}) VIRTUAL
+    """, "id, fecha, descripcion, usuario, notas"),
+    *_tabla_en_centavos("gastos", f"""
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        fecha TEXT NOT NULL,
+        categoria TEXT NOT NULL,
+        centavos INTEGER NOT NULL,
+        descripcion TEXT,
+        usuario TEXT,
+        notas TEXT,
+        monto REAL GENERATED ALWAYS AS (centavos / 100.0) VIRTUAL,
+        dia INTEGER GENERATED ALWAYS AS ({DIA_DE_FECHA}) VIRTUAL
+    """, "id, fecha, categoria, descripcion, usuario, notas"),
+    "CREATE INDEX IF NOT EXISTS idx_ingresos_dia ON ingresos (dia)",
+    "CREATE INDEX IF NOT EXISTS idx_gastos_dia ON gastos (dia)",
+    "CREATE INDEX IF NOT EXISTS idx_ingresos_dia_centavos ON ingresos (dia, centavos)",
+    "CREATE INDEX IF NOT EXISTS idx_gastos_dia_categoria_centavos ON gastos (dia, categoria, centavos)",
+    "CREATE INDEX IF NOT EXISTS idx_gastos_categoria_fecha_centavos ON gastos (categoria, fecha, centavos)",
+    # total y limite pasan a centavos; el resumen se recalcula desde las tablas
+    "DROP TABLE resumen_mensual",
+    """
+    CREATE TABLE resumen_mensual (
+        tipo TEXT NOT NULL,
+        mes TEXT NOT NULL,
+        categoria TEXT NOT NULL,
+        usuario TEXT NOT NULL,
+        total INTEGER NOT NULL,
+        cantidad INTEGER NOT NULL,
+        PRIMARY KEY (tipo, mes, categoria, usuario)
+    ) WITHOUT ROWID
+    """,
+    rebuild_monthly_summary,
+    *_resumen_triggers("ingresos", "ingreso", "''", monto="centavos"),
+    *_resumen_triggers("gastos", "gasto", "{fila}.categoria", monto="centavos"),
+    *_busqueda_triggers("ingresos"),
+    *_busqueda_triggers("gastos"),
+    "ALTER TABLE presupuestos RENAME TO presupuestos_anterior",
+    """
+    CREATE TABLE presupuestos (
+        categoria TEXT NOT NULL,
+        mes TEXT NOT NULL,
+        limite INTEGER NOT NULL CHECK (limite >= 0),
+        PRIMARY KEY (categoria, mes)
+    ) WITHOUT ROWID
+    """,
+    """
+    INSERT INTO presupuestos (categoria, mes, limite)
+    SELECT categoria, mes, CAST(round(limite * 100) AS INTEGER) FROM presupuestos_anterior
+    """,
+    "DROP TABLE presupuestos_anterior",
+    "ANALYZE",
+)
+
+def amounts_to_cents(conn):
+    """Moves amounts to INTEGER centavos unless the tables already store them.
+
+    Running the steps twice would multiply every amount by 100 again, so the
+    centavos column is checked first.
+    """
+    columnas = {fila[1] for fila in conn.execute("PRAGMA table_info(ingresos)")}
+    if "centavos" in columnas:
+        return
+    for paso in _PASOS_CENTAVOS:
+        if callable(paso):
+            paso(conn)
+        else:
+            conn.execute(paso)
+
+# Migraciones del esquema, en orden. La migración en la posición i lleva la
+# database a la versión i + 1, guardada en PRAGMA user_version.
+MIGRACIONES = [
+    # 1: tablas base (una database anterior a las migraciones ya las tiene)
+    (
+        """
         CREATE TABLE IF NOT EXISTS ingresos (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             fecha TEXT NOT NULL,
@@ -23,10 +216,8 @@ def create_database():
             usuario TEXT,
             notas TEXT
         )
-    """)
-    
-    # Create  tabla gastos
-    cursor.execute("""
+        """,
+        """
         CREATE TABLE IF NOT EXISTS gastos (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             fecha TEXT NOT NULL,
@@ -36,16 +227,133 @@ def create_database():
             usuario TEXT,
             notas TEXT
         )
-    """)
-    
-   
-    conn.commit()
-    conn.close()
+        """,
+    ),
+    # 2: índices cubrientes para las consultas por período y por categoría
+    (
+        "CREATE INDEX IF NOT EXISTS idx_ingresos_fecha_monto ON ingresos (fecha, monto)",
+        "CREATE INDEX IF NOT EXISTS idx_gastos_fecha_categoria_monto ON gastos (fecha, categoria, monto)",
+        "CREATE INDEX IF NOT EXISTS idx_gastos_categoria_fecha_monto ON gastos (categoria, fecha, monto)",
+        "ANALYZE",
+    ),
+    # 3: totales mensuales por tipo, categoría y usuario mantenidos por triggers
+    (
+        """
+        CREATE TABLE IF NOT EXISTS resumen_mensual (
+            tipo TEXT NOT NULL,
+            mes TEXT NOT NULL,
+            categoria TEXT NOT NULL,
+            usuario TEXT NOT NULL,
+            total REAL NOT NULL,
+            cantidad INTEGER NOT NULL,
+            PRIMARY KEY (tipo, mes, categoria, usuario)
+        ) WITHOUT ROWID
+        """,
+        *_resumen_triggers("ingresos", "ingreso", "''"),
+        *_resumen_triggers("gastos", "gasto", "{fila}.categoria"),
+        # Hasta la migración 8 los montos eran REAL en pesos
+        partial(rebuild_monthly_summary, monto="monto"),
+    ),
+    # 4: índices (fecha, id) para la paginación por clave de las tablas
+    (
+        "CREATE INDEX IF NOT EXISTS idx_ingresos_fecha ON ingresos (fecha)",
+        "CREATE INDEX IF NOT EXISTS idx_gastos_fecha ON gastos (fecha)",
+    ),
+    # 5: búsqueda de texto completo (FTS5) en descripcion y notas
+    (
+        *_busqueda_tabla("ingresos"),
+        *_busqueda_tabla("gastos"),
+        *_busqueda_triggers("ingresos"),
+        *_busqueda_triggers("gastos"),
+    ),
+    # 6: límite de gasto por categoría y mes
+    (
+        """
+        CREATE TABLE IF NOT EXISTS presupuestos (
+            categoria TEXT NOT NULL,
+            mes TEXT NOT NULL,
+            limite REAL NOT NULL CHECK (limite >= 0),
+            PRIMARY KEY (categoria, mes)
+        ) WITHOUT ROWID
+        """,
+    ),
+    # 7: número de día entero derivado de fecha para filtrar y ordenar por rangos.
+    # Es una columna generada: SQLite la calcula desde fecha, así que no puede
+    # quedar desactualizada y no agrega escrituras (un trigger AFTER INSERT
+    # que la actualizara dispararía además los triggers de resumen_mensual).
+    (
+        normalize_dates,
+        f"ALTER TABLE ingresos ADD COLUMN dia INTEGER GENERATED ALWAYS AS ({DIA_DE_FECHA}) VIRTUAL",
+        f"ALTER TABLE gastos ADD COLUMN dia INTEGER GENERATED ALWAYS AS ({DIA_DE_FECHA}) VIRTUAL",
+        # (dia, id) para la paginación; los que incluyen monto cubren las sumas de los bordes
+        "CREATE INDEX IF NOT EXISTS idx_ingresos_dia ON ingresos (dia)",
+        "CREATE INDEX IF NOT EXISTS idx_gastos_dia ON gastos (dia)",
+        "CREATE INDEX IF NOT EXISTS idx_ingresos_dia_monto ON ingresos (dia, monto)",
+        "CREATE INDEX IF NOT EXISTS idx_gastos_dia_categoria_monto ON gastos (dia, categoria, monto)",
+        # Los índices por fecha ya no los usa ninguna consulta
+        "DROP INDEX IF EXISTS idx_ingresos_fecha",
+        "DROP INDEX IF EXISTS idx_gastos_fecha",
+        "DROP INDEX IF EXISTS idx_ingresos_fecha_monto",
+        "DROP INDEX IF EXISTS idx_gastos_fecha_categoria_monto",
+        "ANALYZE",
+    ),
+    # 8: montos en centavos enteros, para que las sumas sean exactas
+    (
+        amounts_to_cents,
+    ),
+]
+
+def schema_version(conn):
+    """Returns the schema version stored in the database."""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate(conn):
+    """Applies pending migrations in place and returns the resulting version."""
+    version = schema_version(conn)
+    for numero in range(version + 1, len(MIGRACIONES) + 1):
+        # Cada migración corre en su propia transacción junto con el cambio de versión.
+        # IMMEDIATE toma el bloqueo de escritura antes de releer la versión, así
+        # otro proceso que abrió la database a la vez no aplica la misma migración.
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            version = schema_version(conn)
+            if version >= numero:
+                conn.rollback()
+                continue
+            for paso in MIGRACIONES[numero - 1]:
+                if callable(paso):
+                    paso(conn)
+                else:
+                    conn.execute(paso)
+            conn.execute(f"PRAGMA user_version = {numero}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        version = numero
+    return version
+
+def create_database():
+    """Creates the database and brings its schema up to date."""
+    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
+
+    # Connecta a la database
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        return migrate(conn)
+    finally:
+        conn.close()
 
 def connect_db():
     """Establishes a connection to the database."""
     return sqlite3.connect(DB_PATH)
 
 if __name__ == "__main__":
-    create_database()
-    print(f"Database initialized at {DB_PATH}")
+    version = create_database()
+    print(f"Database initialized at {DB_PATH} (schema version {version})")
+    if "--rebuild-resumen" in sys.argv:
+        conn = sqlite3.connect(DB_PATH)
+        with conn:
+            rebuild_monthly_summary(conn)
+        conn.close()
+        print("Monthly summary rebuilt")
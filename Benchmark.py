@@ -0,0 +1,386 @@
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+import Funciones
+from Conexion import configurar_ruta, cerrar_todas
+
+# Tamaños de base que se generan y miden por defecto
+TAMANOS = (10_000, 100_000, 1_000_000)
+
+# Semilla fija: la misma cantidad de filas produce siempre la misma base
+SEMILLA = 42
+
+# Día en que terminan los datos generados. Las mediciones toman esta fecha
+# como hoy (Funciones.fijar_fecha_actual), así la base y las ventanas de Mes,
+# Año y presupuestos son las mismas en cualquier día que se corra.
+REFERENCIA = date(2025, 6, 15)
+
+# Años de historia hasta REFERENCIA y fracción de las filas que son ingresos
+ANIOS = 5
+FRACCION_INGRESOS = 0.1
+
+# Bases generadas; se reutilizan entre ejecuciones
+DIRECTORIO_BASES = os.path.join("MGF", "benchmark")
+
+REPETICIONES = 5
+
+# Una medición es regresión si su mediana crece más que la tolerancia y más
+# que el mínimo absoluto (para no marcar ruido en funciones de microsegundos)
+TOLERANCIA = 0.25
+MINIMO_MS = 1.0
+
+# Categorías de gasto: (peso, monto típico, descripciones)
+CATEGORIAS = {
+    "Alimentación": (30, 35.0, ("Supermercado", "Panadería", "Verdulería", "Carnicería", "Almacén")),
+    "Transporte": (15, 20.0, ("Combustible", "Pasaje de colectivo", "Taxi", "Estacionamiento", "Peaje")),
+    "Vivienda": (8, 300.0, ("Alquiler", "Expensas", "Luz", "Gas", "Agua", "Internet")),
+    "Salud": (6, 60.0, ("Farmacia", "Consulta médica", "Dentista", "Análisis de laboratorio")),
+    "Educación": (5, 80.0, ("Cuota del colegio", "Libros", "Útiles escolares", "Curso de inglés")),
+    "Entretenimiento": (14, 25.0, ("Cine", "Restaurante", "Streaming", "Salida con amigos", "Juegos")),
+    "Ropa": (7, 50.0, ("Zapatillas", "Campera", "Ropa de los chicos", "Uniforme")),
+    "Otros": (15, 30.0, ("Regalo", "Ferretería", "Veterinaria", "Peluquería", "Varios")),
+}
+USUARIOS = {"Familia": 50, "Mamá": 20, "Papá": 20, "Hijos": 10}
+INGRESOS = (("Sueldo", 1500.0), ("Aguinaldo", 800.0), ("Trabajo extra", 200.0), ("Venta", 120.0))
+NOTAS = ("", "", "", "", "pagado con tarjeta", "en cuotas", "efectivo", "reintegro pendiente")
+
+def _elegir(aleatorio, pesos, n):
+    """Elige n claves de un diccionario según sus pesos"""
+    return aleatorio.choices(list(pesos), weights=[p if isinstance(p, (int, float)) else p[0]
+                                                   for p in pesos.values()], k=n)
+
+def generar_movimientos(filas, semilla=SEMILLA, anios=ANIOS, hoy=REFERENCIA):
+    """Genera (ingresos, gastos) sintéticos repartidos en los años anteriores a hoy
+
+    Los montos siguen una distribución lognormal alrededor del monto típico de
+    cada categoría. Con la misma semilla y fecha el resultado es siempre el mismo.
+    """
+    aleatorio = random.Random(semilla)
+    dias = anios * 365
+    primero = hoy - timedelta(days=dias - 1)
+    n_ingresos = int(filas * FRACCION_INGRESOS)
+    n_gastos = filas - n_ingresos
+
+    def fecha():
+        return (primero + timedelta(days=aleatorio.randrange(dias))).isoformat()
+
+    categorias = _elegir(aleatorio, CATEGORIAS, n_gastos)
+    usuarios = _elegir(aleatorio, USUARIOS, n_gastos)
+    gastos = []
+    for categoria, usuario in zip(categorias, usuarios):
+        _, tipico, descripciones = CATEGORIAS[categoria]
+        monto = round(tipico * aleatorio.lognormvariate(0, 0.6), 2)
+        gastos.append((fecha(), categoria, monto, aleatorio.choice(descripciones), usuario,
+                       aleatorio.choice(NOTAS)))
+
+    ingresos = []
+    for usuario in _elegir(aleatorio, USUARIOS, n_ingresos):
+        descripcion, tipico = aleatorio.choice(INGRESOS)
+        monto = round(tipico * aleatorio.lognormvariate(0, 0.3), 2)
+        ingresos.append((fecha(), monto, descripcion, usuario, aleatorio.choice(NOTAS)))
+    return ingresos, gastos
+
+def ruta_base(filas, semilla=SEMILLA, directorio=DIRECTORIO_BASES):
+    return os.path.join(directorio, f"gastos-{filas}-s{semilla}-{REFERENCIA:%Y%m%d}.db")
+
+def generar_base(filas, semilla=SEMILLA, directorio=DIRECTORIO_BASES, lote=50_000):
+    """Crea (o reutiliza) una base con filas movimientos sintéticos y devuelve su ruta
+
+    Las filas se insertan con las funciones de Funciones, así que los
+    disparadores mantienen el resumen mensual y la búsqueda como en uso real.
+    """
+    ruta = ruta_base(filas, semilla, directorio)
+    if os.path.exists(ruta):
+        return ruta
+    os.makedirs(directorio, exist_ok=True)
+    temporal = ruta + ".tmp"
+    if os.path.exists(temporal):
+        os.remove(temporal)
+    ingresos, gastos = generar_movimientos(filas, semilla)
+    configurar_ruta(temporal)
+    try:
+        for i in range(0, max(len(ingresos), len(gastos)), lote):
+            with Funciones.escritura() as conn:
+                Funciones.insertar_ingresos(conn, ingresos[i:i + lote])
+                Funciones.insertar_gastos(conn, gastos[i:i + lote])
+        # Presupuestos del mes de REFERENCIA para verificar_presupuesto y el gráfico de resumen
+        mes = REFERENCIA.strftime("%Y-%m")
+        for categoria, (_, tipico, _) in CATEGORIAS.items():
+            if not Funciones.establecer_presupuesto(categoria, mes, tipico * filas / (ANIOS * 12) / 8):
+                raise RuntimeError(f"No se pudo establecer el presupuesto de {categoria}")
+        with Funciones.conexion() as conn:
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            conn.execute("PRAGMA optimize")
+    finally:
+        cerrar_todas()
+    os.replace(temporal, ruta)
+    return ruta
+
+def _comprobar(nombre, funcion):
+    """Envuelve una función de Funciones que devuelve None o False al fallar para que lance el error
+
+    Funciones imprime el error y sigue; sin esto una escritura o exportación
+    fallida se mediría como si hubiera terminado bien.
+    """
+    def envoltura():
+        resultado = funcion()
+        if resultado is None or resultado is False:
+            raise RuntimeError(f"{nombre} falló (devolvió {resultado!r})")
+        return resultado
+    return envoltura
+
+def medir(funcion, repeticiones=REPETICIONES, preparar=None):
+    """Ejecuta funcion varias veces y devuelve sus tiempos en milisegundos
+
+    preparar() se llama antes de cada repetición, fuera del tiempo medido.
+    """
+    tiempos = []
+    for _ in range(repeticiones):
+        if preparar:
+            preparar()
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return {"mediana_ms": statistics.median(tiempos), "min_ms": min(tiempos),
+            "max_ms": max(tiempos), "repeticiones": repeticiones}
+
+def _casos_lectura():
+    """(nombre, función) de las lecturas de Funciones; se miden con la caché vacía"""
+    hoy = REFERENCIA
+    inicio_anio, fin = Funciones.calculate_period_dates("Año")
+    casos = []
+    for periodo in ("Mes", "Año", "Todos"):
+        casos += [
+            (f"obtener_ingresos[{periodo}]", lambda p=periodo: Funciones.obtener_ingresos(p)),
+            (f"obtener_gastos[{periodo}]", lambda p=periodo: Funciones.obtener_gastos(p)),
+            (f"obtener_total_gastos[{periodo}]", lambda p=periodo: Funciones.obtener_total_gastos(p)),
+            (f"obtener_resumen_periodo[{periodo}]", lambda p=periodo: Funciones.obtener_resumen_periodo(p)),
+        ]
+    casos += [
+        ("obtener_total_por_categoria_periodo[Año]",
+         lambda: Funciones.obtener_total_por_categoria_periodo(inicio_anio, fin)),
+        ("obtener_ingresos_pagina[Todos]", lambda: Funciones.obtener_ingresos_pagina("Todos")),
+        ("obtener_gastos_pagina[Todos]", lambda: Funciones.obtener_gastos_pagina("Todos")),
+        ("obtener_gastos_pagina[Todos,profunda]",
+         lambda: Funciones.obtener_gastos_pagina("Todos", ((hoy - timedelta(days=365 * 3)).isoformat(), 0))),
+        ("obtener_tendencia_mensual[12]", lambda: Funciones.obtener_tendencia_mensual(12)),
+        ("buscar_transacciones[palabra]", lambda: Funciones.buscar_transacciones("supermercado")),
+        ("buscar_transacciones[prefijo,Año]", lambda: Funciones.buscar_transacciones("far", "Año")),
+        ("verificar_presupuesto", lambda: Funciones.verificar_presupuesto("Alimentación", hoy.isoformat())),
+        ("obtener_presupuestos", lambda: Funciones.obtener_presupuestos(hoy.strftime("%Y-%m"))),
+    ]
+    return casos
+
+def _casos_escritura():
+    """(nombre, función) de las escrituras de Funciones; un fallo detiene el benchmark"""
+    hoy = REFERENCIA.isoformat()
+    mes = hoy[:7]
+    ingresos, gastos = generar_movimientos(1000, SEMILLA + 1)
+    casos = [
+        ("agregar_ingreso", lambda: Funciones.agregar_ingreso(hoy, 100.0, "Benchmark", "Familia")),
+        ("agregar_gasto", lambda: Funciones.agregar_gasto(hoy, "Otros", 10.0, "Benchmark", "Familia")),
+        ("agregar_ingresos_lote[1000]", lambda: Funciones.agregar_ingresos_lote(ingresos)),
+        ("agregar_gastos_lote[1000]", lambda: Funciones.agregar_gastos_lote(gastos)),
+        ("establecer_presupuesto", lambda: Funciones.establecer_presupuesto("Benchmark", mes, 100.0)),
+        ("eliminar_presupuesto", lambda: Funciones.eliminar_presupuesto("Benchmark", mes)),
+    ]
+    return [(nombre, _comprobar(nombre, funcion)) for nombre, funcion in casos]
+
+def _graficos_agg():
+    """Crea los gráficos de la aplicación sobre canvas Agg, sin ventana"""
+    import matplotlib
+    matplotlib.use("Agg")
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from Graficos import GraficoBarras, GraficoCircular, GraficoTendencia, paleta
+
+    def figura(figsize):
+        fig = Figure(figsize=figsize, dpi=100)
+        return fig, FigureCanvasAgg(fig)
+
+    texto, fondo = "#1F2A44", "#FFFFFF"
+    return {
+        "bar": GraficoBarras(*figura((10, 5)), texto, fondo, paleta("Blues", 0.3, 0.5),
+                             etiqueta_categoria="Categoría"),
+        "pie": GraficoCircular(*figura((10, 5)), texto, fondo, paleta("tab20c")),
+        "trend": GraficoTendencia(*figura((10, 5)), texto, fondo, "#22C55E", "#EF4444"),
+        "summary": GraficoBarras(*figura((8, 4)), texto, fondo, paleta("Pastel1"), horizontal=True,
+                                 color_limite=texto, color_exceso="#EF4444"),
+    }
+
+def _casos_refresco():
+    """(nombre, función, preparar) del refresco de reportes y resumen, incluidos los gráficos
+
+    Se llama directamente a mostrar() de cada gráfico Agg, con los mismos
+    datos que usan los generate_*_chart de GastoApp, así no hace falta abrir
+    la ventana de Tk. Esos métodos atrapan e imprimen los errores; aquí un
+    gráfico roto hace fallar el benchmark en lugar de dar un tiempo.
+    """
+    from Interfaz import barras_con_presupuestos, cargar_datos_reportes, cargar_datos_resumen
+
+    graficos = _graficos_agg()
+    reportes = cargar_datos_reportes("Año")
+    resumen = cargar_datos_resumen()
+    casos = [
+        ("cargar_datos_reportes[Año]", lambda: cargar_datos_reportes("Año"), Funciones.invalidar_cache),
+        ("cargar_datos_resumen", cargar_datos_resumen, Funciones.invalidar_cache),
+    ]
+    inicio, fin = reportes["rango"]
+    barras, limites = barras_con_presupuestos(resumen["categorias"], resumen["presupuestos"])
+    dibujos = {
+        "generate_bar_chart": lambda: graficos["bar"].mostrar(
+            reportes["categorias"], f"Gastos por Categoría ({inicio} a {fin})"),
+        "generate_pie_chart": lambda: graficos["pie"].mostrar(
+            reportes["porciones"], f"Distribución de Gastos ({inicio} a {fin})"),
+        "generate_trend_chart": lambda: graficos["trend"].mostrar(
+            reportes["tendencia"], "Tendencias Mensuales (Últimos 12 meses)", reportes["pronostico"]),
+        "generate_summary_chart": lambda: graficos["summary"].mostrar(
+            barras, "Gastos del Mes por Categoría", limites),
+    }
+
+    def reconstruir():
+        # Sin forma guardada el próximo mostrar() arma la figura desde cero
+        for grafico in graficos.values():
+            grafico.forma = None
+
+    for nombre, funcion in dibujos.items():
+        casos.append((f"{nombre}[construir]", funcion, reconstruir))
+        casos.append((f"{nombre}[actualizar]", funcion, None))
+    return casos
+
+def medir_base(ruta, repeticiones=REPETICIONES, graficos=True):
+    """Mide todas las funciones sobre una copia de la base y devuelve {nombre: tiempos}"""
+    resultados = {}
+    directorio = tempfile.mkdtemp(prefix="benchmark-")
+    copia = os.path.join(directorio, os.path.basename(ruta))
+    shutil.copy(ruta, copia)
+    configurar_ruta(copia)
+    Funciones.fijar_fecha_actual(REFERENCIA)
+    try:
+        for nombre, funcion in _casos_lectura():
+            funcion()  # primera lectura: páginas de la base en caché del sistema
+            resultados[nombre] = medir(funcion, repeticiones, Funciones.invalidar_cache)
+        for nombre, funcion in _casos_escritura():
+            resultados[nombre] = medir(funcion, repeticiones)
+        for tipo in ("gastos", "ambos"):
+            for extension in (".csv", ".csv.gz"):
+                destino = os.path.join(directorio, f"reporte-{tipo}{extension}")
+                nombre = f"exportar_reportes[{tipo}{extension}]"
+                resultados[nombre] = medir(_comprobar(
+                    nombre, lambda: Funciones.exportar_reportes("Todos", tipo, destino)), repeticiones)
+        resultados["reconstruir_resumen_mensual"] = medir(
+            _comprobar("reconstruir_resumen_mensual", Funciones.reconstruir_resumen_mensual), 1)
+        if graficos:
+            for nombre, funcion, preparar in _casos_refresco():
+                resultados[nombre] = medir(funcion, repeticiones, preparar)
+    finally:
+        Funciones.fijar_fecha_actual(None)
+        cerrar_todas()
+        shutil.rmtree(directorio, ignore_errors=True)
+    return resultados
+
+def correr(tamanos=TAMANOS, repeticiones=REPETICIONES, semilla=SEMILLA, graficos=True, progreso=print):
+    """Genera las bases que falten, mide cada una y devuelve el documento de resultados"""
+    documento = {
+        "meta": {
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "plataforma": platform.platform(),
+            "semilla": semilla,
+            "referencia": REFERENCIA.isoformat(),
+            "repeticiones": repeticiones,
+        },
+        "resultados": {},
+    }
+    for filas in tamanos:
+        inicio = time.perf_counter()
+        ruta = generar_base(filas, semilla)
+        progreso(f"Base de {filas} filas lista en {time.perf_counter() - inicio:.1f} s: {ruta}")
+        inicio = time.perf_counter()
+        documento["resultados"][str(filas)] = medir_base(ruta, repeticiones, graficos)
+        progreso(f"Mediciones de {filas} filas en {time.perf_counter() - inicio:.1f} s")
+    return documento
+
+def comparar(base, actual, tolerancia=TOLERANCIA, minimo_ms=MINIMO_MS):
+    """Compara dos documentos de resultados; devuelve [(tamaño, nombre, antes, ahora, cambio)] de regresiones"""
+    regresiones = []
+    for filas, mediciones in actual["resultados"].items():
+        anteriores = base["resultados"].get(filas, {})
+        for nombre, medicion in mediciones.items():
+            if nombre not in anteriores:
+                continue
+            antes, ahora = anteriores[nombre]["mediana_ms"], medicion["mediana_ms"]
+            if ahora > antes * (1 + tolerancia) and ahora - antes > minimo_ms:
+                regresiones.append((filas, nombre, antes, ahora, ahora / antes - 1 if antes else float("inf")))
+    return regresiones
+
+def imprimir_resultados(documento):
+    for filas, mediciones in documento["resultados"].items():
+        print(f"\n{filas} filas")
+        for nombre, medicion in mediciones.items():
+            print(f"  {nombre:<45}{medicion['mediana_ms']:>10.2f} ms  (mín {medicion['min_ms']:.2f})")
+
+def imprimir_regresiones(regresiones):
+    if not regresiones:
+        print("Sin regresiones")
+        return
+    print(f"{len(regresiones)} regresiones:")
+    for filas, nombre, antes, ahora, cambio in regresiones:
+        print(f"  [{filas}] {nombre}: {antes:.2f} ms -> {ahora:.2f} ms (+{cambio:.0%})")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de Funciones, exportación y gráficos")
+    ordenes = parser.add_subparsers(dest="orden", required=True)
+
+    generar = ordenes.add_parser("generar", help="genera las bases sintéticas")
+    generar.add_argument("--filas", type=int, nargs="+", default=list(TAMANOS))
+    generar.add_argument("--semilla", type=int, default=SEMILLA)
+
+    correr_parser = ordenes.add_parser("correr", help="mide y guarda los resultados en JSON")
+    correr_parser.add_argument("--filas", type=int, nargs="+", default=list(TAMANOS))
+    correr_parser.add_argument("--semilla", type=int, default=SEMILLA)
+    correr_parser.add_argument("--repeticiones", type=int, default=REPETICIONES)
+    correr_parser.add_argument("--sin-graficos", action="store_true", help="no mide el refresco ni los gráficos")
+    correr_parser.add_argument("--salida", default="benchmark.json")
+    correr_parser.add_argument("--base", help="resultados guardados contra los que comparar")
+    correr_parser.add_argument("--tolerancia", type=float, default=TOLERANCIA)
+
+    comparar_parser = ordenes.add_parser("comparar", help="compara dos archivos de resultados")
+    comparar_parser.add_argument("base")
+    comparar_parser.add_argument("actual")
+    comparar_parser.add_argument("--tolerancia", type=float, default=TOLERANCIA)
+
+    args = parser.parse_args()
+    if args.orden == "generar":
+        for filas in args.filas:
+            print(generar_base(filas, args.semilla))
+    elif args.orden == "correr":
+        documento = correr(args.filas, args.repeticiones, args.semilla, not args.sin_graficos)
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(documento, f, ensure_ascii=False, indent=2)
+        imprimir_resultados(documento)
+        print(f"\nResultados guardados en {args.salida}")
+        if args.base:
+            with open(args.base, encoding="utf-8") as f:
+                regresiones = comparar(json.load(f), documento, args.tolerancia)
+            imprimir_regresiones(regresiones)
+            sys.exit(1 if regresiones else 0)
+    else:
+        with open(args.base, encoding="utf-8") as f:
+            base = json.load(f)
+        with open(args.actual, encoding="utf-8") as f:
+            actual = json.load(f)
+        regresiones = comparar(base, actual, args.tolerancia)
+        imprimir_regresiones(regresiones)
+        sys.exit(1 if regresiones else 0)
@@ -0,0 +1,134 @@
+import os
+import sqlite3
+import threading
+import atexit
+from contextlib import contextmanager
+
+from BD import DB_PATH, migrate
+
+# Ajustes aplicados a cada conexión nueva
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA temp_store=MEMORY",
+)
+
+# Variable de entorno que instrumenta las conexiones (ver Instrumentacion)
+VARIABLE_INSTRUMENTAR = "GASTOAPP_INSTRUMENTAR"
+
+# Segundos que espera una conexión antes de fallar por bloqueo
+TIMEOUT = 10
+
+_ruta = DB_PATH
+_fabrica = None
+_epoca = 0
+_local = threading.local()
+_lock = threading.Lock()
+_conexiones = set()
+_migradas = set()
+
+def configurar_ruta(ruta):
+    """Cambia la base de datos usada por las conexiones compartidas"""
+    global _ruta
+    _ruta = ruta
+    cerrar_todas()
+
+def ruta_actual():
+    """Devuelve la ruta de la base de datos en uso"""
+    return _ruta
+
+def usar_fabrica(fabrica):
+    """Cambia la clase de las conexiones compartidas y cierra las abiertas"""
+    global _fabrica
+    _fabrica = fabrica
+    cerrar_todas()
+
+def fabrica_actual():
+    """Devuelve la clase de conexión en uso, decidiéndola en el primer uso"""
+    global _fabrica
+    if _fabrica is None:
+        if os.environ.get(VARIABLE_INSTRUMENTAR, "") not in ("", "0"):
+            # Importado aquí: Instrumentacion depende de este módulo
+            from Instrumentacion import preparar
+            _fabrica = preparar()
+        else:
+            _fabrica = sqlite3.Connection
+    return _fabrica
+
+def instrumentada():
+    """Indica si las conexiones se abren con la instrumentación de consultas"""
+    return fabrica_actual() is not sqlite3.Connection
+
+def _abrir(ruta):
+    """Abre una conexión y le aplica los pragmas de rendimiento"""
+    # Cada conexión pertenece a un hilo; check_same_thread=False solo permite
+    # que cerrar_todas() la cierre desde otro hilo
+    conn = sqlite3.connect(ruta, timeout=TIMEOUT, check_same_thread=False, factory=fabrica_actual())
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    # La primera conexión a cada database la actualiza al esquema vigente
+    with _lock:
+        if ruta not in _migradas:
+            migrate(conn)
+            _migradas.add(ruta)
+    return conn
+
+def obtener_conexion():
+    """Devuelve la conexión del hilo actual, creándola si no existe"""
+    conn = getattr(_local, "conn", None)
+    if conn is not None and _local.epoca == _epoca:
+        return conn
+    conn = _abrir(_ruta)
+    _local.conn = conn
+    _local.epoca = _epoca
+    with _lock:
+        _conexiones.add(conn)
+    return conn
+
+@contextmanager
+def conexion():
+    """Entrega la conexión compartida del hilo para operaciones de lectura"""
+    yield obtener_conexion()
+
+@contextmanager
+def transaccion():
+    """Entrega la conexión del hilo y confirma o revierte al salir"""
+    conn = obtener_conexion()
+    try:
+        yield conn
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+def _descartar(conn):
+    """Cierra una conexión y la quita del registro"""
+    with _lock:
+        _conexiones.discard(conn)
+    try:
+        conn.close()
+    except sqlite3.Error:
+        pass
+
+def cerrar_conexion():
+    """Cierra la conexión del hilo actual"""
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        _local.conn = None
+        _descartar(conn)
+
+def cerrar_todas():
+    """Cierra todas las conexiones abiertas por cualquier hilo"""
+    global _epoca
+    with _lock:
+        _epoca += 1
+        conexiones = list(_conexiones)
+        _conexiones.clear()
+    for conn in conexiones:
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+atexit.register(cerrar_todas)
@@ -0,0 +1,215 @@
+import argparse
+import json
+import shlex
+import sqlite3
+import sys
+from datetime import date
+
+from Conexion import configurar_ruta, obtener_conexion
+from Funciones import (agregar_ingreso, agregar_gasto, obtener_ingresos_pagina, obtener_gastos_pagina,
+                       obtener_resumen_periodo, obtener_total_por_categoria_periodo,
+                       exportar_reportes, calculate_period_dates, a_centavos, TAMANO_PAGINA)
+
+# Uso desde scripts y cron sin la interfaz gráfica: solo se importan Funciones
+# y BD, nunca tkinter ni matplotlib.
+#
+#   python Consola.py gasto Alimentación 12.50 "Pan y leche"
+#   python Consola.py --json resumen --periodo Año
+#   python Consola.py lote < operaciones.txt     (una orden por línea)
+
+PERIODOS = ("Hoy", "Semana", "Mes", "Año", "Todos")
+
+class ErrorOrden(Exception):
+    """La orden no se pudo completar; el mensaje se muestra al usuario"""
+
+def _fecha(valor):
+    """Valida una fecha YYYY-MM-DD para argparse"""
+    try:
+        return date.fromisoformat(valor).isoformat()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"fecha inválida: {valor!r} (se espera YYYY-MM-DD)")
+
+def _monto(valor):
+    """Valida que el monto sea un número positivo que quepa en centavos para argparse"""
+    try:
+        monto = float(valor)
+        a_centavos(monto)
+    except ValueError:
+        monto = -1
+    if not monto >= 0:
+        raise argparse.ArgumentTypeError(f"monto inválido: {valor!r}")
+    return monto
+
+def _positivo(valor):
+    """Valida que el valor sea un entero mayor que cero para argparse"""
+    try:
+        numero = int(valor)
+    except ValueError:
+        numero = 0
+    if numero <= 0:
+        raise argparse.ArgumentTypeError(f"se espera un entero positivo: {valor!r}")
+    return numero
+
+def _tabla(columnas, filas):
+    """Formatea filas como texto en columnas alineadas"""
+    textos = [[f"{v:.2f}" if isinstance(v, float) else str(v) for v in fila] for fila in filas]
+    anchos = [max([len(c)] + [len(fila[i]) for fila in textos]) for i, c in enumerate(columnas)]
+    lineas = ["  ".join(c.ljust(a) for c, a in zip(columnas, anchos))]
+    lineas += ["  ".join(v.ljust(a) for v, a in zip(fila, anchos)) for fila in textos]
+    return "\n".join(lineas)
+
+def orden_gasto(args):
+    nuevo_id = agregar_gasto(args.fecha, args.categoria, args.monto, args.descripcion, args.usuario, args.notas)
+    if nuevo_id is None:
+        raise ErrorOrden("no se pudo guardar el gasto")
+    return {"id": nuevo_id}, f"Gasto {nuevo_id} registrado"
+
+def orden_ingreso(args):
+    nuevo_id = agregar_ingreso(args.fecha, args.monto, args.descripcion, args.usuario, args.notas)
+    if nuevo_id is None:
+        raise ErrorOrden("no se pudo guardar el ingreso")
+    return {"id": nuevo_id}, f"Ingreso {nuevo_id} registrado"
+
+def orden_listar(args):
+    if args.tipo == "ingresos":
+        columnas = ("id", "fecha", "monto", "descripcion", "usuario")
+        filas = obtener_ingresos_pagina(args.periodo, None, args.limite)
+    else:
+        columnas = ("id", "fecha", "categoria", "monto", "descripcion", "usuario")
+        filas = obtener_gastos_pagina(args.periodo, None, args.limite)
+    return [dict(zip(columnas, fila)) for fila in filas], _tabla(columnas, filas)
+
+def orden_resumen(args):
+    inicio, fin = calculate_period_dates(args.periodo)
+    resumen = obtener_resumen_periodo(args.periodo)
+    categorias = obtener_total_por_categoria_periodo(inicio, fin)
+    datos = dict(resumen, periodo=args.periodo, inicio=inicio, fin=fin,
+                 categorias=[{"categoria": c, "total": t} for c, t in categorias])
+    texto = (f"{args.periodo} ({inicio} a {fin})\n"
+             f"Ingresos: ${resumen['ingresos']:.2f} ({resumen['n_ingresos']} movimientos)\n"
+             f"Gastos:   ${resumen['gastos']:.2f} ({resumen['n_gastos']} movimientos)\n"
+             f"Balance:  ${resumen['balance']:.2f}  Ahorro: {resumen['tasa_ahorro']:.1f}%")
+    if categorias:
+        texto += "\n\n" + _tabla(("categoria", "total"), categorias)
+    return datos, texto
+
+def orden_exportar(args):
+    ruta = exportar_reportes(args.periodo, args.tipo, args.salida)
+    if ruta is None:
+        raise ErrorOrden("no se pudo exportar el reporte")
+    return {"ruta": ruta}, f"Reporte exportado a {ruta}"
+
+def orden_importar(args):
+    from Importador import importar_csv, detectar_formato
+
+    formato = args.formato or detectar_formato(args.ruta)
+    if formato is None:
+        raise ErrorOrden(f"no se reconoce el formato de {args.ruta}; indíquelo con --formato")
+    try:
+        resultado = importar_csv(args.ruta, formato)
+    except (OSError, KeyError, ValueError) as ex:
+        raise ErrorOrden(f"no se pudo importar {args.ruta}: {ex}")
+    return resultado, (f"Importados {resultado['ingresos']} ingresos y {resultado['gastos']} gastos "
+                       f"({resultado['omitidas']} filas omitidas)")
+
+def crear_parser():
+    """Arma el parser de las órdenes; también se usa para cada línea de 'lote'"""
+    parser = argparse.ArgumentParser(prog="Consola.py", description="GastoApp desde la línea de comandos")
+    parser.add_argument("--json", action="store_true", help="imprime el resultado como JSON")
+    parser.add_argument("--base", help="ruta de la base de datos (por defecto la de la aplicación)")
+    ordenes = parser.add_subparsers(dest="orden", required=True)
+
+    hoy = date.today().isoformat()
+    gasto = ordenes.add_parser("gasto", help="registra un gasto")
+    gasto.add_argument("categoria")
+    gasto.add_argument("monto", type=_monto)
+    gasto.add_argument("descripcion", nargs="?", default="")
+    gasto.add_argument("--fecha", type=_fecha, default=hoy)
+    gasto.add_argument("--usuario", default="Familia")
+    gasto.add_argument("--notas", default="")
+    gasto.set_defaults(funcion=orden_gasto)
+
+    ingreso = ordenes.add_parser("ingreso", help="registra un ingreso")
+    ingreso.add_argument("monto", type=_monto)
+    ingreso.add_argument("descripcion", nargs="?", default="")
+    ingreso.add_argument("--fecha", type=_fecha, default=hoy)
+    ingreso.add_argument("--usuario", default="Familia")
+    ingreso.add_argument("--notas", default="")
+    ingreso.set_defaults(funcion=orden_ingreso)
+
+    listar = ordenes.add_parser("listar", help="muestra los movimientos más recientes")
+    listar.add_argument("tipo", choices=("ingresos", "gastos"))
+    listar.add_argument("--periodo", choices=PERIODOS, default="Mes")
+    listar.add_argument("--limite", type=_positivo, default=TAMANO_PAGINA)
+    listar.set_defaults(funcion=orden_listar)
+
+    resumen = ordenes.add_parser("resumen", help="totales, balance y gastos por categoría")
+    resumen.add_argument("--periodo", choices=PERIODOS, default="Mes")
+    resumen.set_defaults(funcion=orden_resumen)
+
+    exportar = ordenes.add_parser("exportar", help="exporta un período a CSV")
+    exportar.add_argument("--periodo", choices=PERIODOS, default="Todos")
+    exportar.add_argument("--tipo", choices=("ingresos", "gastos", "ambos"), default="ambos")
+    exportar.add_argument("--salida", help="archivo destino; con extensión .gz se comprime")
+    exportar.set_defaults(funcion=orden_exportar)
+
+    importar = ordenes.add_parser("importar", help="importa movimientos desde un CSV")
+    importar.add_argument("ruta")
+    importar.add_argument("--formato", help="formato registrado en Importador (por defecto se detecta)")
+    importar.set_defaults(funcion=orden_importar)
+
+    ordenes.add_parser("lote", help="ejecuta una orden por línea leída de la entrada estándar")
+    return parser
+
+def ejecutar(args):
+    """Ejecuta una orden ya interpretada e imprime su resultado; devuelve el código de salida"""
+    try:
+        # Las lecturas de Funciones devuelven valores vacíos ante un error; abrir la
+        # base primero hace que una base bloqueada o dañada falle aquí
+        obtener_conexion()
+        datos, texto = args.funcion(args)
+    except (ErrorOrden, sqlite3.Error, OSError) as ex:
+        print(f"Error: {ex}", file=sys.stderr)
+        return 1
+    print(json.dumps(datos, ensure_ascii=False) if args.json else texto)
+    return 0
+
+def ejecutar_lote(parser, entrada, como_json):
+    """Ejecuta las órdenes de cada línea en el mismo proceso; devuelve cuántas fallaron
+
+    Las líneas vacías y las que empiezan con # se ignoran. Con --json cada
+    resultado se imprime en su propia línea.
+    """
+    fallidas = 0
+    for numero, linea in enumerate(entrada, 1):
+        linea = linea.strip()
+        if not linea or linea.startswith("#"):
+            continue
+        try:
+            args = parser.parse_args(shlex.split(linea))
+            if args.orden == "lote" or args.base:
+                raise ErrorOrden("'lote' y --base no se admiten dentro de un lote")
+        except SystemExit:
+            # argparse ya mostró el error de la línea
+            print(f"Línea {numero} omitida", file=sys.stderr)
+            fallidas += 1
+            continue
+        except (ErrorOrden, ValueError) as ex:
+            print(f"Línea {numero} omitida: {ex}", file=sys.stderr)
+            fallidas += 1
+            continue
+        args.json = args.json or como_json
+        fallidas += ejecutar(args)
+    return fallidas
+
+def main(argv=None):
+    parser = crear_parser()
+    args = parser.parse_args(argv)
+    if args.base:
+        configurar_ruta(args.base)
+    if args.orden == "lote":
+        return 1 if ejecutar_lote(parser, sys.stdin, args.json) else 0
+    return ejecutar(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
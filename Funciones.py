@@ -1,187 +1,727 @@
 import sqlite3
-import os
 import csv
-from datetime import datetime, timedelta
+import gzip
+import os
+import re
+import threading
+import functools
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, date, timedelta
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+from BD import rebuild_monthly_summary
+from Conexion import conexion, transaccion, obtener_conexion
 
-DB_PATH = os.path.join("MGF", "gastos.db")
+# Caché LRU de las funciones de lectura. Cada escritura incrementa la
+# generación, lo que invalida todo lo guardado hasta entonces.
+CACHE_MAXIMO = 128
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_generacion = 0
+_local = threading.local()
 
 def conectar_db():
-    """Establece conexión con la base de datos"""
-    return sqlite3.connect(DB_PATH)
+    """Devuelve la conexión compartida del hilo actual (no debe cerrarse)"""
+    return obtener_conexion()
 
-def agregar_ingreso(fecha, monto, descripcion, usuario="Familia", notas=""):
-    """Agrega un nuevo ingreso a la base de datos"""
+def invalidar_cache():
+    """Descarta los resultados de lectura guardados en caché"""
+    global _generacion
+    with _cache_lock:
+        _generacion += 1
+        _cache.clear()
+
+def _generacion_actual():
+    """Devuelve la generación vigente, invalidando si otra conexión escribió en la base"""
     conn = conectar_db()
-    cursor = conn.cursor()
+    version = conn.execute("PRAGMA data_version").fetchone()[0]
+    # data_version es propio de cada conexión: se compara con el último visto en
+    # ella. Una conexión recién abierta no sabe si otro proceso escribió después
+    # de que otro hilo llenara la caché, así que su primera consulta también invalida.
+    if getattr(_local, "data_version", None) != (conn, version):
+        invalidar_cache()
+    _local.data_version = (conn, version)
+    return _generacion
+
+def version_datos():
+    """Devuelve un número que cambia con cada escritura en la base, propia o de otro proceso"""
+    return _generacion_actual()
+
+def _error_lectura(mensaje):
+    """Informa un error de lectura y evita que el resultado por defecto quede en caché"""
+    print(mensaje)
+    _local.fallo = True
+
+def cacheado(clave):
+    """Memoriza una función de lectura; clave(*args, **kwargs) da la parte variable de la llave"""
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            llave = (funcion.__name__, clave(*args, **kwargs))
+            try:
+                generacion = _generacion_actual()
+            except sqlite3.Error:
+                return funcion(*args, **kwargs)
+            with _cache_lock:
+                guardado = _cache.get(llave)
+                if guardado is not None and guardado[0] == generacion:
+                    _cache.move_to_end(llave)
+                    return _copia(guardado[1])
+            _local.fallo = False
+            valor = funcion(*args, **kwargs)
+            with _cache_lock:
+                if not _local.fallo and generacion == _generacion:
+                    _cache[llave] = (generacion, valor)
+                    _cache.move_to_end(llave)
+                    while len(_cache) > CACHE_MAXIMO:
+                        _cache.popitem(last=False)
+            return _copia(valor)
+        envoltura.sin_cache = funcion
+        return envoltura
+    return decorador
+
+def _copia(valor):
+    """Copia superficial para que quien llama no modifique el valor en caché"""
+    if isinstance(valor, list):
+        return list(valor)
+    if isinstance(valor, dict):
+        return dict(valor)
+    return valor
+
+# Los montos se guardan en centavos enteros (columna centavos, y total y
+# limite en resumen_mensual y presupuestos); las funciones reciben y
+# devuelven pesos y convierten aquí.
+_CENTAVO = Decimal("0.01")
+
+# Las columnas INTEGER de SQLite son de 64 bits con signo
+MAXIMO_CENTAVOS = 2 ** 63 - 1
+
+def a_centavos(monto):
+    """Convierte un monto en pesos (número o texto) a centavos enteros, redondeando la mitad hacia arriba
+
+    Lanza ValueError si el monto no es un número finito (texto, inf, nan) o si
+    en centavos no cabe en un entero de SQLite.
+    """
     try:
-        cursor.execute('''
-            INSERT INTO ingresos (fecha, monto, descripcion, usuario, notas) 
-            VALUES (?, ?, ?, ?, ?)
-        ''', (fecha, monto, descripcion, usuario, notas))
-        conn.commit()
-        return True
-    except sqlite3.Error as e:
-        print(f"Error al agregar ingreso: {e}")
-        conn.rollback()
-        return False
+        valor = Decimal(str(monto).strip())
+    except InvalidOperation:
+        valor = None
+    if valor is None or not valor.is_finite():
+        raise ValueError(f"monto inválido: {monto!r} (se espera un número finito)")
+    try:
+        centavos = int(valor.quantize(_CENTAVO, rounding=ROUND_HALF_UP) * 100)
+    except InvalidOperation:
+        centavos = None
+    if centavos is None or abs(centavos) > MAXIMO_CENTAVOS:
+        raise ValueError(f"monto fuera de rango: {monto!r}")
+    return centavos
+
+def de_centavos(centavos):
+    """Convierte centavos enteros a pesos"""
+    return centavos / 100
+
+def normalizar_fecha(fecha):
+    """Devuelve la fecha como YYYY-MM-DD (acepta también 2024-1-5); ValueError si no es una fecha
+
+    Una fecha en otro formato dejaría la columna dia en NULL y la fila fuera
+    de los listados, pero contada en resumen_mensual bajo un mes inválido.
+    """
+    try:
+        return datetime.strptime(str(fecha).strip(), "%Y-%m-%d").date().isoformat()
+    except ValueError:
+        raise ValueError(f"fecha inválida: {fecha!r} (se espera YYYY-MM-DD)")
+
+# Ordinal de 1970-01-01, el día 0 de la columna dia
+_EPOCA = date(1970, 1, 1).toordinal()
+
+def dia_numero(fecha):
+    """Convierte una fecha YYYY-MM-DD en el número de día que guarda la columna dia"""
+    return date.fromisoformat(fecha).toordinal() - _EPOCA
+
+def _rango_dias(periodo="Todos"):
+    """Devuelve los números de día de inicio y fin de un período"""
+    start, end = calculate_period_dates(periodo)
+    return dia_numero(start), dia_numero(end)
+
+def _por_periodo(periodo="Todos"):
+    """Llave de caché de las funciones que reciben un período: su rango de fechas"""
+    return calculate_period_dates(periodo)
+
+@contextmanager
+def escritura():
+    """Transacción de escritura que invalida la caché de lecturas al terminar"""
+    try:
+        with transaccion() as conn:
+            yield conn
     finally:
-        conn.close()
+        invalidar_cache()
+
+def agregar_ingreso(fecha, monto, descripcion, usuario="Familia", notas=""):
+    """Agrega un nuevo ingreso a la base de datos y devuelve su id, o None si falla"""
+    try:
+        with escritura() as conn:
+            cursor = conn.execute('''
+                INSERT INTO ingresos (fecha, centavos, descripcion, usuario, notas) 
+                VALUES (?, ?, ?, ?, ?)
+            ''', (normalizar_fecha(fecha), a_centavos(monto), descripcion, usuario, notas))
+        return cursor.lastrowid
+    except (sqlite3.Error, ValueError) as e:
+        print(f"Error al agregar ingreso: {e}")
+        return None
 
 def agregar_gasto(fecha, categoria, monto, descripcion, usuario="Familia", notas=""):
-    """Agrega un nuevo gasto a la base de datos"""
-    conn = conectar_db()
-    cursor = conn.cursor()
+    """Agrega un nuevo gasto a la base de datos y devuelve su id, o None si falla"""
     try:
-        cursor.execute('''
-            INSERT INTO gastos (fecha, categoria, monto, descripcion, usuario, notas) 
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (fecha, categoria, monto, descripcion, usuario, notas))
-        conn.commit()
-        return True
-    except sqlite3.Error as e:
+        with escritura() as conn:
+            cursor = conn.execute('''
+                INSERT INTO gastos (fecha, categoria, centavos, descripcion, usuario, notas) 
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (normalizar_fecha(fecha), categoria, a_centavos(monto), descripcion, usuario, notas))
+        return cursor.lastrowid
+    except (sqlite3.Error, ValueError) as e:
         print(f"Error al agregar gasto: {e}")
-        conn.rollback()
-        return False
-    finally:
-        conn.close()
+        return None
+
+# Valores por defecto de las columnas opcionales, en el orden de inserción
+_DEFECTO_INGRESO = (None, None, None, "Familia", "")
+_DEFECTO_GASTO = (None, None, None, None, "Familia", "")
+
+def _filas_ingreso(ingresos, en_centavos=False):
+    """Completa cada ingreso (fecha, monto, descripcion[, usuario[, notas]]) con los valores por defecto
+
+    La fecha sale normalizada y el monto convertido a centavos, salvo que ya
+    venga en centavos enteros.
+    """
+    convertir = int if en_centavos else a_centavos
+    for ingreso in ingresos:
+        ingreso = tuple(ingreso)
+        yield ((normalizar_fecha(ingreso[0]), convertir(ingreso[1])) + ingreso[2:]
+               + _DEFECTO_INGRESO[len(ingreso):])
+
+def _filas_gasto(gastos, en_centavos=False):
+    """Completa cada gasto (fecha, categoria, monto, descripcion[, usuario[, notas]]) con los valores por defecto
+
+    La fecha sale normalizada y el monto convertido a centavos, salvo que ya
+    venga en centavos enteros.
+    """
+    convertir = int if en_centavos else a_centavos
+    for gasto in gastos:
+        gasto = tuple(gasto)
+        yield ((normalizar_fecha(gasto[0]), gasto[1], convertir(gasto[2])) + gasto[3:]
+               + _DEFECTO_GASTO[len(gasto):])
+
+def insertar_ingresos(conn, ingresos, en_centavos=False):
+    """Inserta ingresos con executemany dentro de la transacción en curso y devuelve cuántos fueron
+
+    Con en_centavos=True los montos ya son centavos enteros, como los que da a_centavos.
+    """
+    cursor = conn.executemany('''
+        INSERT INTO ingresos (fecha, centavos, descripcion, usuario, notas)
+        VALUES (?, ?, ?, ?, ?)
+    ''', _filas_ingreso(ingresos, en_centavos))
+    return cursor.rowcount
+
+def insertar_gastos(conn, gastos, en_centavos=False):
+    """Inserta gastos con executemany dentro de la transacción en curso y devuelve cuántos fueron
+
+    Con en_centavos=True los montos ya son centavos enteros, como los que da a_centavos.
+    """
+    cursor = conn.executemany('''
+        INSERT INTO gastos (fecha, categoria, centavos, descripcion, usuario, notas)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', _filas_gasto(gastos, en_centavos))
+    return cursor.rowcount
+
+def agregar_ingresos_lote(ingresos):
+    """Agrega varios ingresos en una sola transacción; devuelve la cantidad o None si falla"""
+    try:
+        with escritura() as conn:
+            return insertar_ingresos(conn, ingresos)
+    except (sqlite3.Error, ValueError) as e:
+        print(f"Error al agregar lote de ingresos: {e}")
+        return None
+
+def agregar_gastos_lote(gastos):
+    """Agrega varios gastos en una sola transacción; devuelve la cantidad o None si falla"""
+    try:
+        with escritura() as conn:
+            return insertar_gastos(conn, gastos)
+    except (sqlite3.Error, ValueError) as e:
+        print(f"Error al agregar lote de gastos: {e}")
+        return None
 
+@cacheado(_por_periodo)
 def obtener_ingresos(periodo="Todos"):
     """Obtiene ingresos filtrados por período"""
-    conn = conectar_db()
-    cursor = conn.cursor()
-    try:
-        start, end = calculate_period_dates(periodo)
-        cursor.execute('''
-            SELECT fecha, monto, descripcion, usuario 
-            FROM ingresos 
-            WHERE fecha BETWEEN ? AND ?
-            ORDER BY fecha DESC
-        ''', (start, end))
-        return cursor.fetchall()
+    try:
+        with conexion() as conn:
+            cursor = conn.cursor()
+            start, end = _rango_dias(periodo)
+            cursor.execute('''
+                SELECT fecha, monto, descripcion, usuario 
+                FROM ingresos 
+                WHERE dia BETWEEN ? AND ?
+                ORDER BY dia DESC
+            ''', (start, end))
+            return cursor.fetchall()
     except sqlite3.Error as e:
-        print(f"Error al obtener ingresos: {e}")
+        _error_lectura(f"Error al obtener ingresos: {e}")
         return []
-    finally:
-        conn.close()
 
+@cacheado(_por_periodo)
 def obtener_gastos(periodo="Todos"):
     """Obtiene gastos filtrados por período"""
-    conn = conectar_db()
-    cursor = conn.cursor()
-    try:
-        start, end = calculate_period_dates(periodo)
-        cursor.execute('''
-            SELECT fecha, categoria, monto, descripcion, usuario 
-            FROM gastos 
-            WHERE fecha BETWEEN ? AND ?
-            ORDER BY fecha DESC
-        ''', (start, end))
-        return cursor.fetchall()
+    try:
+        with conexion() as conn:
+            cursor = conn.cursor()
+            start, end = _rango_dias(periodo)
+            cursor.execute('''
+                SELECT fecha, categoria, monto, descripcion, usuario 
+                FROM gastos 
+                WHERE dia BETWEEN ? AND ?
+                ORDER BY dia DESC
+            ''', (start, end))
+            return cursor.fetchall()
     except sqlite3.Error as e:
-        print(f"Error al obtener gastos: {e}")
+        _error_lectura(f"Error al obtener gastos: {e}")
         return []
-    finally:
-        conn.close()
 
+def _dividir_rango(inicio, fin):
+    """Separa [inicio, fin] en meses completos y los días sueltos de los bordes
+
+    Devuelve (mes_desde, mes_hasta, bordes) o None si el rango no cubre ningún
+    mes completo o sus fechas no son ISO.
+    """
+    try:
+        desde = date.fromisoformat(inicio)
+        hasta = date.fromisoformat(fin)
+    except (TypeError, ValueError):
+        return None
+    primero = desde if desde.day == 1 else (desde.replace(day=28) + timedelta(days=4)).replace(day=1)
+    limite = (hasta + timedelta(days=1)).replace(day=1)
+    if primero >= limite:
+        return None
+    bordes = []
+    if desde < primero:
+        bordes.append((inicio, (primero - timedelta(days=1)).isoformat()))
+    if limite <= hasta:
+        bordes.append((limite.isoformat(), fin))
+    return primero.strftime("%Y-%m"), (limite - timedelta(days=1)).strftime("%Y-%m"), bordes
+
+def _origen_movimientos(tipo, inicio, fin):
+    """Arma una subconsulta (categoria, total, cantidad) de los movimientos de [inicio, fin], con total en centavos
+
+    Los meses completos se leen de resumen_mensual y solo los bordes del rango
+    recorren la tabla original, así el costo depende del número de meses.
+    """
+    # Con dia virtual el planificador no ve que el índice con centavos cubre
+    # la consulta y elige el de solo (dia), que obliga a leer cada fila
+    if tipo == "gasto":
+        tabla, categoria = "gastos INDEXED BY idx_gastos_dia_categoria_centavos", "categoria"
+    else:
+        tabla, categoria = "ingresos INDEXED BY idx_ingresos_dia_centavos", "''"
+    crudo = f"SELECT {categoria} AS categoria, centavos AS total, 1 AS cantidad FROM {tabla} WHERE dia BETWEEN ? AND ?"
+    division = _dividir_rango(inicio, fin)
+    if division is None:
+        return crudo, [dia_numero(inicio), dia_numero(fin)]
+    mes_desde, mes_hasta, bordes = division
+    partes = ["SELECT categoria, total, cantidad FROM resumen_mensual WHERE tipo = ? AND mes BETWEEN ? AND ?"]
+    params = [tipo, mes_desde, mes_hasta]
+    for borde_inicio, borde_fin in bordes:
+        partes.append(crudo)
+        params += [dia_numero(borde_inicio), dia_numero(borde_fin)]
+    return " UNION ALL ".join(partes), params
+
+def reconstruir_resumen_mensual():
+    """Recalcula la tabla resumen_mensual desde los movimientos"""
+    try:
+        with escritura() as conn:
+            rebuild_monthly_summary(conn)
+        return True
+    except sqlite3.Error as e:
+        print(f"Error al reconstruir resumen mensual: {e}")
+        return False
+
+# Filas por página de las tablas de movimientos
+TAMANO_PAGINA = 200
+
+def _por_pagina(periodo="Todos", despues=None, limite=TAMANO_PAGINA):
+    """Llave de caché de las funciones paginadas"""
+    return calculate_period_dates(periodo), despues, limite
+
+def _limites_pagina(periodo, despues):
+    """Devuelve (inicio, fin, dia, id) en números de día, acotando el rango al punto de continuación"""
+    start, end = _rango_dias(periodo)
+    if despues is None:
+        return start, end, None, None
+    fecha, ultimo_id = despues
+    dia = dia_numero(fecha)
+    return start, min(end, dia), dia, ultimo_id
+
+@cacheado(_por_pagina)
+def obtener_ingresos_pagina(periodo="Todos", despues=None, limite=TAMANO_PAGINA):
+    """Obtiene una página de ingresos (id, fecha, monto, descripcion, usuario) posterior a la clave (fecha, id)"""
+    try:
+        with conexion() as conn:
+            cursor = conn.cursor()
+            start, end, dia, ultimo_id = _limites_pagina(periodo, despues)
+            cursor.execute('''
+                SELECT id, fecha, monto, descripcion, usuario
+                FROM ingresos
+                WHERE dia BETWEEN ? AND ?
+                  AND (? IS NULL OR (dia, id) < (?, ?))
+                ORDER BY dia DESC, id DESC
+                LIMIT ?
+            ''', (start, end, dia, dia, ultimo_id, limite))
+            return cursor.fetchall()
+    except sqlite3.Error as e:
+        _error_lectura(f"Error al obtener página de ingresos: {e}")
+        return []
+
+@cacheado(_por_pagina)
+def obtener_gastos_pagina(periodo="Todos", despues=None, limite=TAMANO_PAGINA):
+    """Obtiene una página de gastos (id, fecha, categoria, monto, descripcion, usuario) posterior a la clave (fecha, id)"""
+    try:
+        with conexion() as conn:
+            cursor = conn.cursor()
+            start, end, dia, ultimo_id = _limites_pagina(periodo, despues)
+            cursor.execute('''
+                SELECT id, fecha, categoria, monto, descripcion, usuario
+                FROM gastos
+                WHERE dia BETWEEN ? AND ?
+                  AND (? IS NULL OR (dia, id) < (?, ?))
+                ORDER BY dia DESC, id DESC
+                LIMIT ?
+            ''', (start, end, dia, dia, ultimo_id, limite))
+            return cursor.fetchall()
+    except sqlite3.Error as e:
+        _error_lectura(f"Error al obtener página de gastos: {e}")
+        return []
+
+# Resultados que devuelve como máximo una búsqueda
+LIMITE_BUSQUEDA = 200
+
+def _consulta_fts(texto):
+    """Convierte el texto escrito por el usuario en una consulta FTS5 segura
+
+    Cada palabra se busca como prefijo y todas deben aparecer, así la
+    sintaxis de FTS5 (comillas, operadores) no produce errores.
+    """
+    palabras = re.findall(r"\w+", texto)
+    return " ".join(f'"{palabra}"*' for palabra in palabras)
+
+def buscar_transacciones(query, periodo="Todos", limit=LIMITE_BUSQUEDA, tipo="ambos"):
+    """Busca movimientos por descripción y notas, ordenados por relevancia
+
+    Devuelve filas (tipo, id, fecha, categoria, monto, descripcion, usuario)
+    donde tipo es 'ingreso' o 'gasto' y categoria es '' para los ingresos.
+    """
+    consulta = _consulta_fts(query)
+    if not consulta:
+        return []
+    start, end = _rango_dias(periodo)
+    # bm25 da más peso a la descripción que a las notas
+    partes, parametros = [], []
+    if tipo in ("ambos", "ingresos"):
+        partes.append("""
+            SELECT 'ingreso', i.id, i.fecha, '', i.monto, i.descripcion, i.usuario,
+                   bm25(busqueda_ingresos, 2.0, 1.0) AS rango
+            FROM busqueda_ingresos
+            JOIN ingresos i ON i.id = busqueda_ingresos.rowid
+            WHERE busqueda_ingresos MATCH ? AND i.dia BETWEEN ? AND ?""")
+        parametros += [consulta, start, end]
+    if tipo in ("ambos", "gastos"):
+        partes.append("""
+            SELECT 'gasto', g.id, g.fecha, g.categoria, g.monto, g.descripcion, g.usuario,
+                   bm25(busqueda_gastos, 2.0, 1.0) AS rango
+            FROM busqueda_gastos
+            JOIN gastos g ON g.id = busqueda_gastos.rowid
+            WHERE busqueda_gastos MATCH ? AND g.dia BETWEEN ? AND ?""")
+        parametros += [consulta, start, end]
+    try:
+        with conexion() as conn:
+            cursor = conn.execute(" UNION ALL ".join(partes) + " ORDER BY rango, 3 DESC LIMIT ?",
+                                  (*parametros, limit))
+            return [fila[:7] for fila in cursor]
+    except sqlite3.Error as e:
+        print(f"Error al buscar movimientos: {e}")
+        return []
+
+@cacheado(_por_periodo)
 def obtener_total_gastos(periodo="Todos"):
     """Calcula el total de gastos para un período"""
-    conn = conectar_db()
-    cursor = conn.cursor()
-    try:
-        start, end = calculate_period_dates(periodo)
-        cursor.execute('''
-            SELECT SUM(monto) 
-            FROM gastos 
-            WHERE fecha BETWEEN ? AND ?
-        ''', (start, end))
-        total = cursor.fetchone()[0] or 0.0
-        return float(total)
+    try:
+        with conexion() as conn:
+            cursor = conn.cursor()
+            start, end = calculate_period_dates(periodo)
+            origen, params = _origen_movimientos("gasto", start, end)
+            cursor.execute(f'''
+                SELECT SUM(total) 
+                FROM ({origen})
+            ''', params)
+            return de_centavos(cursor.fetchone()[0] or 0)
     except sqlite3.Error as e:
-        print(f"Error al calcular total de gastos: {e}")
+        _error_lectura(f"Error al calcular total de gastos: {e}")
         return 0.0
-    finally:
-        conn.close()
 
+@cacheado(lambda inicio, fin: (inicio, fin))
 def obtener_total_por_categoria_periodo(inicio, fin):
     """Obtiene gastos agrupados por categoría en un período"""
-    conn = conectar_db()
-    cursor = conn.cursor()
-    try:
-        cursor.execute('''
-            SELECT categoria, SUM(monto) 
-            FROM gastos 
-            WHERE fecha BETWEEN ? AND ? 
-            GROUP BY categoria
-            ORDER BY SUM(monto) DESC
-        ''', (inicio, fin))
-        return cursor.fetchall()
+    try:
+        with conexion() as conn:
+            cursor = conn.cursor()
+            origen, params = _origen_movimientos("gasto", inicio, fin)
+            cursor.execute(f'''
+                SELECT categoria, SUM(total) 
+                FROM ({origen}) 
+                GROUP BY categoria
+                ORDER BY SUM(total) DESC
+            ''', params)
+            return [(categoria, de_centavos(total)) for categoria, total in cursor]
+    except (sqlite3.Error, ValueError) as e:
+        # ValueError: inicio o fin no son fechas YYYY-MM-DD
+        _error_lectura(f"Error al obtener gastos por categoría: {e}")
+        return []
+
+@cacheado(_por_periodo)
+def obtener_resumen_periodo(periodo="Mes"):
+    """Obtiene totales, balance, tasa de ahorro y cantidad de movimientos de un período"""
+    resumen = {"ingresos": 0.0, "gastos": 0.0, "balance": 0.0, "tasa_ahorro": 0.0,
+               "n_ingresos": 0, "n_gastos": 0}
+    try:
+        with conexion() as conn:
+            cursor = conn.cursor()
+            start, end = calculate_period_dates(periodo)
+            origen_ing, params_ing = _origen_movimientos("ingreso", start, end)
+            origen_gas, params_gas = _origen_movimientos("gasto", start, end)
+            cursor.execute(f'''
+                SELECT i.total, i.cantidad, g.total, g.cantidad
+                FROM (SELECT COALESCE(SUM(total), 0) AS total, COALESCE(SUM(cantidad), 0) AS cantidad
+                      FROM ({origen_ing})) AS i,
+                     (SELECT COALESCE(SUM(total), 0) AS total, COALESCE(SUM(cantidad), 0) AS cantidad
+                      FROM ({origen_gas})) AS g
+            ''', params_ing + params_gas)
+            ingresos, n_ingresos, gastos, n_gastos = cursor.fetchone()
+    except sqlite3.Error as e:
+        _error_lectura(f"Error al obtener resumen del período: {e}")
+        return resumen
+    # Se resta en centavos para que el balance también sea exacto
+    balance = ingresos - gastos
+    resumen.update(ingresos=de_centavos(ingresos), gastos=de_centavos(gastos), balance=de_centavos(balance),
+                   tasa_ahorro=(balance / ingresos * 100) if ingresos > 0 else 0.0,
+                   n_ingresos=n_ingresos, n_gastos=n_gastos)
+    return resumen
+
+def establecer_presupuesto(categoria, mes, limite):
+    """Crea o reemplaza el límite de gasto de una categoría en un mes (YYYY-MM)"""
+    try:
+        with escritura() as conn:
+            conn.execute('''
+                INSERT INTO presupuestos (categoria, mes, limite) VALUES (?, ?, ?)
+                ON CONFLICT (categoria, mes) DO UPDATE SET limite = excluded.limite
+            ''', (categoria, mes, a_centavos(limite)))
+        return True
+    except (sqlite3.Error, ValueError) as e:
+        print(f"Error al establecer presupuesto: {e}")
+        return False
+
+def eliminar_presupuesto(categoria, mes):
+    """Elimina el límite de gasto de una categoría en un mes"""
+    try:
+        with escritura() as conn:
+            conn.execute("DELETE FROM presupuestos WHERE categoria = ? AND mes = ?", (categoria, mes))
+        return True
+    except sqlite3.Error as e:
+        print(f"Error al eliminar presupuesto: {e}")
+        return False
+
+def verificar_presupuesto(categoria, fecha):
+    """Compara lo gastado en la categoría durante el mes de la fecha con su presupuesto
+
+    Devuelve {limite, gastado, restante, excedido}, o None si la categoría no
+    tiene presupuesto ese mes. Lee solo la fila del presupuesto y las del
+    resumen mensual, sin volver a sumar los gastos. Lanza ValueError si la
+    fecha no es válida, en lugar de devolver None como si no hubiera presupuesto.
+    """
+    mes = normalizar_fecha(fecha)[:7]
+    try:
+        with conexion() as conn:
+            fila = conn.execute('''
+                SELECT p.limite,
+                       (SELECT COALESCE(SUM(r.total), 0) FROM resumen_mensual r
+                        WHERE r.tipo = 'gasto' AND r.mes = p.mes AND r.categoria = p.categoria)
+                FROM presupuestos p
+                WHERE p.categoria = ? AND p.mes = ?
+            ''', (categoria, mes)).fetchone()
+    except sqlite3.Error as e:
+        print(f"Error al verificar presupuesto: {e}")
+        return None
+    if fila is None:
+        return None
+    limite, gastado = fila
+    return {"limite": de_centavos(limite), "gastado": de_centavos(gastado),
+            "restante": de_centavos(limite - gastado), "excedido": gastado > limite}
+
+@cacheado(lambda mes: mes)
+def obtener_presupuestos(mes):
+    """Obtiene (categoria, limite, gastado) de los presupuestos de un mes"""
+    try:
+        with conexion() as conn:
+            filas = conn.execute('''
+                SELECT p.categoria, p.limite,
+                       (SELECT COALESCE(SUM(r.total), 0) FROM resumen_mensual r
+                        WHERE r.tipo = 'gasto' AND r.mes = p.mes AND r.categoria = p.categoria)
+                FROM presupuestos p
+                WHERE p.mes = ?
+                ORDER BY p.categoria
+            ''', (mes,)).fetchall()
     except sqlite3.Error as e:
-        print(f"Error al obtener gastos por categoría: {e}")
+        _error_lectura(f"Error al obtener presupuestos: {e}")
         return []
-    finally:
-        conn.close()
+    return [(categoria, de_centavos(limite), de_centavos(gastado)) for categoria, limite, gastado in filas]
 
-def exportar_reportes(periodo="Todos", tipo="ambos"):
-    """Exporta datos a CSV"""
-    inicio, fin = calculate_period_dates(periodo)
-    conn = conectar_db()
-    cursor = conn.cursor()
+# Fecha desde la que se cuentan los períodos (Mes, Año, últimos meses); con
+# None es la del sistema. El benchmark la fija para medir siempre la misma
+# ventana de datos.
+_fecha_fija = None
+
+def fijar_fecha_actual(fecha):
+    """Fija la fecha de referencia de los períodos; None vuelve a la del sistema"""
+    global _fecha_fija
+    _fecha_fija = fecha
+
+def fecha_actual():
+    """Devuelve la fecha de referencia de los períodos"""
+    return _fecha_fija or datetime.now().date()
+
+def meses_recientes(n_meses, hoy=None):
+    """Devuelve los últimos n meses como "YYYY-MM", del más antiguo al de hoy (por defecto, fecha_actual())"""
+    hoy = hoy or fecha_actual()
+    indice = hoy.year * 12 + hoy.month - 1
+    return [f"{i // 12}-{i % 12 + 1:02d}" for i in range(indice - n_meses + 1, indice + 1)]
+
+@cacheado(lambda n_meses=12: tuple(meses_recientes(n_meses)))
+def obtener_tendencia_mensual(n_meses=12):
+    """Obtiene ingresos y gastos por mes de los últimos n meses en una sola consulta"""
+    meses = meses_recientes(n_meses)
+    totales = {mes: (0.0, 0.0) for mes in meses}
+    try:
+        with conexion() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT mes,
+                       SUM(CASE WHEN tipo = 'ingreso' THEN total ELSE 0 END),
+                       SUM(CASE WHEN tipo = 'gasto' THEN total ELSE 0 END)
+                FROM resumen_mensual
+                WHERE tipo IN ('ingreso', 'gasto') AND mes BETWEEN ? AND ?
+                GROUP BY mes
+            ''', (meses[0], meses[-1]))
+            for mes, ingreso, gasto in cursor.fetchall():
+                if mes in totales:
+                    totales[mes] = (de_centavos(ingreso or 0), de_centavos(gasto or 0))
+    except sqlite3.Error as e:
+        _error_lectura(f"Error al obtener tendencia mensual: {e}")
+    return [(mes, *totales[mes]) for mes in meses]
+
+# Filas que se leen del cursor y se escriben en cada bloque de la exportación
+TAMANO_BLOQUE_EXPORTACION = 1000
+
+# Nombre de archivo por defecto de cada tipo de reporte
+ARCHIVOS_REPORTE = {
+    "ingresos": "reporte_ingresos.csv",
+    "gastos": "reporte_gastos.csv",
+    "ambos": "reporte_completo.csv",
+}
+
+def exportar_reportes(periodo="Todos", tipo="ambos", ruta=None, comprimir=None,
+                      progreso=None, tamano_bloque=TAMANO_BLOQUE_EXPORTACION):
+    """Exporta datos a CSV por bloques, sin cargar todo el período en memoria
+
+    Sin ruta se escribe el archivo por defecto del tipo en el directorio
+    actual. comprimir indica si se usa gzip; por defecto, si la ruta termina
+    en .gz. progreso(filas, fraccion) se llama tras cada bloque escrito.
+    """
+    inicio, fin = _rango_dias(periodo)
+    ruta = ruta or ARCHIVOS_REPORTE.get(tipo, ARCHIVOS_REPORTE["ambos"])
+    if comprimir is None:
+        comprimir = ruta.lower().endswith(".gz")
     
     try:
-        if tipo == "ingresos":
-            query = """
-                SELECT fecha, monto, descripcion, usuario, notas
-                FROM ingresos
-                WHERE fecha BETWEEN ? AND ?
-                ORDER BY fecha
-            """
-            cursor.execute(query, (inicio, fin))
-            filename = "reporte_ingresos.csv"
-        elif tipo == "gastos":
-            query = """
-                SELECT fecha, categoria, monto, descripcion, usuario, notas
-                FROM gastos
-                WHERE fecha BETWEEN ? AND ?
-                ORDER BY fecha
-            """
-            cursor.execute(query, (inicio, fin))
-            filename = "reporte_gastos.csv"
-        else:
-            query = """
-                SELECT i.fecha, 'Ingreso', i.monto, i.descripcion, i.usuario, i.notas
-                FROM ingresos i
-                WHERE i.fecha BETWEEN ? AND ?
-                UNION ALL
-                SELECT g.fecha, 'Gasto', g.monto, g.descripcion, g.usuario, g.notas
-                FROM gastos g
-                WHERE g.fecha BETWEEN ? AND ?
-                ORDER BY fecha
-            """
-            cursor.execute(query, (inicio, fin, inicio, fin))
-            filename = "reporte_completo.csv"
-        
-        rows = cursor.fetchall()
-        
-        with open(filename, "w", newline="", encoding="utf-8") as f:
-            writer = csv.writer(f)
+        with conexion() as conn:
+            cursor = conn.cursor()
             if tipo == "ingresos":
-                writer.writerow(["Fecha", "Monto", "Descripción", "Usuario", "Notas"])
+                query = """
+                    SELECT fecha, monto, descripcion, usuario, notas
+                    FROM ingresos
+                    WHERE dia BETWEEN ? AND ?
+                    ORDER BY dia
+                """
+                cursor.execute(query, (inicio, fin))
+                encabezado = ["Fecha", "Monto", "Descripción", "Usuario", "Notas"]
             elif tipo == "gastos":
-                writer.writerow(["Fecha", "Categoría", "Monto", "Descripción", "Usuario", "Notas"])
+                query = """
+                    SELECT fecha, categoria, monto, descripcion, usuario, notas
+                    FROM gastos
+                    WHERE dia BETWEEN ? AND ?
+                    ORDER BY dia
+                """
+                cursor.execute(query, (inicio, fin))
+                encabezado = ["Fecha", "Categoría", "Monto", "Descripción", "Usuario", "Notas"]
             else:
-                writer.writerow(["Fecha", "Tipo", "Monto", "Descripción", "Usuario", "Notas"])
-            writer.writerows(rows)
+                query = """
+                    SELECT fecha, tipo, monto, descripcion, usuario, notas
+                    FROM (SELECT i.dia, i.fecha, 'Ingreso' AS tipo, i.monto, i.descripcion, i.usuario, i.notas
+                          FROM ingresos i
+                          WHERE i.dia BETWEEN ? AND ?
+                          UNION ALL
+                          SELECT g.dia, g.fecha, 'Gasto', g.monto, g.descripcion, g.usuario, g.notas
+                          FROM gastos g
+                          WHERE g.dia BETWEEN ? AND ?)
+                    ORDER BY dia
+                """
+                cursor.execute(query, (inicio, fin, inicio, fin))
+                encabezado = ["Fecha", "Tipo", "Monto", "Descripción", "Usuario", "Notas"]
+            
+            # El total de filas sale del resumen mensual, sin recorrer la consulta
+            total = None
+            if progreso:
+                resumen = obtener_resumen_periodo(periodo)
+                total = ((resumen["n_ingresos"] if tipo != "gastos" else 0)
+                         + (resumen["n_gastos"] if tipo != "ingresos" else 0))
+            
+            abrir = gzip.open if comprimir else open
+            escritas = 0
+            f = abrir(ruta, "wt", newline="", encoding="utf-8")
+            try:
+                with f:
+                    writer = csv.writer(f)
+                    writer.writerow(encabezado)
+                    while True:
+                        rows = cursor.fetchmany(tamano_bloque)
+                        if not rows:
+                            break
+                        writer.writerows(rows)
+                        escritas += len(rows)
+                        if progreso:
+                            progreso(escritas, min(escritas / total, 1.0) if total else 1.0)
+            except BaseException:
+                # No deja un archivo a medio escribir
+                os.remove(ruta)
+                raise
+            finally:
+                cursor.close()
         
-        return filename
+            if progreso:
+                progreso(escritas, 1.0)
+            return ruta
     except Exception as e:
         print(f"Error al exportar reporte: {e}")
         return None
-    finally:
-        conn.close()
 
 def calculate_period_dates(period):
     """Calcula fechas de inicio y fin para un período dado"""
-    today = datetime.now().date()
+    today = fecha_actual()
     if period == "Hoy":
         start = today.strftime("%Y-%m-%d")
         end = (today + timedelta(days=1)).strftime("%Y-%m-%d")
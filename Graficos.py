@@ -0,0 +1,296 @@
+import math
+
+from matplotlib import colormaps
+
+# Color de los bordes de barras y porciones
+BORDE = "#E5E7EB"
+
+class Grafico:
+    """Gráfico que conserva sus ejes y artistas entre actualizaciones
+
+    Las actualizaciones con la misma cantidad de elementos solo cambian los
+    datos de los artistas existentes y usan draw_idle; la figura se reconstruye
+    (con tight_layout) únicamente cuando cambia esa cantidad.
+    """
+
+    def __init__(self, fig, canvas, text_color, card_bg):
+        self.fig = fig
+        self.canvas = canvas
+        self.text_color = text_color
+        self.card_bg = card_bg
+        self.ax = None
+        self.forma = None
+
+    def mostrar(self, *datos):
+        """Muestra los datos reutilizando los artistas si la forma (cantidad y etiquetas) no cambió"""
+        forma = self.forma_de(*datos)
+        if forma is None:
+            self.vacio()
+            return
+        if forma != self.forma:
+            self.fig.clear()
+            self.ax = self.fig.add_subplot(111)
+            self.construir(*datos)
+            self.forma = forma
+            self.fig.tight_layout()
+        else:
+            self.actualizar(*datos)
+        self.canvas.draw_idle()
+
+    def vacio(self):
+        """Muestra el aviso de que no hay datos"""
+        self.fig.clear()
+        self.ax = self.fig.add_subplot(111)
+        self.ax.text(0.5, 0.5, 'No hay datos para mostrar',
+                     horizontalalignment='center', verticalalignment='center',
+                     transform=self.ax.transAxes, fontsize=12, color=self.text_color)
+        self.forma = None
+        self.canvas.draw_idle()
+
+    def estilo_ejes(self, eje_grilla, rotacion=0):
+        """Aplica el estilo común de ejes, fondo y grilla"""
+        self.ax.tick_params(axis='x', rotation=rotacion, colors=self.text_color)
+        self.ax.tick_params(axis='y', colors=self.text_color)
+        self.ax.set_facecolor(self.card_bg)
+        self.ax.grid(True, axis=eje_grilla, linestyle="--", alpha=0.4)
+
+    def reescalar(self):
+        """Ajusta los límites de los ejes a los datos actuales"""
+        self.ax.relim()
+        # Versiones anteriores de matplotlib no recorren las colecciones en relim(),
+        # así que las áreas de fill_between se suman a mano antes de autoescalar
+        for coleccion in self.ax.collections:
+            self.ax.update_datalim(coleccion.get_datalim(self.ax.transData).get_points())
+        self.ax.autoscale_view()
+
+    def forma_de(self, *datos):
+        raise NotImplementedError
+
+    def construir(self, *datos):
+        raise NotImplementedError
+
+    def actualizar(self, *datos):
+        raise NotImplementedError
+
+class GraficoBarras(Grafico):
+    """Barras por categoría con su monto como etiqueta, verticales u horizontales
+
+    limites, si se indica, trae un límite por barra (o None) que se marca sobre
+    ella; las barras que lo superan se pintan con color_exceso.
+    """
+
+    def __init__(self, fig, canvas, text_color, card_bg, colores, horizontal=False,
+                 etiqueta_categoria=None, color_limite=None, color_exceso=None):
+        super().__init__(fig, canvas, text_color, card_bg)
+        self.colores = colores
+        self.horizontal = horizontal
+        self.etiqueta_categoria = etiqueta_categoria
+        self.color_limite = color_limite or text_color
+        self.color_exceso = color_exceso
+        self.barras = []
+        self.etiquetas = []
+        self.marcas = None
+
+    def forma_de(self, totales, titulo, limites=None):
+        # Con otras categorías se rearma aunque la cantidad de barras sea la misma
+        return tuple(categoria for categoria, _ in totales) or None
+
+    def construir(self, totales, titulo, limites=None):
+        categorias, montos = zip(*totales)
+        posiciones = range(len(montos))
+        colores = self.colores(len(montos))
+        if self.horizontal:
+            self.barras = self.ax.barh(posiciones, montos, color=colores, edgecolor=BORDE, linewidth=1)
+            self.ax.set_xlabel("Monto ($)", fontsize=12, color=self.text_color)
+            self.estilo_ejes("x")
+        else:
+            self.barras = self.ax.bar(posiciones, montos, color=colores, edgecolor=BORDE, linewidth=1)
+            self.ax.set_xlabel(self.etiqueta_categoria, fontsize=12, color=self.text_color)
+            self.ax.set_ylabel("Monto ($)", fontsize=12, color=self.text_color)
+            self.estilo_ejes("y", rotacion=45)
+        self.ax.set_title(titulo, fontsize=16, pad=20, color=self.text_color)
+
+        self.etiquetas = []
+        for barra in self.barras:
+            if self.horizontal:
+                texto = self.ax.text(0, 0, "", ha='left', va='center', color=self.text_color, fontsize=10)
+            else:
+                texto = self.ax.text(0, 0, "", ha='center', va='bottom', color=self.text_color, fontsize=10)
+            self.etiquetas.append(texto)
+        self.marcas, = self.ax.plot([], [], linestyle='none', marker='|' if self.horizontal else '_',
+                                    markersize=24, markeredgewidth=3, color=self.color_limite,
+                                    label='Presupuesto')
+        self.actualizar(totales, titulo, limites)
+
+    def actualizar(self, totales, titulo, limites=None):
+        categorias, montos = zip(*totales)
+        posiciones = range(len(montos))
+        if self.horizontal:
+            self.ax.set_yticks(posiciones, labels=categorias)
+        else:
+            self.ax.set_xticks(posiciones, labels=categorias)
+        for barra, texto, monto in zip(self.barras, self.etiquetas, montos):
+            if self.horizontal:
+                barra.set_width(monto)
+                texto.set_position((monto, barra.get_y() + barra.get_height() / 2.))
+            else:
+                barra.set_height(monto)
+                texto.set_position((barra.get_x() + barra.get_width() / 2., monto))
+            texto.set_text(f'${monto:.2f}')
+        self.marcar_limites(montos, limites)
+        self.ax.set_title(titulo, fontsize=16, pad=20, color=self.text_color)
+        self.reescalar()
+
+    def marcar_limites(self, montos, limites):
+        """Ubica las marcas de límite y resalta las barras que lo superan"""
+        limites = limites or [None] * len(montos)
+        colores = self.colores(len(montos))
+        posiciones, valores = [], []
+        for posicion, (barra, monto, limite) in enumerate(zip(self.barras, montos, limites)):
+            excedida = limite is not None and monto > limite and self.color_exceso
+            barra.set_facecolor(self.color_exceso if excedida else colores[posicion])
+            if limite is not None:
+                posiciones.append(posicion)
+                valores.append(limite)
+        if self.horizontal:
+            self.marcas.set_data(valores, posiciones)
+        else:
+            self.marcas.set_data(posiciones, valores)
+        leyenda = self.ax.get_legend()
+        if valores and leyenda is None:
+            self.ax.legend(handles=[self.marcas], loc='lower right', facecolor=self.card_bg)
+        elif not valores and leyenda is not None:
+            leyenda.remove()
+
+class GraficoCircular(Grafico):
+    """Gráfico circular cuyas porciones se recalculan sin volver a crearlas"""
+
+    # Mismos parámetros que ax.pie(startangle=90, counterclock=False)
+    INICIO = 90
+    DISTANCIA_ETIQUETA = 1.1
+    DISTANCIA_PORCENTAJE = 0.6
+
+    def __init__(self, fig, canvas, text_color, card_bg, colores):
+        super().__init__(fig, canvas, text_color, card_bg)
+        self.colores = colores
+        self.porciones = []
+        self.etiquetas = []
+        self.porcentajes = []
+
+    def forma_de(self, porciones, titulo):
+        return tuple(categoria for categoria, _ in porciones) or None
+
+    def construir(self, porciones, titulo):
+        categorias, montos = zip(*porciones)
+        self.porciones, self.etiquetas, self.porcentajes = self.ax.pie(
+            montos, labels=categorias, colors=self.colores(len(montos)), autopct='%1.1f%%',
+            startangle=self.INICIO, counterclock=False,
+            textprops={'color': self.text_color, 'fontsize': 10})
+        self.ax.set_title(titulo, fontsize=16, pad=20, color=self.text_color)
+        self.ax.axis('equal')
+
+    def actualizar(self, porciones, titulo):
+        categorias, montos = zip(*porciones)
+        total = float(sum(montos)) or 1.0
+        theta1 = self.INICIO / 360.0
+        for porcion, etiqueta, porcentaje, categoria, monto in zip(
+                self.porciones, self.etiquetas, self.porcentajes, categorias, montos):
+            fraccion = monto / total
+            theta2 = theta1 - fraccion
+            porcion.set_theta1(360.0 * min(theta1, theta2))
+            porcion.set_theta2(360.0 * max(theta1, theta2))
+            medio = math.pi * (theta1 + theta2)
+            x, y = math.cos(medio), math.sin(medio)
+            etiqueta.set_position((self.DISTANCIA_ETIQUETA * x, self.DISTANCIA_ETIQUETA * y))
+            etiqueta.set_horizontalalignment('left' if x > 0 else 'right')
+            etiqueta.set_text(categoria)
+            porcentaje.set_position((self.DISTANCIA_PORCENTAJE * x, self.DISTANCIA_PORCENTAJE * y))
+            porcentaje.set_text(f"{fraccion * 100:.1f}%")
+            theta1 = theta2
+        self.ax.set_title(titulo, fontsize=16, pad=20, color=self.text_color)
+
+class GraficoTendencia(Grafico):
+    """Líneas de ingresos y gastos por mes con las áreas de superávit y déficit
+
+    Con un pronóstico se agrega la proyección de gastos del mes en curso y del
+    siguiente como línea discontinua con su banda.
+    """
+
+    def __init__(self, fig, canvas, text_color, card_bg, color_ingresos, color_gastos):
+        super().__init__(fig, canvas, text_color, card_bg)
+        self.color_ingresos = color_ingresos
+        self.color_gastos = color_gastos
+        self.linea_ingresos = None
+        self.linea_gastos = None
+        self.linea_pronostico = None
+        self.areas = []
+
+    def forma_de(self, tendencia, titulo, pronostico=None):
+        return len(tendencia) or None
+
+    def construir(self, tendencia, titulo, pronostico=None):
+        posiciones = range(len(tendencia))
+        self.linea_ingresos, = self.ax.plot(posiciones, [0] * len(tendencia), label='Ingresos',
+                                            color=self.color_ingresos, marker='o')
+        self.linea_gastos, = self.ax.plot(posiciones, [0] * len(tendencia), label='Gastos',
+                                          color=self.color_gastos, marker='o')
+        self.linea_pronostico, = self.ax.plot([], [], label='Pronóstico de gastos',
+                                              color=self.color_gastos, marker='o', linestyle='--',
+                                              markerfacecolor='none')
+        self.ax.set_xlabel("Mes", fontsize=12, color=self.text_color)
+        self.ax.set_ylabel("Monto ($)", fontsize=12, color=self.text_color)
+        self.estilo_ejes("y", rotacion=45)
+        self.areas = []
+        self.actualizar(tendencia, titulo, pronostico)
+
+    def actualizar(self, tendencia, titulo, pronostico=None):
+        meses = [mes for mes, _, _ in tendencia]
+        ingresos = [ing for _, ing, _ in tendencia]
+        gastos = [gas for _, _, gas in tendencia]
+        posiciones = range(len(meses))
+        self.linea_ingresos.set_ydata(ingresos)
+        self.linea_gastos.set_ydata(gastos)
+        etiquetas = list(meses)
+
+        # Las áreas no admiten cambiar sus datos: se reemplazan solo ellas
+        for area in self.areas:
+            area.remove()
+        self.areas = [
+            self.ax.fill_between(posiciones, ingresos, gastos,
+                                 where=[i >= g for i, g in zip(ingresos, gastos)],
+                                 interpolate=True, color=self.color_ingresos, alpha=0.2,
+                                 label='Superávit'),
+            self.ax.fill_between(posiciones, ingresos, gastos,
+                                 where=[i < g for i, g in zip(ingresos, gastos)],
+                                 interpolate=True, color=self.color_gastos, alpha=0.2,
+                                 label='Déficit'),
+        ]
+        
+        if pronostico:
+            # Del cierre proyectado del mes en curso al mes siguiente
+            x = [len(meses) - 1, len(meses)]
+            bajo = [pronostico["banda_mes"][0], pronostico["banda_siguiente"][0]]
+            alto = [pronostico["banda_mes"][1], pronostico["banda_siguiente"][1]]
+            self.linea_pronostico.set_data(x, [pronostico["proyeccion_mes"], pronostico["siguiente_mes"]])
+            self.areas.append(self.ax.fill_between(x, bajo, alto, color=self.color_gastos, alpha=0.1,
+                                                   label='Banda de pronóstico'))
+            etiquetas.append(pronostico["mes_siguiente"])
+        else:
+            self.linea_pronostico.set_data([], [])
+        
+        self.ax.set_xticks(range(len(etiquetas)), labels=etiquetas)
+        # La leyenda se rehace porque las áreas se reemplazan en cada actualización
+        self.ax.legend(loc='upper left', facecolor=self.card_bg)
+        self.ax.set_title(titulo, fontsize=16, pad=20, color=self.text_color)
+        self.reescalar()
+
+def paleta(nombre, inicio=None, ancho=None):
+    """Devuelve una función n -> n colores del mapa de colores indicado
+
+    Sin inicio se toman los primeros n colores del mapa (mapas cualitativos);
+    con inicio se reparten n tonos entre inicio e inicio + ancho.
+    """
+    mapa = colormaps[nombre]
+    if inicio is None:
+        return lambda n: mapa(range(n))
+    return lambda n: mapa([inicio + x * ancho / n for x in range(n)])
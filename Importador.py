@@ -0,0 +1,164 @@
+import csv
+import io
+import os
+from datetime import datetime, date
+
+from Funciones import escritura, insertar_ingresos, insertar_gastos, a_centavos
+
+# Filas que se insertan por transacción
+TAMANO_LOTE = 5000
+
+# Formatos de archivo conocidos. "columnas" asocia cada campo con el encabezado
+# del CSV; "tipo" indica cómo decidir si una fila es ingreso o gasto:
+#   "gasto" / "ingreso": todas las filas son de ese tipo
+#   "columna": se lee la columna "tipo" (valores Ingreso/Gasto)
+#   "signo": montos negativos son gastos y positivos ingresos
+FORMATOS = {
+    # Archivos generados por exportar_reportes
+    "gastos": {
+        "columnas": {"fecha": "Fecha", "categoria": "Categoría", "monto": "Monto",
+                     "descripcion": "Descripción", "usuario": "Usuario", "notas": "Notas"},
+        "tipo": "gasto",
+    },
+    "ingresos": {
+        "columnas": {"fecha": "Fecha", "monto": "Monto", "descripcion": "Descripción",
+                     "usuario": "Usuario", "notas": "Notas"},
+        "tipo": "ingreso",
+    },
+    "completo": {
+        "columnas": {"fecha": "Fecha", "tipo": "Tipo", "monto": "Monto",
+                     "descripcion": "Descripción", "usuario": "Usuario", "notas": "Notas"},
+        "tipo": "columna",
+    },
+    # Extracto bancario típico: fecha día/mes/año, coma decimal y cargos negativos
+    "banco": {
+        "delimitador": ";",
+        "columnas": {"fecha": "Fecha", "monto": "Importe", "descripcion": "Concepto"},
+        "tipo": "signo",
+        "formato_fecha": "%d/%m/%Y",
+        "decimal": ",",
+        "miles": ".",
+    },
+}
+
+# Valores usados cuando el formato no indica una opción
+OPCIONES_DEFECTO = {
+    "delimitador": ",",
+    "codificacion": "utf-8-sig",
+    "saltar": 0,
+    "formato_fecha": "%Y-%m-%d",
+    "decimal": ".",
+    "miles": "",
+    "categoria": "Otros",
+    "usuario": "Familia",
+}
+
+def registrar_formato(nombre, columnas, tipo, **opciones):
+    """Registra un formato de banco adicional para importar_csv"""
+    FORMATOS[nombre] = dict(opciones, columnas=columnas, tipo=tipo)
+
+def detectar_formato(ruta):
+    """Devuelve el nombre del formato cuyos encabezados coinciden con el archivo, o None"""
+    for nombre, formato in FORMATOS.items():
+        opciones = dict(OPCIONES_DEFECTO, **formato)
+        with open(ruta, newline="", encoding=opciones["codificacion"], errors="replace") as f:
+            for _ in range(opciones["saltar"]):
+                f.readline()
+            encabezado = next(csv.reader(f, delimiter=opciones["delimitador"]), [])
+        if set(formato["columnas"].values()) == set(encabezado):
+            return nombre
+    return None
+
+def _convertidor_fecha(formato_fecha):
+    """Devuelve una función que normaliza fechas a YYYY-MM-DD"""
+    if formato_fecha == "%Y-%m-%d":
+        return lambda valor: date.fromisoformat(valor.strip()).isoformat()
+    # isoformat rellena con ceros los años de menos de cuatro cifras, strftime no
+    return lambda valor: datetime.strptime(valor.strip(), formato_fecha).date().isoformat()
+
+def _convertidor_monto(decimal, miles):
+    """Devuelve una función que convierte el texto del monto a centavos enteros"""
+    def convertir(valor):
+        valor = valor.strip().replace(" ", "")
+        if miles:
+            valor = valor.replace(miles, "")
+        if decimal != ".":
+            valor = valor.replace(decimal, ".")
+        # Se redondea desde el texto, no desde un float; inf y nan dan ValueError
+        return a_centavos(valor)
+    return convertir
+
+def importar_csv(ruta, formato="gastos", tamano_lote=TAMANO_LOTE, progreso=None):
+    """Importa un CSV por lotes; devuelve cuántos ingresos, gastos y filas omitidas hubo
+
+    formato puede ser el nombre de un formato registrado o un diccionario con
+    las mismas claves. progreso(filas, fraccion) se llama tras cada lote.
+    """
+    if isinstance(formato, str):
+        formato = FORMATOS[formato]
+    opciones = dict(OPCIONES_DEFECTO, **formato)
+    columnas = opciones["columnas"]
+    tipo = opciones["tipo"]
+    a_fecha = _convertidor_fecha(opciones["formato_fecha"])
+    a_centavos_monto = _convertidor_monto(opciones["decimal"], opciones["miles"])
+    categoria_defecto = opciones["categoria"]
+    usuario_defecto = opciones["usuario"]
+
+    resultado = {"ingresos": 0, "gastos": 0, "omitidas": 0}
+    total_bytes = os.path.getsize(ruta) or 1
+    ingresos, gastos = [], []
+    filas = 0
+
+    def volcar():
+        with escritura() as conn:
+            if ingresos:
+                resultado["ingresos"] += insertar_ingresos(conn, ingresos, en_centavos=True)
+            if gastos:
+                resultado["gastos"] += insertar_gastos(conn, gastos, en_centavos=True)
+        ingresos.clear()
+        gastos.clear()
+
+    with open(ruta, "rb") as binario:
+        texto = io.TextIOWrapper(binario, encoding=opciones["codificacion"], newline="")
+        for _ in range(opciones["saltar"]):
+            texto.readline()
+        lector = csv.DictReader(texto, delimiter=opciones["delimitador"])
+        faltantes = {c for c in columnas.values()} - set(lector.fieldnames or [])
+        if faltantes:
+            raise ValueError(f"Columnas faltantes en {ruta}: {', '.join(sorted(faltantes))}")
+
+        for fila in lector:
+            filas += 1
+            try:
+                fecha = a_fecha(fila[columnas["fecha"]])
+                centavos = a_centavos_monto(fila[columnas["monto"]])
+            except (ValueError, TypeError, AttributeError):
+                resultado["omitidas"] += 1
+                continue
+            descripcion = fila.get(columnas.get("descripcion"), "") or ""
+            usuario = fila.get(columnas.get("usuario")) or usuario_defecto
+            notas = fila.get(columnas.get("notas"), "") or ""
+
+            if tipo == "columna":
+                es_gasto = (fila.get(columnas["tipo"]) or "").strip().lower() == "gasto"
+            elif tipo == "signo":
+                es_gasto = centavos < 0
+                centavos = abs(centavos)
+            else:
+                es_gasto = tipo == "gasto"
+
+            if es_gasto:
+                categoria = fila.get(columnas.get("categoria")) or categoria_defecto
+                gastos.append((fecha, categoria, centavos, descripcion, usuario, notas))
+            else:
+                ingresos.append((fecha, centavos, descripcion, usuario, notas))
+
+            if len(ingresos) + len(gastos) >= tamano_lote:
+                volcar()
+                if progreso:
+                    progreso(filas, min(binario.tell() / total_bytes, 1.0))
+
+        volcar()
+        if progreso:
+            progreso(filas, 1.0)
+    return resultado
@@ -0,0 +1,241 @@
+import logging
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import deque
+
+import Conexion
+
+# Con GASTOAPP_INSTRUMENTAR=1 (Conexion.VARIABLE_INSTRUMENTAR) las conexiones
+# se abren instrumentadas desde el arranque; sin ella este módulo no se importa.
+
+# Milisegundos a partir de los cuales una consulta va al registro de lentas
+VARIABLE_UMBRAL = "GASTOAPP_UMBRAL_LENTAS_MS"
+UMBRAL_LENTAS_MS = 50.0
+
+VARIABLE_REGISTRO = "GASTOAPP_REGISTRO_LENTAS"
+REGISTRO_LENTAS = os.path.join("MGF", "consultas_lentas.log")
+
+# Duraciones recientes que se guardan por consulta para calcular el p95
+MUESTRAS = 1000
+
+# Módulos que se saltean al buscar quién hizo la consulta
+_INTERNOS = {__name__, "Conexion", "contextlib", "sqlite3"}
+
+_estadisticas = {}
+_lock = threading.Lock()
+_umbral_ms = float(os.environ.get(VARIABLE_UMBRAL, UMBRAL_LENTAS_MS))
+_registro = logging.getLogger("gastoapp.consultas_lentas")
+_ruta_registro = None
+
+class Estadistica:
+    """Acumulados de una consulta: llamadas, tiempo, filas y errores"""
+    __slots__ = ("origen", "sql", "llamadas", "total_ms", "filas", "errores", "maximo_ms", "muestras")
+
+    def __init__(self, origen, sql):
+        self.origen = origen
+        self.sql = sql
+        self.llamadas = 0
+        self.total_ms = 0.0
+        self.filas = 0
+        self.errores = 0
+        self.maximo_ms = 0.0
+        # Cada muestra es [ms, filas] y sigue creciendo mientras se leen filas del cursor
+        self.muestras = deque(maxlen=MUESTRAS)
+
+    def p95_ms(self):
+        duraciones = sorted(m[0] for m in self.muestras)
+        if not duraciones:
+            return 0.0
+        return duraciones[min(len(duraciones) - 1, int(len(duraciones) * 0.95))]
+
+def _normalizar(sql):
+    return re.sub(r"\s+", " ", sql).strip()
+
+def _origen():
+    """Devuelve modulo.funcion del primer llamador fuera de la capa de conexión"""
+    marco = sys._getframe(2)
+    while marco is not None and marco.f_globals.get("__name__") in _INTERNOS:
+        marco = marco.f_back
+    if marco is None:
+        return "?"
+    return f"{marco.f_globals.get('__name__')}.{marco.f_code.co_name}"
+
+def _estadistica(sql):
+    clave = (_origen(), _normalizar(sql))
+    with _lock:
+        estadistica = _estadisticas.get(clave)
+        if estadistica is None:
+            estadistica = _estadisticas[clave] = Estadistica(*clave)
+    return estadistica
+
+class CursorInstrumentado(sqlite3.Cursor):
+    """Cursor que mide cada consulta, incluido el tiempo de leer sus filas"""
+
+    def execute(self, sql, parametros=()):
+        return self._medir(super().execute, sql, parametros, parametros)
+
+    def executemany(self, sql, parametros):
+        return self._medir(super().executemany, sql, parametros, None)
+
+    def _medir(self, ejecutar, sql, parametros, para_plan):
+        estadistica = _estadistica(sql)
+        inicio = time.perf_counter()
+        try:
+            ejecutar(sql, parametros)
+        except sqlite3.Error as ex:
+            with _lock:
+                estadistica.errores += 1
+            _registro.warning("Error %s en %s: %s", ex, estadistica.origen, estadistica.sql)
+            raise
+        ms = (time.perf_counter() - inicio) * 1000
+        # En INSERT/UPDATE/DELETE rowcount son las filas modificadas; en SELECT es -1
+        filas = max(self.rowcount, 0)
+        self._muestra = [0.0, 0]
+        self._estadistica = estadistica
+        self._plan = (sql, para_plan)
+        self._registrada = False
+        with _lock:
+            estadistica.llamadas += 1
+            estadistica.muestras.append(self._muestra)
+        self._sumar(ms, filas)
+        return self
+
+    def _sumar(self, ms, filas):
+        """Suma tiempo y filas a la consulta en curso y la registra si se volvió lenta
+
+        Se registra al cruzar el umbral, así que en lecturas por bloques el
+        tiempo anotado puede ser menor que el total de la consulta.
+        """
+        muestra = getattr(self, "_muestra", None)
+        if muestra is None:
+            return
+        estadistica = self._estadistica
+        with _lock:
+            muestra[0] += ms
+            muestra[1] += filas
+            estadistica.total_ms += ms
+            estadistica.filas += filas
+            estadistica.maximo_ms = max(estadistica.maximo_ms, muestra[0])
+        if muestra[0] >= _umbral_ms and not self._registrada:
+            self._registrada = True
+            self._registrar_lenta(muestra[0])
+
+    def _registrar_lenta(self, ms):
+        sql, parametros = self._plan
+        plan = "(no disponible para executemany)"
+        if parametros is not None:
+            try:
+                # Se usa la clase base para que el EXPLAIN no se mida a sí mismo
+                filas = sqlite3.Connection.execute(self.connection, "EXPLAIN QUERY PLAN " + sql,
+                                                   parametros).fetchall()
+                plan = "\n".join(f"    {detalle}" for *_, detalle in filas)
+            except sqlite3.Error as ex:
+                plan = f"(no disponible: {ex})"
+        _registro.warning("Consulta lenta (%.1f ms) en %s: %s\n%s", ms, self._estadistica.origen,
+                          self._estadistica.sql, plan)
+
+    def _leer(self, leer, *args):
+        inicio = time.perf_counter()
+        resultado = leer(*args)
+        return resultado, (time.perf_counter() - inicio) * 1000
+
+    def fetchone(self):
+        fila, ms = self._leer(super().fetchone)
+        self._sumar(ms, 0 if fila is None else 1)
+        return fila
+
+    def fetchmany(self, size=None):
+        filas, ms = self._leer(super().fetchmany, self.arraysize if size is None else size)
+        self._sumar(ms, len(filas))
+        return filas
+
+    def fetchall(self):
+        filas, ms = self._leer(super().fetchall)
+        self._sumar(ms, len(filas))
+        return filas
+
+    def __next__(self):
+        inicio = time.perf_counter()
+        try:
+            fila = super().__next__()
+        except StopIteration:
+            self._sumar((time.perf_counter() - inicio) * 1000, 0)
+            raise
+        self._sumar((time.perf_counter() - inicio) * 1000, 1)
+        return fila
+
+class ConexionInstrumentada(sqlite3.Connection):
+    """Conexión cuyos execute y cursores pasan por CursorInstrumentado"""
+
+    def cursor(self, factory=CursorInstrumentado):
+        return super().cursor(factory)
+
+    def execute(self, sql, parametros=()):
+        return self.cursor().execute(sql, parametros)
+
+    def executemany(self, sql, parametros):
+        return self.cursor().executemany(sql, parametros)
+
+def preparar(umbral_ms=None, registro=None):
+    """Configura el umbral y el registro de lentas; devuelve la clase de conexión instrumentada"""
+    global _umbral_ms, _ruta_registro
+    if umbral_ms is not None:
+        _umbral_ms = umbral_ms
+    ruta = registro or os.environ.get(VARIABLE_REGISTRO, REGISTRO_LENTAS)
+    with _lock:
+        if not _registro.handlers:
+            _ruta_registro = ruta
+            directorio = os.path.dirname(ruta)
+            if directorio:
+                os.makedirs(directorio, exist_ok=True)
+            manejador = logging.FileHandler(ruta, encoding="utf-8")
+            manejador.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+            _registro.addHandler(manejador)
+            _registro.setLevel(logging.WARNING)
+            _registro.propagate = False
+    return ConexionInstrumentada
+
+def activar(umbral_ms=None, registro=None):
+    """Instrumenta las conexiones que Conexion abra de aquí en más (reabre las actuales)"""
+    Conexion.usar_fabrica(preparar(umbral_ms, registro))
+
+def desactivar():
+    """Vuelve a abrir conexiones sin instrumentar"""
+    Conexion.usar_fabrica(sqlite3.Connection)
+
+def ruta_registro():
+    """Devuelve el archivo donde se anotan las consultas lentas, o None si aún no se configuró"""
+    return _ruta_registro
+
+def activa():
+    """Indica si las conexiones compartidas se abren instrumentadas"""
+    return Conexion.fabrica_actual() is ConexionInstrumentada
+
+def estadisticas():
+    """Devuelve una fila por consulta, de mayor a menor tiempo total
+
+    Cada fila es {origen, sql, llamadas, total_ms, promedio_ms, p95_ms, maximo_ms, filas, errores}.
+    """
+    with _lock:
+        filas = [{"origen": e.origen, "sql": e.sql, "llamadas": e.llamadas, "total_ms": e.total_ms,
+                  "promedio_ms": e.total_ms / e.llamadas if e.llamadas else 0.0, "p95_ms": e.p95_ms(),
+                  "maximo_ms": e.maximo_ms, "filas": e.filas, "errores": e.errores}
+                 for e in _estadisticas.values()]
+    return sorted(filas, key=lambda f: f["total_ms"], reverse=True)
+
+def reiniciar():
+    """Descarta las estadísticas acumuladas"""
+    with _lock:
+        _estadisticas.clear()
+
+def resumen_texto(limite=20):
+    """Tabla de texto con las consultas que más tiempo consumieron"""
+    lineas = [f"{'total ms':>10} {'llamadas':>9} {'p95 ms':>9} {'filas':>9} {'err':>4}  origen / consulta"]
+    for fila in estadisticas()[:limite]:
+        lineas.append(f"{fila['total_ms']:>10.1f} {fila['llamadas']:>9} {fila['p95_ms']:>9.2f} "
+                      f"{fila['filas']:>9} {fila['errores']:>4}  {fila['origen']}: {fila['sql'][:100]}")
+    return "\n".join(lineas)
@@ -1,20 +1,100 @@
-
-import tkinter as tk
-from tkinter import ttk, messagebox
+import time
+import sys
 import os
 from datetime import datetime
-import matplotlib
-matplotlib.use("TkAgg")
-from matplotlib.figure import Figure
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
-import matplotlib.pyplot as plt
-from Funciones import (agregar_ingreso, agregar_gasto, obtener_ingresos, obtener_gastos,
-                      obtener_total_gastos, obtener_total_por_categoria_periodo, exportar_reportes,
-                      calculate_period_dates)
+
+# Tiempos de cada fase del arranque, mostrados con --profile-startup. La marca
+# inicial se toma antes de las importaciones pesadas para que entren en el
+# informe.
+_marcas = [("inicio", time.perf_counter())]
+
+def marcar(fase):
+    """Registra el fin de una fase del arranque para --profile-startup"""
+    _marcas.append((fase, time.perf_counter()))
+
+import tkinter as tk
+from tkinter import ttk, messagebox, filedialog
+marcar("import tkinter")
+from Funciones import (agregar_ingreso, agregar_gasto,
+                      obtener_total_por_categoria_periodo, exportar_reportes,
+                      calculate_period_dates, obtener_tendencia_mensual,
+                      obtener_resumen_periodo, obtener_ingresos_pagina, obtener_gastos_pagina,
+                      TAMANO_PAGINA, ARCHIVOS_REPORTE, buscar_transacciones,
+                      establecer_presupuesto, eliminar_presupuesto, verificar_presupuesto,
+                      obtener_presupuestos, a_centavos, de_centavos)
+from Importador import importar_csv, detectar_formato
+from Trabajador import Trabajador
+from Respaldo import crear_respaldo, restaurar_respaldo, DIRECTORIO_RESPALDOS
+from Conexion import instrumentada
+marcar("import Funciones, Importador, Trabajador, Respaldo")
 
 # Ruta de la base de datos SQLite
 DB_PATH = os.path.join("MGF", "gastos.db")
 
+# Categorías de gasto que ofrecen los formularios
+CATEGORIAS = ["Alimentación", "Transporte", "Vivienda", "Salud", "Educación", "Entretenimiento",
+              "Ropa", "Otros"]
+
+# Fracción del presupuesto a partir de la cual se avisa que se está por agotar
+AVISO_PRESUPUESTO = 0.9
+
+# Milisegundos de espera tras cambiar un período antes de consultar
+RETRASO_FILTRO = 300
+
+def agrupar_categorias_menores(totales, umbral=0.03):
+    """Agrupa en "Otros" las categorías por debajo del umbral del total"""
+    limite = sum(monto for _, monto in totales) * umbral
+    principales = [(cat, monto) for cat, monto in totales if monto >= limite]
+    otros = sum(monto for _, monto in totales if monto < limite)
+    if otros > 0:
+        principales.append(("Otros", otros))
+    return principales
+
+def barras_con_presupuestos(totales, presupuestos):
+    """Devuelve (totales, limites) del gráfico de resumen, sumando las categorías con presupuesto y sin gastos"""
+    limites = {categoria: limite for categoria, limite, _ in presupuestos}
+    totales = list(totales) + [(c, 0.0) for c in limites if c not in dict(totales)]
+    return totales, [limites.get(c) for c, _ in totales]
+
+def cargar_datos_reportes(periodo):
+    """Consulta y prepara los datos de la pestaña de reportes fuera del hilo de Tk"""
+    # NumPy se importa al cargar los reportes por primera vez, no al iniciar
+    from Analitica import estadisticas_periodo
+    from Pronostico import pronosticar_gastos
+    
+    start, end = calculate_period_dates(periodo)
+    categorias = sorted(obtener_total_por_categoria_periodo(start, end), key=lambda x: x[1], reverse=True)
+    return {
+        "periodo": periodo,
+        "rango": (start, end),
+        "resumen": obtener_resumen_periodo(periodo),
+        "categorias": categorias,
+        "porciones": agrupar_categorias_menores(categorias),
+        "tendencia": obtener_tendencia_mensual(12),
+        "estadisticas": estadisticas_periodo(start, end),
+        "pronostico": pronosticar_gastos(),
+    }
+
+def cargar_datos_resumen():
+    """Consulta y prepara los datos de la pestaña de resumen fuera del hilo de Tk"""
+    from Pronostico import pronosticar_gastos
+    
+    start, end = calculate_period_dates("Mes")
+    categorias = sorted(obtener_total_por_categoria_periodo(start, end), key=lambda x: x[1], reverse=True)
+    return {"rango": (start, end), "resumen": obtener_resumen_periodo("Mes"), "categorias": categorias,
+            "pronostico": pronosticar_gastos(), "presupuestos": obtener_presupuestos(start[:7])}
+
+def cargar_busqueda(tipo, texto, periodo):
+    """Busca movimientos de un tipo y los devuelve con el formato de sus páginas"""
+    filas = buscar_transacciones(texto, periodo, tipo=tipo)
+    if tipo == "ingresos":
+        return [(id_, fecha, monto, desc, usuario) for _, id_, fecha, _, monto, desc, usuario in filas]
+    return [fila[1:] for fila in filas]
+
+def cargar_pagina(obtener_pagina, periodo, despues):
+    """Consulta una página de movimientos y el total del período fuera del hilo de Tk"""
+    return obtener_pagina(periodo, despues), obtener_resumen_periodo(periodo)
+
 class GastoApp:
     def __init__(self, root):
         # Inicializa la ventana principal
@@ -50,6 +130,7 @@ class GastoApp:
 
         # Configura los estilos visuales
         self.setup_styles()
+        marcar("estilos")
         
         # Crea el notebook para las pestañas
         self.notebook = ttk.Notebook(root)
@@ -66,23 +147,57 @@ class GastoApp:
         self.notebook.add(self.reportes_frame, text="Reportes 📈")
         self.notebook.add(self.resumen_frame, text="Resumen 🏆")
 
+        # Estado de la paginación por clave de cada tabla de movimientos
+        self.paginacion = {
+            "ingresos": {"despues": None, "completa": False, "cargadas": 0, "cargando": False},
+            "gastos": {"despues": None, "completa": False, "cargadas": 0, "cargando": False},
+        }
+        
+        # Consultas y preparación de gráficos en segundo plano
+        self.trabajador = Trabajador(root)
+        self.trabajador.al_cambiar_actividad = self.on_activity_change
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        
+        # Totales mostrados en las tarjetas, para actualizarlos por diferencia
+        self.totales = {"reportes": None, "resumen": None}
+        
+        # Los gráficos se dibujan solo cuando su pestaña está visible. "pendientes"
+        # indica qué falta recargar de cada pestaña ("todo", "graficos" o None) y
+        # "sucios" qué gráficos deben redibujarse con los datos ya cargados.
+        self.datos = {"reportes": None, "resumen": None}
+        self.pendientes = {"reportes": "todo", "resumen": "todo"}
+        self.sucios = {"bar": True, "pie": True, "trend": True, "stats": True, "summary": True}
+        
+        # Figuras de matplotlib, creadas al abrir su pestaña por primera vez
+        self.graficos = {}
+        
         # Configura las interfaces de cada pestaña
         self.setup_ingresos()
+        marcar("pestaña ingresos")
         self.setup_gastos()
+        marcar("pestaña gastos")
         self.setup_reportes()
+        marcar("pestaña reportes")
         self.setup_resumen()
+        marcar("pestaña resumen")
         
         # Barra de estado en la parte inferior
         self.status_bar = ttk.Label(root, text="Listo", relief=tk.FLAT, anchor=tk.W,
                                    background=self.light_bg, foreground=self.neutral_color,
                                    font=("Inter", 10), padding=5)
         self.status_bar.pack(side=tk.BOTTOM, fill=tk.X)
+        self.progress = ttk.Progressbar(self.status_bar, mode="indeterminate", length=120)
+        
+        # Con GASTOAPP_INSTRUMENTAR=1 F12 muestra los tiempos de las consultas
+        if instrumentada():
+            self.root.bind("<F12>", lambda e: self.mostrar_estadisticas_consultas())
+            self.status_bar.config(text="Listo - instrumentación de consultas activa (F12 para ver estadísticas)")
         
-        # Actualiza los datos iniciales
+        # Actualiza los datos iniciales; reportes y resumen se cargan al abrir su pestaña
         self.mostrar_ingresos()
         self.mostrar_gastos()
-        self.actualizar_reportes()
-        self.actualizar_resumen()
+        self.notebook.bind("<<NotebookTabChanged>>", self.render_visible)
+        marcar("primera página de tablas")
 
     def setup_styles(self):
         """Configura los estilos visuales de la aplicación"""
@@ -133,8 +248,8 @@ class GastoApp:
     def validate_date(self, date_str):
         """Valida que la fecha tenga formato YYYY-MM-DD"""
         try:
-            datetime.strptime(date_str, "%Y-%m-%d")
-            return True
+            # strptime acepta 2024-1-5; la columna dia y los rangos necesitan la forma canónica
+            return datetime.strptime(date_str, "%Y-%m-%d").strftime("%Y-%m-%d") == date_str
         except ValueError:
             return False
 
@@ -220,13 +335,25 @@ class GastoApp:
                                       state="readonly", width=12, font=("Inter", 11))
         self.periodo_ing.set("Todos")
         self.periodo_ing.pack(side=tk.LEFT, padx=10)
+        self.periodo_ing.bind("<<ComboboxSelected>>", lambda e: self.trabajador.retrasar(
+            "periodo_ing", RETRASO_FILTRO, self.mostrar_ingresos))
         
         ttk.Button(filter_frame, text="Aplicar", style="Primary.TButton",
                   command=self.mostrar_ingresos).pack(side=tk.LEFT, padx=10)
         
+        # Búsqueda por descripción y notas; con texto, la tabla muestra los resultados
+        ttk.Label(filter_frame, text="Buscar:", font=("Inter", 11)).pack(side=tk.LEFT, padx=10)
+        self.busqueda_ing = ttk.Entry(filter_frame, font=("Inter", 11), width=20)
+        self.busqueda_ing.pack(side=tk.LEFT, padx=10)
+        self.busqueda_ing.bind("<KeyRelease>", lambda e: self.trabajador.retrasar(
+            "busqueda_ing", RETRASO_FILTRO, self.mostrar_ingresos))
+        
         ttk.Button(filter_frame, text="Exportar CSV", style="Primary.TButton",
                   command=lambda: self.exportar_datos("ingresos")).pack(side=tk.RIGHT, padx=10)
         
+        ttk.Button(filter_frame, text="Importar CSV", style="Primary.TButton",
+                  command=self.importar_datos).pack(side=tk.RIGHT, padx=10)
+        
         # Tabla de ingresos
         table_frame = ttk.Frame(data_card)
         table_frame.pack(fill=tk.BOTH, expand=True)
@@ -240,7 +367,8 @@ class GastoApp:
             self.tabla_ingresos.column(col, width=width, anchor=tk.CENTER)
         
         scroll_y = ttk.Scrollbar(table_frame, orient=tk.VERTICAL, command=self.tabla_ingresos.yview)
-        self.tabla_ingresos.configure(yscrollcommand=scroll_y.set)
+        self.tabla_ingresos.configure(yscrollcommand=lambda first, last: self.on_table_scroll(
+            "ingresos", scroll_y, first, last))
         
         self.tabla_ingresos.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scroll_y.pack(side=tk.RIGHT, fill=tk.Y)
@@ -287,9 +415,7 @@ class GastoApp:
                 entry = ttk.Entry(row, font=("Inter", 11))
                 entry.insert(0, datetime.now().strftime("%Y-%m-%d"))
             elif label == "Categoría":
-                entry = ttk.Combobox(row, values=["Alimentación", "Transporte", "Vivienda", 
-                                                "Salud", "Educación", "Entretenimiento", 
-                                                "Ropa", "Otros"], state="readonly", font=("Inter", 11))
+                entry = ttk.Combobox(row, values=CATEGORIAS, state="readonly", font=("Inter", 11))
                 entry.set("Alimentación")
             elif label == "Usuario":
                 entry = ttk.Entry(row, font=("Inter", 11))
@@ -328,13 +454,25 @@ class GastoApp:
                                       state="readonly", width=12, font=("Inter", 11))
         self.periodo_gas.set("Todos")
         self.periodo_gas.pack(side=tk.LEFT, padx=10)
+        self.periodo_gas.bind("<<ComboboxSelected>>", lambda e: self.trabajador.retrasar(
+            "periodo_gas", RETRASO_FILTRO, self.mostrar_gastos))
         
         ttk.Button(filter_frame, text="Aplicar", style="Primary.TButton",
                   command=self.mostrar_gastos).pack(side=tk.LEFT, padx=10)
         
+        # Búsqueda por descripción y notas; con texto, la tabla muestra los resultados
+        ttk.Label(filter_frame, text="Buscar:", font=("Inter", 11)).pack(side=tk.LEFT, padx=10)
+        self.busqueda_gas = ttk.Entry(filter_frame, font=("Inter", 11), width=20)
+        self.busqueda_gas.pack(side=tk.LEFT, padx=10)
+        self.busqueda_gas.bind("<KeyRelease>", lambda e: self.trabajador.retrasar(
+            "busqueda_gas", RETRASO_FILTRO, self.mostrar_gastos))
+        
         ttk.Button(filter_frame, text="Exportar CSV", style="Primary.TButton",
                   command=lambda: self.exportar_datos("gastos")).pack(side=tk.RIGHT, padx=10)
         
+        ttk.Button(filter_frame, text="Importar CSV", style="Primary.TButton",
+                  command=self.importar_datos).pack(side=tk.RIGHT, padx=10)
+        
         # Tabla de gastos
         table_frame = ttk.Frame(data_card)
         table_frame.pack(fill=tk.BOTH, expand=True)
@@ -348,7 +486,8 @@ class GastoApp:
             self.tabla_gastos.column(col, width=width, anchor=tk.CENTER)
         
         scroll_y = ttk.Scrollbar(table_frame, orient=tk.VERTICAL, command=self.tabla_gastos.yview)
-        self.tabla_gastos.configure(yscrollcommand=scroll_y.set)
+        self.tabla_gastos.configure(yscrollcommand=lambda first, last: self.on_table_scroll(
+            "gastos", scroll_y, first, last))
         
         self.tabla_gastos.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scroll_y.pack(side=tk.RIGHT, fill=tk.Y)
@@ -389,6 +528,8 @@ class GastoApp:
                                            state="readonly", width=12, font=("Inter", 11))
         self.periodo_reportes.set("Mes")
         self.periodo_reportes.pack(side=tk.LEFT, padx=10)
+        self.periodo_reportes.bind("<<ComboboxSelected>>", lambda e: self.trabajador.retrasar(
+            "periodo_reportes", RETRASO_FILTRO, self.actualizar_reportes))
         
         ttk.Button(filter_frame, text="Actualizar", style="Primary.TButton",
                   command=self.actualizar_reportes).pack(side=tk.LEFT, padx=10)
@@ -403,42 +544,37 @@ class GastoApp:
         # Notebook para gráficos
         graph_notebook = ttk.Notebook(graph_card)
         graph_notebook.pack(fill=tk.BOTH, expand=True)
+        graph_notebook.bind("<<NotebookTabChanged>>", self.render_visible)
+        self.graph_notebook = graph_notebook
         
         # Pestaña de gráfico de barras
         bar_frame = ttk.Frame(graph_notebook)
         graph_notebook.add(bar_frame, text="Gastos por Categoría")
         
-        self.fig_bar = Figure(figsize=(10, 5), dpi=100, facecolor=self.bg_color)
-        self.canvas_bar = FigureCanvasTkAgg(self.fig_bar, master=bar_frame)
-        self.canvas_bar.get_tk_widget().pack(fill=tk.BOTH, expand=True)
-        
-        toolbar = NavigationToolbar2Tk(self.canvas_bar, bar_frame)
-        toolbar.update()
-        self.canvas_bar._tkcanvas.pack(fill=tk.BOTH, expand=True)
+        self.bar_frame = bar_frame
         
         # Pestaña de gráfico circular
         pie_frame = ttk.Frame(graph_notebook)
         graph_notebook.add(pie_frame, text="Distribución de Gastos")
         
-        self.fig_pie = Figure(figsize=(10, 5), dpi=100, facecolor=self.bg_color)
-        self.canvas_pie = FigureCanvasTkAgg(self.fig_pie, master=pie_frame)
-        self.canvas_pie.get_tk_widget().pack(fill=tk.BOTH, expand=True)
-        
-        toolbar_pie = NavigationToolbar2Tk(self.canvas_pie, pie_frame)
-        toolbar_pie.update()
-        self.canvas_pie._tkcanvas.pack(fill=tk.BOTH, expand=True)
+        self.pie_frame = pie_frame
         
         # Pestaña de tendencias
         trend_frame = ttk.Frame(graph_notebook)
         graph_notebook.add(trend_frame, text="Tendencias Mensuales")
-        
-        self.fig_trend = Figure(figsize=(10, 5), dpi=100, facecolor=self.bg_color)
-        self.canvas_trend = FigureCanvasTkAgg(self.fig_trend, master=trend_frame)
-        self.canvas_trend.get_tk_widget().pack(fill=tk.BOTH, expand=True)
-        
-        toolbar_trend = NavigationToolbar2Tk(self.canvas_trend, trend_frame)
-        toolbar_trend.update()
-        self.canvas_trend._tkcanvas.pack(fill=tk.BOTH, expand=True)
+        self.trend_frame = trend_frame
+        
+        # Pestaña de estadísticas
+        stats_frame = ttk.Frame(graph_notebook, padding=10)
+        graph_notebook.add(stats_frame, text="Estadísticas")
+        self.graph_tabs = {str(bar_frame): "bar", str(pie_frame): "pie", str(trend_frame): "trend",
+                           str(stats_frame): "stats"}
+        
+        self.stats_text = tk.Text(stats_frame, wrap=tk.WORD, bg=self.card_bg, 
+                                font=("Inter", 11), padx=10, pady=10)
+        self.stats_text.pack(fill=tk.BOTH, expand=True)
+        self.stats_text.insert(tk.END, "Cargando estadísticas...")
+        self.stats_text.config(state=tk.DISABLED)
 
     def setup_resumen(self):
         """Configura la pestaña de resumen con estadísticas y consejos"""
@@ -450,6 +586,17 @@ class GastoApp:
         title_frame.pack(fill=tk.X, pady=(0, 15))
         ttk.Label(title_frame, text="Resumen Financiero", font=("Inter", 22, "bold"), 
                  foreground=self.primary_color).pack(side=tk.LEFT)
+        # Respaldo y restauración se deshabilitan juntos mientras corre cualquiera de los dos
+        self.botones_respaldo = [
+            ttk.Button(title_frame, text="Restaurar Respaldo", style="Primary.TButton",
+                       command=self.restaurar_datos),
+            ttk.Button(title_frame, text="Crear Respaldo", style="Success.TButton",
+                       command=self.respaldar_datos),
+        ]
+        for boton in self.botones_respaldo:
+            boton.pack(side=tk.RIGHT, padx=10)
+        ttk.Button(title_frame, text="Presupuestos", style="Primary.TButton",
+                  command=self.editar_presupuestos).pack(side=tk.RIGHT, padx=10)
         
         # Panel de estadísticas rápidas
         quick_stats_card = ttk.Frame(main_frame, style="Card.TFrame", padding=20)
@@ -474,13 +621,8 @@ class GastoApp:
         ttk.Label(categories_card, text="Gastos por Categoría", font=("Inter", 14, "bold"), 
                  foreground=self.primary_color).pack(anchor=tk.W, pady=(0, 15))
         
-        self.fig_summary = Figure(figsize=(8, 4), dpi=100, facecolor=self.bg_color)
-        self.canvas_summary = FigureCanvasTkAgg(self.fig_summary, master=categories_card)
-        self.canvas_summary.get_tk_widget().pack(fill=tk.BOTH, expand=True)
-        
-        toolbar_summary = NavigationToolbar2Tk(self.canvas_summary, categories_card)
-        toolbar_summary.update()
-        self.canvas_summary._tkcanvas.pack(fill=tk.BOTH, expand=True)
+        # La figura se crea al abrir la pestaña por primera vez
+        self.summary_frame = categories_card
         
         # Panel de consejos
         tips_card = ttk.Frame(main_frame, style="Card.TFrame", padding=20)
@@ -582,12 +724,14 @@ class GastoApp:
             return
 
         try:
-            agregar_ingreso(fecha, float(monto), desc, user, notes)
+            nuevo_id = agregar_ingreso(fecha, float(monto), desc, user, notes)
+            if nuevo_id is None:
+                raise RuntimeError("la base de datos rechazó el registro")
             messagebox.showinfo("Éxito", "Ingreso agregado correctamente.")
             self.limpiar_formulario_ingresos()
-            self.mostrar_ingresos()
-            self.actualizar_reportes()
-            self.actualizar_resumen()
+            self.insert_row("ingresos", (nuevo_id, fecha, de_centavos(a_centavos(monto)), desc, user))
+            self.apply_delta("ingresos", fecha, monto)
+            self.mark_dirty()
             self.status_bar.config(text="Ingreso registrado exitosamente")
         except Exception as ex:
             messagebox.showerror("Error", f"No se pudo guardar el ingreso: {ex}")
@@ -595,30 +739,7 @@ class GastoApp:
 
     def mostrar_ingresos(self):
         """Muestra los ingresos en la tabla según el filtro"""
-        for item in self.tabla_ingresos.get_children():
-            self.tabla_ingresos.delete(item)
-            
-        try:
-            periodo = self.periodo_ing.get()
-            ingresos = obtener_ingresos(periodo)
-            
-            if not ingresos:
-                self.status_bar.config(text=f"No hay ingresos para mostrar ({periodo})")
-                return
-                
-            for i, ingreso in enumerate(ingresos):
-                tag = "evenrow" if i % 2 == 0 else "oddrow"
-                self.tabla_ingresos.insert("", tk.END, values=(
-                    ingreso[0], 
-                    f"{ingreso[1]:.2f}", 
-                    ingreso[2] or "-", 
-                    ingreso[3] or "-"
-                ), tags=(tag,))
-                
-            self.status_bar.config(text=f"Mostrando {len(ingresos)} ingresos ({periodo})")
-        except Exception as ex:
-            messagebox.showerror("Error", f"Error al cargar ingresos: {ex}")
-            self.status_bar.config(text=f"Error al cargar ingresos: {ex}")
+        self.reset_table("ingresos")
 
     def guardar_gasto(self):
         """Guarda un gasto en la base de datos"""
@@ -640,283 +761,438 @@ class GastoApp:
             return
 
         try:
-            agregar_gasto(fecha, categoria, float(monto), desc, user, notes)
+            nuevo_id = agregar_gasto(fecha, categoria, float(monto), desc, user, notes)
+            if nuevo_id is None:
+                raise RuntimeError("la base de datos rechazó el registro")
             messagebox.showinfo("Éxito", "Gasto agregado correctamente.")
             self.limpiar_formulario_gastos()
-            self.mostrar_gastos()
-            self.actualizar_reportes()
-            self.actualizar_resumen()
+            self.insert_row("gastos", (nuevo_id, fecha, categoria, de_centavos(a_centavos(monto)), desc, user))
+            self.apply_delta("gastos", fecha, monto)
+            self.mark_dirty()
             self.status_bar.config(text="Gasto registrado exitosamente")
+            self.check_budget(categoria, fecha)
         except Exception as ex:
             messagebox.showerror("Error", f"No se pudo guardar el gasto: {ex}")
             self.status_bar.config(text=f"Error al guardar gasto: {ex}")
 
+    def check_budget(self, categoria, fecha):
+        """Avisa si el gasto recién guardado supera o casi agota el presupuesto de su categoría"""
+        estado = verificar_presupuesto(categoria, fecha)
+        if estado is None:
+            return
+        if estado["excedido"]:
+            messagebox.showwarning("Presupuesto excedido",
+                                   f"El gasto en {categoria} de {fecha[:7]} es ${estado['gastado']:.2f}, "
+                                   f"por encima del presupuesto de ${estado['limite']:.2f}.")
+            self.status_bar.config(text=f"Presupuesto de {categoria} excedido en ${-estado['restante']:.2f}")
+        elif estado["gastado"] >= estado["limite"] * AVISO_PRESUPUESTO:
+            self.status_bar.config(text=f"Quedan ${estado['restante']:.2f} del presupuesto de {categoria}")
+
     def mostrar_gastos(self):
         """Muestra los gastos en la tabla según el filtro"""
-        for item in self.tabla_gastos.get_children():
-            self.tabla_gastos.delete(item)
-            
-        try:
-            periodo = self.periodo_gas.get()
-            gastos = obtener_gastos(periodo)
-            
-            if not gastos:
-                self.status_bar.config(text=f"No hay gastos para mostrar ({periodo})")
-                return
-                
-            for i, gasto in enumerate(gastos):
-                tag = "evenrow" if i % 2 == 0 else "oddrow"
-                self.tabla_gastos.insert("", tk.END, values=(
-                    gasto[0], 
-                    gasto[1], 
-                    f"{gasto[2]:.2f}", 
-                    gasto[3] or "-", 
-                    gasto[4] or "-"
-                ), tags=(tag,))
-                
-            self.status_bar.config(text=f"Mostrando {len(gastos)} gastos ({periodo})")
-        except Exception as ex:
-            messagebox.showerror("Error", f"Error al cargar gastos: {ex}")
-            self.status_bar.config(text=f"Error al cargar gastos: {ex}")
+        self.reset_table("gastos")
+
+    def table_config(self, tipo):
+        """Devuelve la tabla, el período y la función de página de un tipo de movimiento"""
+        if tipo == "ingresos":
+            return self.tabla_ingresos, self.periodo_ing.get(), obtener_ingresos_pagina
+        return self.tabla_gastos, self.periodo_gas.get(), obtener_gastos_pagina
+
+    def search_text(self, tipo):
+        """Devuelve el texto buscado en la tabla de un tipo de movimiento"""
+        entrada = self.busqueda_ing if tipo == "ingresos" else self.busqueda_gas
+        return entrada.get().strip()
+
+    def format_row(self, tipo, fila):
+        """Convierte una fila de la base de datos en los valores de la tabla"""
+        if tipo == "ingresos":
+            _, fecha, monto, desc, usuario = fila
+            return (fecha, f"{monto:.2f}", desc or "-", usuario or "-")
+        _, fecha, categoria, monto, desc, usuario = fila
+        return (fecha, categoria, f"{monto:.2f}", desc or "-", usuario or "-")
+
+    def reset_table(self, tipo):
+        """Vacía la tabla y carga la primera página del período seleccionado"""
+        tabla, _, _ = self.table_config(tipo)
+        self.trabajador.cancelar(f"tabla_{tipo}")
+        tabla.delete(*tabla.get_children())
+        self.paginacion[tipo].update(despues=None, completa=False, cargadas=0, cargando=False)
+        self.load_next_page(tipo)
+
+    def load_next_page(self, tipo):
+        """Pide en segundo plano la siguiente página de movimientos"""
+        estado = self.paginacion[tipo]
+        if estado["completa"] or estado["cargando"]:
+            return
+        estado["cargando"] = True
+        _, periodo, obtener_pagina = self.table_config(tipo)
+        texto = self.search_text(tipo)
+        if texto:
+            self.trabajador.enviar(f"tabla_{tipo}", cargar_busqueda, tipo, texto, periodo,
+                                   al_terminar=lambda filas: self.show_search_results(tipo, periodo, texto, filas),
+                                   al_fallar=lambda ex: self.show_page_error(tipo, ex))
+            return
+        self.trabajador.enviar(f"tabla_{tipo}", cargar_pagina, obtener_pagina, periodo, estado["despues"],
+                               al_terminar=lambda datos: self.show_page(tipo, periodo, *datos),
+                               al_fallar=lambda ex: self.show_page_error(tipo, ex))
+
+    def show_page(self, tipo, periodo, filas, resumen):
+        """Agrega a la tabla una página de movimientos recibida del trabajador"""
+        estado = self.paginacion[tipo]
+        estado["cargando"] = False
+        tabla, _, _ = self.table_config(tipo)
+        for fila in filas:
+            tag = "evenrow" if estado["cargadas"] % 2 == 0 else "oddrow"
+            tabla.insert("", tk.END, iid=str(fila[0]), values=self.format_row(tipo, fila), tags=(tag,))
+            estado["cargadas"] += 1
+        
+        if len(filas) < TAMANO_PAGINA:
+            estado["completa"] = True
+        if filas:
+            estado["despues"] = (filas[-1][1], filas[-1][0])
+        
+        if estado["cargadas"] == 0:
+            self.status_bar.config(text=f"No hay {tipo} para mostrar ({periodo})")
+        else:
+            total = resumen["n_ingresos"] if tipo == "ingresos" else resumen["n_gastos"]
+            self.status_bar.config(text=f"Mostrando {estado['cargadas']} de {total} {tipo} ({periodo})")
+
+    def show_search_results(self, tipo, periodo, texto, filas):
+        """Muestra en la tabla los resultados de una búsqueda, ordenados por relevancia"""
+        estado = self.paginacion[tipo]
+        estado.update(cargando=False, completa=True)
+        tabla, _, _ = self.table_config(tipo)
+        for fila in filas:
+            tag = "evenrow" if estado["cargadas"] % 2 == 0 else "oddrow"
+            tabla.insert("", tk.END, iid=str(fila[0]), values=self.format_row(tipo, fila), tags=(tag,))
+            estado["cargadas"] += 1
+        self.status_bar.config(text=f"{len(filas)} {tipo} coinciden con \"{texto}\" ({periodo})")
+
+    def show_page_error(self, tipo, ex):
+        """Informa un error al cargar una página de movimientos"""
+        self.paginacion[tipo]["cargando"] = False
+        messagebox.showerror("Error", f"Error al cargar {tipo}: {ex}")
+        self.status_bar.config(text=f"Error al cargar {tipo}: {ex}")
+
+    def on_table_scroll(self, tipo, scrollbar, first, last):
+        """Actualiza la barra de desplazamiento y carga más filas al acercarse al final"""
+        scrollbar.set(first, last)
+        estado = self.paginacion[tipo]
+        if float(last) >= 0.9 and not estado["completa"] and not estado["cargando"]:
+            self.load_next_page(tipo)
+
+    def insert_row(self, tipo, fila):
+        """Inserta un movimiento nuevo en su posición ordenada sin recargar la tabla"""
+        tabla, periodo, _ = self.table_config(tipo)
+        start, end = calculate_period_dates(periodo)
+        fecha = fila[1]
+        if not start <= fecha <= end or self.search_text(tipo):
+            # Con una búsqueda activa la tabla está ordenada por relevancia
+            return
+        
+        # Búsqueda binaria de la primera fila con fecha menor o igual; el id nuevo
+        # es el mayor, así que va antes de las filas de su misma fecha
+        hijos = tabla.get_children()
+        bajo, alto = 0, len(hijos)
+        while bajo < alto:
+            medio = (bajo + alto) // 2
+            if tabla.set(hijos[medio], "Fecha") > fecha:
+                bajo = medio + 1
+            else:
+                alto = medio
+        
+        estado = self.paginacion[tipo]
+        if bajo == len(hijos) and not estado["completa"]:
+            return  # Pertenece a una página que aún no se ha cargado
+        
+        tag = "evenrow" if bajo % 2 == 0 else "oddrow"
+        tabla.insert("", bajo, iid=str(fila[0]), values=self.format_row(tipo, fila), tags=(tag,))
+        estado["cargadas"] += 1
+        
+        # Las filas siguientes se desplazan una posición: se alterna su color
+        for i, item in enumerate(hijos[bajo:], start=bajo + 1):
+            tabla.item(item, tags=("evenrow" if i % 2 == 0 else "oddrow",))
+        tabla.see(str(fila[0]))
 
-    def actualizar_reportes(self):
+    def actualizar_reportes(self, tarjetas=True):
         """Actualiza métricas y gráficos en la pestaña de reportes"""
+        periodo = self.periodo_reportes.get()
+        self.pendientes["reportes"] = None
+        self.status_bar.config(text=f"Actualizando reportes ({periodo})...")
+        self.trabajador.enviar("reportes", cargar_datos_reportes, periodo,
+                               al_terminar=lambda datos: self.mostrar_reportes(datos, tarjetas),
+                               al_fallar=lambda ex: self.on_load_error("reportes", ex))
+
+    def mostrar_reportes(self, datos, tarjetas=True):
+        """Muestra los datos de reportes preparados por el trabajador"""
         try:
-            periodo = self.periodo_reportes.get()
-            start, end = calculate_period_dates(periodo)
-            
-            total_ingresos = sum(float(i[1]) for i in obtener_ingresos(periodo))
-            total_gastos = obtener_total_gastos(periodo)
-            balance = total_ingresos - total_gastos
+            start, end = datos["rango"]
+            mostrados = self.totales["reportes"]
+            if tarjetas or mostrados is None or mostrados["rango"] != datos["rango"]:
+                resumen = datos["resumen"]
+                self.totales["reportes"] = {"rango": (start, end), "ingresos": a_centavos(resumen["ingresos"]),
+                                            "gastos": a_centavos(resumen["gastos"])}
+                self.show_report_metrics()
             
-            self.metric_ingresos.config(text=f"${total_ingresos:.2f}")
-            self.metric_gastos.config(text=f"${total_gastos:.2f}")
-            self.metric_balance.config(text=f"${balance:.2f}", 
-                                     foreground=self.success_color if balance >= 0 else self.danger_color)
+            self.datos["reportes"] = datos
+            self.sucios.update(bar=True, pie=True, trend=True, stats=True)
+            self.render_visible()
             
-            self.generate_bar_chart(start, end)
-            self.generate_pie_chart(start, end)
-            self.generate_trend_chart()
-            
-            self.status_bar.config(text=f"Reportes actualizados ({periodo})")
+            self.status_bar.config(text=f"Reportes actualizados ({datos['periodo']})")
         except Exception as ex:
-            messagebox.showerror("Error", f"Error al actualizar reportes: {ex}")
-            self.status_bar.config(text=f"Error al actualizar reportes: {ex}")
+            self.show_error("Error al actualizar reportes", ex)
 
-    def actualizar_resumen(self):
+    def actualizar_resumen(self, tarjetas=True):
         """Actualiza estadísticas y gráficos en la pestaña de resumen"""
+        self.pendientes["resumen"] = None
+        self.trabajador.enviar("resumen", cargar_datos_resumen,
+                               al_terminar=lambda datos: self.mostrar_resumen(datos, tarjetas),
+                               al_fallar=lambda ex: self.on_load_error("resumen", ex))
+
+    def mostrar_resumen(self, datos, tarjetas=True):
+        """Muestra los datos del resumen preparados por el trabajador"""
         try:
-            total_ingresos = sum(float(i[1]) for i in obtener_ingresos("Mes"))
-            total_gastos = obtener_total_gastos("Mes")
-            balance = total_ingresos - total_gastos
-            tasa_ahorro = (balance / total_ingresos * 100) if total_ingresos > 0 else 0
-            
-            self.quick_ingresos.config(text=f"${total_ingresos:.2f}")
-            self.quick_gastos.config(text=f"${total_gastos:.2f}")
-            self.quick_balance.config(text=f"${balance:.2f}", 
-                                    foreground=self.success_color if balance >= 0 else self.danger_color)
-            self.quick_ahorro.config(text=f"{tasa_ahorro:.1f}%", 
-                                   foreground=self.success_color if tasa_ahorro >= 0 else self.danger_color)
-            
-            self.generate_summary_chart()
-            self.update_financial_tips(balance, tasa_ahorro)
+            mostrados = self.totales["resumen"]
+            if tarjetas or mostrados is None or mostrados["rango"] != datos["rango"]:
+                resumen = datos["resumen"]
+                self.totales["resumen"] = {"rango": datos["rango"],
+                                           "ingresos": a_centavos(resumen["ingresos"]),
+                                           "gastos": a_centavos(resumen["gastos"]),
+                                           "pronostico": datos["pronostico"],
+                                           "presupuestos": datos["presupuestos"]}
+                self.show_summary_stats()
+            elif (mostrados["pronostico"], mostrados["presupuestos"]) != (datos["pronostico"],
+                                                                         datos["presupuestos"]):
+                # Las tarjetas ya están al día; solo cambian los consejos
+                mostrados.update(pronostico=datos["pronostico"], presupuestos=datos["presupuestos"])
+                self.show_summary_stats()
+            self.datos["resumen"] = datos
+            self.sucios["summary"] = True
+            self.render_visible()
             
             self.status_bar.config(text="Resumen actualizado")
         except Exception as ex:
-            messagebox.showerror("Error", f"Error al actualizar resumen: {ex}")
-            self.status_bar.config(text=f"Error al actualizar resumen: {ex}")
+            self.show_error("Error al actualizar resumen", ex)
+
+    def on_load_error(self, pestana, ex):
+        """Deja la pestaña pendiente de recarga e informa el error"""
+        self.pendientes[pestana] = "todo"
+        self.show_error(f"Error al actualizar {pestana}", ex)
 
-    def generate_bar_chart(self, start, end):
+    def render_visible(self, event=None):
+        """Carga o dibuja lo que haga falta en la pestaña visible"""
+        pestana = self.notebook.select()
+        if pestana == str(self.reportes_frame):
+            self.crear_graficos_reportes()
+            if self.pendientes["reportes"]:
+                self.actualizar_reportes(tarjetas=self.pendientes["reportes"] == "todo")
+            else:
+                self.render_chart(self.graph_tabs.get(self.graph_notebook.select()))
+        elif pestana == str(self.resumen_frame):
+            self.crear_graficos_resumen()
+            if self.pendientes["resumen"]:
+                self.actualizar_resumen(tarjetas=self.pendientes["resumen"] == "todo")
+            else:
+                self.render_chart("summary")
+
+    def crear_figura(self, master, figsize):
+        """Crea una figura con su canvas y barra de herramientas dentro de master"""
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
+        
+        fig = Figure(figsize=figsize, dpi=100, facecolor=self.bg_color)
+        canvas = FigureCanvasTkAgg(fig, master=master)
+        canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        
+        toolbar = NavigationToolbar2Tk(canvas, master)
+        toolbar.update()
+        canvas._tkcanvas.pack(fill=tk.BOTH, expand=True)
+        return fig, canvas
+
+    def crear_graficos_reportes(self):
+        """Importa matplotlib y crea los gráficos de reportes la primera vez"""
+        if "bar" in self.graficos:
+            return
+        from Graficos import GraficoBarras, GraficoCircular, GraficoTendencia, paleta
+        
+        self.graficos["bar"] = GraficoBarras(*self.crear_figura(self.bar_frame, (10, 5)),
+                                             self.text_color, self.card_bg, paleta("Blues", 0.3, 0.5),
+                                             etiqueta_categoria="Categoría")
+        self.graficos["pie"] = GraficoCircular(*self.crear_figura(self.pie_frame, (10, 5)),
+                                               self.text_color, self.card_bg, paleta("tab20c"))
+        self.graficos["trend"] = GraficoTendencia(*self.crear_figura(self.trend_frame, (10, 5)),
+                                                  self.text_color, self.card_bg,
+                                                  self.success_color, self.danger_color)
+
+    def crear_graficos_resumen(self):
+        """Importa matplotlib y crea el gráfico de resumen la primera vez"""
+        if "summary" in self.graficos:
+            return
+        from Graficos import GraficoBarras, paleta
+        
+        self.graficos["summary"] = GraficoBarras(*self.crear_figura(self.summary_frame, (8, 4)),
+                                                 self.text_color, self.card_bg, paleta("Pastel1"),
+                                                 horizontal=True, color_limite=self.text_color,
+                                                 color_exceso=self.danger_color)
+
+    def render_chart(self, nombre):
+        """Dibuja un gráfico si está marcado como sucio y sus datos ya llegaron"""
+        if nombre is None or not self.sucios[nombre]:
+            return
+        datos = self.datos["resumen" if nombre == "summary" else "reportes"]
+        if datos is None:
+            return
+        self.sucios[nombre] = False
+        if nombre == "bar":
+            self.generate_bar_chart(*datos["rango"], datos["categorias"])
+        elif nombre == "pie":
+            self.generate_pie_chart(*datos["rango"], datos["porciones"])
+        elif nombre == "trend":
+            self.generate_trend_chart(datos["tendencia"], datos["pronostico"])
+        elif nombre == "stats":
+            self.show_statistics(*datos["rango"], datos["estadisticas"])
+        else:
+            self.generate_summary_chart(datos["categorias"], datos["presupuestos"])
+
+    def mark_dirty(self, pendiente="graficos"):
+        """Marca reportes y resumen como desactualizados tras una escritura"""
+        for pestana, actual in self.pendientes.items():
+            if actual != "todo":
+                self.pendientes[pestana] = pendiente
+        self.render_visible()
+
+    def show_error(self, mensaje, ex):
+        """Muestra un error en un diálogo y en la barra de estado"""
+        messagebox.showerror("Error", f"{mensaje}: {ex}")
+        self.status_bar.config(text=f"{mensaje}: {ex}")
+
+    def on_activity_change(self, activas):
+        """Muestra el indicador de progreso mientras haya tareas en segundo plano"""
+        if activas:
+            self.progress.place(relx=1.0, rely=0.5, anchor=tk.E, x=-10)
+            self.progress.start(15)
+        else:
+            self.progress.stop()
+            self.progress.place_forget()
+
+    def on_close(self):
+        """Detiene el trabajador y cierra la ventana"""
+        self.trabajador.cerrar()
+        self.root.destroy()
+
+    def show_report_metrics(self):
+        """Muestra en las tarjetas de reportes los totales guardados"""
+        totales = self.totales["reportes"]
+        balance = de_centavos(totales["ingresos"] - totales["gastos"])
+        
+        self.metric_ingresos.config(text=f"${de_centavos(totales['ingresos']):.2f}")
+        self.metric_gastos.config(text=f"${de_centavos(totales['gastos']):.2f}")
+        self.metric_balance.config(text=f"${balance:.2f}", 
+                                 foreground=self.success_color if balance >= 0 else self.danger_color)
+
+    def show_summary_stats(self):
+        """Muestra las estadísticas rápidas y los consejos con los totales guardados"""
+        totales = self.totales["resumen"]
+        total_ingresos = de_centavos(totales["ingresos"])
+        balance = de_centavos(totales["ingresos"] - totales["gastos"])
+        tasa_ahorro = (balance / total_ingresos * 100) if total_ingresos > 0 else 0
+        
+        self.quick_ingresos.config(text=f"${total_ingresos:.2f}")
+        self.quick_gastos.config(text=f"${de_centavos(totales['gastos']):.2f}")
+        self.quick_balance.config(text=f"${balance:.2f}", 
+                                foreground=self.success_color if balance >= 0 else self.danger_color)
+        self.quick_ahorro.config(text=f"{tasa_ahorro:.1f}%", 
+                               foreground=self.success_color if tasa_ahorro >= 0 else self.danger_color)
+        
+        self.update_financial_tips(balance, tasa_ahorro, totales.get("pronostico"),
+                                   totales.get("presupuestos"))
+
+    def apply_delta(self, tipo, fecha, monto):
+        """Suma un movimiento nuevo a los totales mostrados si cae en su período
+
+        Los totales guardados están en centavos, así los nuevos movimientos se
+        suman sin acumular error de redondeo.
+        """
+        centavos = a_centavos(monto)
+        for clave, mostrar in (("reportes", self.show_report_metrics), ("resumen", self.show_summary_stats)):
+            totales = self.totales[clave]
+            if totales is None:
+                continue
+            start, end = totales["rango"]
+            if start <= fecha <= end:
+                totales[tipo] += centavos
+                mostrar()
+
+    def generate_bar_chart(self, start, end, totals):
         """Genera un gráfico de barras de gastos por categoría"""
         try:
-            self.fig_bar.clear()
-            ax = self.fig_bar.add_subplot(111)
-            
-            totals = obtener_total_por_categoria_periodo(start, end)
-            if not totals:
-                ax.text(0.5, 0.5, 'No hay datos para mostrar', 
-                       horizontalalignment='center', verticalalignment='center',
-                       transform=ax.transAxes, fontsize=12, color=self.text_color)
-                self.canvas_bar.draw()
-                return
-            
-            totals_sorted = sorted(totals, key=lambda x: x[1], reverse=True)
-            categories, amounts = zip(*totals_sorted) if totals_sorted else ([], [])
-            
-            colors = plt.cm.Blues([0.3 + x * 0.5 / len(amounts) for x in range(len(amounts))])
-            
-            bars = ax.bar(categories, amounts, color=colors, edgecolor="#E5E7EB", linewidth=1)
-            ax.set_title(f"Gastos por Categoría ({start} a {end})", 
-                        fontsize=16, pad=20, color=self.text_color)
-            ax.set_xlabel("Categoría", fontsize=12, color=self.text_color)
-            ax.set_ylabel("Monto ($)", fontsize=12, color=self.text_color)
-            
-            ax.tick_params(axis='x', rotation=45, colors=self.text_color)
-            ax.tick_params(axis='y', colors=self.text_color)
-            ax.set_facecolor(self.card_bg)
-            ax.grid(True, axis="y", linestyle="--", alpha=0.4)
-            
-            for bar in bars:
-                height = bar.get_height()
-                ax.text(bar.get_x() + bar.get_width()/2., height,
-                        f'${height:.2f}', ha='center', va='bottom', 
-                        color=self.text_color, fontsize=10)
-            
-            self.fig_bar.tight_layout()
-            self.canvas_bar.draw()
+            self.graficos["bar"].mostrar(totals, f"Gastos por Categoría ({start} a {end})")
         except Exception as ex:
             print(f"Error al generar gráfico de barras: {ex}")
 
-    def generate_pie_chart(self, start, end):
+    def generate_pie_chart(self, start, end, porciones):
         """Genera un gráfico circular de distribución de gastos"""
         try:
-            self.fig_pie.clear()
-            ax = self.fig_pie.add_subplot(111)
-            
-            totals = obtener_total_por_categoria_periodo(start, end)
-            if not totals:
-                ax.text(0.5, 0.5, 'No hay datos para mostrar', 
-                       horizontalalignment='center', verticalalignment='center',
-                       transform=ax.transAxes, fontsize=12, color=self.text_color)
-                self.canvas_pie.draw()
-                return
-            
-            totals_sorted = sorted(totals, key=lambda x: x[1], reverse=True)
-            categories, amounts = zip(*totals_sorted) if totals_sorted else ([], [])
-            
-            threshold = sum(amounts) * 0.03
-            main_categories = []
-            main_amounts = []
-            other_amount = 0
-            
-            for cat, amt in zip(categories, amounts):
-                if amt >= threshold:
-                    main_categories.append(cat)
-                    main_amounts.append(amt)
-                else:
-                    other_amount += amt
-            
-            if other_amount > 0:
-                main_categories.append("Otros")
-                main_amounts.append(other_amount)
-            
-            colors = plt.cm.tab20c(range(len(main_categories)))
-            
-            wedges, texts, autotexts = ax.pie(main_amounts, labels=main_categories, 
-                                            colors=colors, autopct='%1.1f%%',
-                                            startangle=90, counterclock=False,
-                                            textprops={'color': self.text_color, 'fontsize': 10})
-            
-            ax.set_title(f"Distribución de Gastos ({start} a {end})", 
-                        fontsize=16, pad=20, color=self.text_color)
-            
-            ax.axis('equal')
-            self.fig_pie.tight_layout()
-            self.canvas_pie.draw()
+            self.graficos["pie"].mostrar(porciones, f"Distribución de Gastos ({start} a {end})")
         except Exception as ex:
             print(f"Error al generar gráfico circular: {ex}")
 
-    def generate_trend_chart(self):
-        """Genera un gráfico de tendencias mensuales"""
+    def generate_trend_chart(self, tendencia, pronostico=None):
+        """Genera un gráfico de tendencias mensuales con el pronóstico de gastos"""
         try:
-            self.fig_trend.clear()
-            ax = self.fig_trend.add_subplot(111)
-            
-            meses = []
-            ingresos = []
-            gastos = []
-            
-            for i in range(12):
-                date = datetime.now().replace(day=1)
-                month = date.month - i
-                year = date.year
-                if month <= 0:
-                    month += 12
-                    year -= 1
-                
-                periodo = f"{year}-{month:02d}"
-                meses.insert(0, periodo)
-                
-                total_ing = sum(float(i[1]) for i in obtener_ingresos(periodo))
-                total_gas = obtener_total_gastos(periodo)
-                
-                ingresos.insert(0, total_ing)
-                gastos.insert(0, total_gas)
-            
-            ax.plot(meses, ingresos, label='Ingresos', color=self.success_color, marker='o')
-            ax.plot(meses, gastos, label='Gastos', color=self.danger_color, marker='o')
-            
-            ax.fill_between(meses, ingresos, gastos, where=[i >= g for i, g in zip(ingresos, gastos)], 
-                          interpolate=True, color=self.success_color, alpha=0.2, 
-                          label='Superávit')
-            ax.fill_between(meses, ingresos, gastos, where=[i < g for i, g in zip(ingresos, gastos)], 
-                          interpolate=True, color=self.danger_color, alpha=0.2, 
-                          label='Déficit')
-            
-            ax.set_title("Tendencias Mensuales (Últimos 12 meses)", 
-                        fontsize=16, pad=20, color=self.text_color)
-            ax.set_xlabel("Mes", fontsize=12, color=self.text_color)
-            ax.set_ylabel("Monto ($)", fontsize=12, color=self.text_color)
-            
-            ax.tick_params(axis='x', rotation=45, colors=self.text_color)
-            ax.tick_params(axis='y', colors=self.text_color)
-            ax.set_facecolor(self.card_bg)
-            ax.grid(True, axis="y", linestyle="--", alpha=0.4)
-            
-            ax.legend(loc='upper left', facecolor=self.card_bg)
-            
-            self.fig_trend.tight_layout()
-            self.canvas_trend.draw()
+            self.graficos["trend"].mostrar(tendencia, "Tendencias Mensuales (Últimos 12 meses)", pronostico)
         except Exception as ex:
             print(f"Error al generar gráfico de tendencias: {ex}")
 
-    def generate_summary_chart(self):
-        """Genera un gráfico de barras horizontal para el resumen"""
+    def generate_summary_chart(self, totals, presupuestos=()):
+        """Genera un gráfico de barras horizontal para el resumen con los presupuestos del mes"""
         try:
-            self.fig_summary.clear()
-            ax = self.fig_summary.add_subplot(111)
-            
-            totals = obtener_total_por_categoria_periodo(*calculate_period_dates("Mes"))
-            if not totals:
-                ax.text(0.5, 0.5, 'No hay datos para mostrar', 
-                       horizontalalignment='center', verticalalignment='center',
-                       transform=ax.transAxes, fontsize=12, color=self.text_color)
-                self.canvas_summary.draw()
-                return
-            
-            totals_sorted = sorted(totals, key=lambda x: x[1], reverse=True)
-            categories, amounts = zip(*totals_sorted) if totals_sorted else ([], [])
-            
-            colors = plt.cm.Pastel1(range(len(categories)))
-            
-            bars = ax.barh(categories, amounts, color=colors, edgecolor="#E5E7EB", linewidth=1)
-            ax.set_title("Gastos del Mes por Categoría", 
-                        fontsize=16, pad=20, color=self.text_color)
-            ax.set_xlabel("Monto ($)", fontsize=12, color=self.text_color)
-            
-            ax.tick_params(axis='x', colors=self.text_color)
-            ax.tick_params(axis='y', colors=self.text_color)
-            ax.set_facecolor(self.card_bg)
-            ax.grid(True, axis="x", linestyle="--", alpha=0.4)
-            
-            for bar in bars:
-                width = bar.get_width()
-                ax.text(width, bar.get_y() + bar.get_height()/2.,
-                        f'${width:.2f}', ha='left', va='center', 
-                        color=self.text_color, fontsize=10)
-            
-            self.fig_summary.tight_layout()
-            self.canvas_summary.draw()
+            totals, limites = barras_con_presupuestos(totals, presupuestos)
+            self.graficos["summary"].mostrar(totals, "Gastos del Mes por Categoría", limites)
         except Exception as ex:
             print(f"Error al generar gráfico de resumen: {ex}")
 
-    def update_financial_tips(self, balance, savings_rate):
-        """Actualiza los consejos financieros según balance y ahorros"""
+    def show_statistics(self, start, end, estadisticas):
+        """Muestra las estadísticas de gastos del período en su pestaña"""
+        lineas = [f"Estadísticas de gastos ({start} a {end})", ""]
+        if not estadisticas["cantidad"]:
+            lineas.append("No hay gastos en el período.")
+        else:
+            p = estadisticas["percentiles"]
+            lineas.append(f"Gastos registrados: {estadisticas['cantidad']}    "
+                          f"Total: ${estadisticas['total']:.2f}    "
+                          f"Promedio por gasto: ${estadisticas['promedio']:.2f}")
+            lineas.append(f"Monto por gasto: P25 ${p[25]:.2f}  |  Mediana ${p[50]:.2f}  |  "
+                          f"P75 ${p[75]:.2f}  |  P90 ${p[90]:.2f}")
+            lineas.append(f"Gasto de los últimos 30 días: ${estadisticas['movil_actual']:.2f}    "
+                          f"Máximo en 30 días: ${estadisticas['movil_maximo']:.2f} "
+                          f"(hasta {estadisticas['movil_maximo_fecha']})")
+            mayor = estadisticas["mayor_categoria_mes"]
+            if mayor:
+                lineas.append(f"Mayor gasto mensual por categoría: {mayor[0]} en {mayor[1]} (${mayor[2]:.2f})")
+            lineas += ["", "Promedio diario por día de la semana:"]
+            for dia, promedio in estadisticas["por_dia_semana"]:
+                lineas.append(f"    {dia:<12}${promedio:.2f}")
+        
+        self.stats_text.config(state=tk.NORMAL)
+        self.stats_text.delete(1.0, tk.END)
+        self.stats_text.insert(tk.END, "\n".join(lineas))
+        self.stats_text.config(state=tk.DISABLED)
+
+    def update_financial_tips(self, balance, savings_rate, pronostico=None, presupuestos=None):
+        """Actualiza los consejos financieros según balance, ahorros, pronóstico y presupuestos"""
         self.tips_text.config(state=tk.NORMAL)
         self.tips_text.delete(1.0, tk.END)
         
         tips = []
         
+        for categoria, limite, gastado in presupuestos or ():
+            if gastado > limite:
+                tips.append(f"🚨 Superaste el presupuesto de {categoria}: ${gastado:.2f} de ${limite:.2f}.")
+            elif gastado >= limite * AVISO_PRESUPUESTO:
+                tips.append(f"⏳ {categoria} usó el {gastado / limite:.0%} de su presupuesto "
+                            f"(quedan ${limite - gastado:.2f}).")
+        
         if balance < 0:
             tips.append("⚠️ Estás gastando más de lo que ganas. Considera reducir gastos no esenciales.")
         elif savings_rate < 10:
@@ -927,6 +1203,21 @@ class GastoApp:
         if savings_rate >= 20:
             tips.append("🌟 Excelente tasa de ahorro! Considera invertir parte de tus ahorros.")
         
+        if pronostico:
+            bajo, alto = pronostico["banda_mes"]
+            tips.append(f"📈 Al ritmo actual, este mes gastarías unos ${pronostico['proyeccion_mes']:.2f} "
+                        f"(entre ${bajo:.2f} y ${alto:.2f}).")
+            # Categorías cuya proyección supera en más de 20% su promedio suavizado
+            excedidas = sorted((c for c in pronostico["categorias"]
+                                if c["promedio"] > 0 and c["proyeccion"] > c["promedio"] * 1.2),
+                               key=lambda c: c["proyeccion"] / c["promedio"], reverse=True)
+            for c in excedidas[:2]:
+                exceso = (c["proyeccion"] / c["promedio"] - 1) * 100
+                tips.append(f"⚠️ {c['categoria']}: proyección de ${c['proyeccion']:.2f}, "
+                            f"un {exceso:.0f}% por encima de su promedio.")
+            tips.append(f"🔮 Gasto estimado para {pronostico['mes_siguiente']}: "
+                        f"${pronostico['siguiente_mes']:.2f}.")
+        
         tips.append("📅 Revisa tus gastos regularmente para identificar patrones.")
         tips.append("🎯 Establece metas financieras claras y alcanzables.")
         tips.append("💳 Evita deudas de alto interés, especialmente en tarjetas de crédito.")
@@ -936,27 +1227,276 @@ class GastoApp:
 
     def exportar_csv(self):
         """Exporta reportes a un archivo CSV"""
-        try:
-            periodo = self.periodo_reportes.get()
-            file_path = exportar_reportes(periodo)
-            messagebox.showinfo("Éxito", f"Reporte exportado exitosamente:\n{file_path}")
-            self.status_bar.config(text=f"Reporte exportado: {os.path.basename(file_path)}")
-        except Exception as ex:
-            messagebox.showerror("Error", f"No se pudo exportar el reporte: {ex}")
-            self.status_bar.config(text=f"Error al exportar reporte: {ex}")
+        self.exportar_archivo(self.periodo_reportes.get(), "ambos", "Reporte exportado")
 
     def exportar_datos(self, tipo):
         """Exporta datos de ingresos o gastos a CSV"""
-        try:
-            periodo = self.periodo_ing.get() if tipo == "ingresos" else self.periodo_gas.get()
-            file_path = exportar_reportes(periodo, tipo)
-            messagebox.showinfo("Éxito", f"Datos de {tipo} exportados exitosamente:\n{file_path}")
-            self.status_bar.config(text=f"{tipo.capitalize()} exportados: {os.path.basename(file_path)}")
-        except Exception as ex:
-            messagebox.showerror("Error", f"No se pudieron exportar los datos: {ex}")
-            self.status_bar.config(text=f"Error al exportar {tipo}: {ex}")
+        periodo = self.periodo_ing.get() if tipo == "ingresos" else self.periodo_gas.get()
+        self.exportar_archivo(periodo, tipo, f"{tipo.capitalize()} exportados")
+
+    def exportar_archivo(self, periodo, tipo, mensaje):
+        """Pide la ruta de destino y exporta en segundo plano mostrando el avance"""
+        ruta = filedialog.asksaveasfilename(title="Exportar CSV", defaultextension=".csv",
+                                            initialfile=ARCHIVOS_REPORTE[tipo],
+                                            filetypes=[("Archivos CSV", "*.csv"),
+                                                       ("CSV comprimido", "*.csv.gz")])
+        if not ruta:
+            return
+        
+        def progreso(filas, fraccion):
+            # Se llama desde el hilo de trabajo: la barra se actualiza en el hilo de Tk
+            self.trabajador.notificar(self.status_bar.config,
+                                      text=f"Exportando... {filas} filas ({fraccion:.0%})")
+        
+        def terminado(file_path):
+            if file_path is None:
+                messagebox.showerror("Error", "No se pudo exportar el archivo.")
+                self.status_bar.config(text=f"Error al exportar {os.path.basename(ruta)}")
+                return
+            messagebox.showinfo("Éxito", f"{mensaje} exitosamente:\n{file_path}")
+            self.status_bar.config(text=f"{mensaje}: {os.path.basename(file_path)}")
+        
+        self.status_bar.config(text=f"Exportando {os.path.basename(ruta)}...")
+        self.trabajador.enviar(("exportar", tipo),
+                               lambda: exportar_reportes(periodo, tipo, ruta, progreso=progreso),
+                               al_terminar=terminado,
+                               al_fallar=lambda ex: self.show_error("No se pudo exportar el archivo", ex))
+
+    def importar_datos(self):
+        """Importa ingresos y gastos desde un CSV exportado o un extracto bancario"""
+        ruta = filedialog.askopenfilename(title="Importar CSV",
+                                          filetypes=[("Archivos CSV", "*.csv"), ("Todos", "*.*")])
+        if not ruta:
+            return
+        formato = detectar_formato(ruta)
+        if formato is None:
+            messagebox.showerror("Error", "No se reconoce el formato del archivo.")
+            return
+        
+        def progreso(filas, fraccion):
+            # Se llama desde el hilo de trabajo: la barra se actualiza en el hilo de Tk
+            self.trabajador.notificar(self.status_bar.config,
+                                      text=f"Importando... {filas} filas ({fraccion:.0%})")
+        
+        def terminado(resultado):
+            self.mostrar_ingresos()
+            self.mostrar_gastos()
+            self.mark_dirty("todo")
+            messagebox.showinfo("Éxito", f"Se importaron {resultado['ingresos']} ingresos y "
+                                        f"{resultado['gastos']} gastos "
+                                        f"({resultado['omitidas']} filas omitidas).")
+            self.status_bar.config(text=f"Importación completada: {os.path.basename(ruta)}")
+        
+        self.status_bar.config(text=f"Importando {os.path.basename(ruta)}...")
+        self.trabajador.enviar("importar", lambda: importar_csv(ruta, formato, progreso=progreso),
+                               al_terminar=terminado,
+                               al_fallar=lambda ex: self.show_error("No se pudo importar el archivo", ex))
+
+    def editar_presupuestos(self):
+        """Abre una ventana para fijar o quitar los presupuestos de un mes"""
+        ventana = tk.Toplevel(self.root)
+        ventana.title("Presupuestos por Categoría")
+        ventana.configure(bg=self.bg_color)
+        ventana.transient(self.root)
+        
+        frame = ttk.Frame(ventana, padding=20)
+        frame.pack(fill=tk.BOTH, expand=True)
+        
+        form = ttk.Frame(frame)
+        form.pack(fill=tk.X, pady=(0, 15))
+        ttk.Label(form, text="Mes (YYYY-MM)", font=("Inter", 11)).grid(row=0, column=0, padx=5, sticky=tk.W)
+        ttk.Label(form, text="Categoría", font=("Inter", 11)).grid(row=0, column=1, padx=5, sticky=tk.W)
+        ttk.Label(form, text="Límite", font=("Inter", 11)).grid(row=0, column=2, padx=5, sticky=tk.W)
+        
+        mes = ttk.Entry(form, font=("Inter", 11), width=10)
+        mes.insert(0, datetime.now().strftime("%Y-%m"))
+        mes.grid(row=1, column=0, padx=5)
+        categoria = ttk.Combobox(form, values=CATEGORIAS, state="readonly", font=("Inter", 11), width=16)
+        categoria.set(CATEGORIAS[0])
+        categoria.grid(row=1, column=1, padx=5)
+        limite = ttk.Entry(form, font=("Inter", 11), width=12)
+        limite.grid(row=1, column=2, padx=5)
+        
+        columns = ("Categoría", "Límite", "Gastado", "Restante")
+        tabla = ttk.Treeview(frame, columns=columns, show="headings", height=8)
+        for col in columns:
+            tabla.heading(col, text=col, anchor=tk.CENTER)
+            tabla.column(col, width=120, anchor=tk.CENTER)
+        tabla.tag_configure("excedido", foreground=self.danger_color)
+        
+        def valido(texto):
+            try:
+                datetime.strptime(texto, "%Y-%m")
+                return True
+            except ValueError:
+                return False
+        
+        def cargar():
+            tabla.delete(*tabla.get_children())
+            if not valido(mes.get()):
+                return
+            for cat, lim, gastado in obtener_presupuestos(mes.get()):
+                tabla.insert("", tk.END, iid=cat, values=(cat, f"{lim:.2f}", f"{gastado:.2f}",
+                                                          f"{lim - gastado:.2f}"),
+                             tags=("excedido",) if gastado > lim else ())
+        
+        def cambiado():
+            cargar()
+            self.mark_dirty()
+        
+        def guardar():
+            if not valido(mes.get()):
+                messagebox.showerror("Error", "Formato de mes inválido (YYYY-MM).", parent=ventana)
+                return
+            if not self.validate_amount(limite.get()):
+                messagebox.showerror("Error", "Límite inválido. Debe ser un número positivo.", parent=ventana)
+                return
+            if establecer_presupuesto(categoria.get(), mes.get(), float(limite.get())):
+                limite.delete(0, tk.END)
+                cambiado()
+        
+        def eliminar():
+            for cat in tabla.selection():
+                eliminar_presupuesto(cat, mes.get())
+            cambiado()
+        
+        botones = ttk.Frame(frame)
+        ttk.Button(form, text="Guardar", style="Success.TButton", command=guardar).grid(row=1, column=3, padx=5)
+        tabla.pack(fill=tk.BOTH, expand=True)
+        botones.pack(fill=tk.X, pady=(15, 0))
+        ttk.Button(botones, text="Quitar Seleccionado", style="Danger.TButton",
+                  command=eliminar).pack(side=tk.LEFT)
+        ttk.Button(botones, text="Cerrar", style="Primary.TButton",
+                  command=ventana.destroy).pack(side=tk.RIGHT)
+        mes.bind("<KeyRelease>", lambda e: cargar())
+        cargar()
+
+    def mostrar_estadisticas_consultas(self):
+        """Abre una ventana con las consultas que más tiempo consumieron, actualizada cada 2 segundos"""
+        import Instrumentacion
+        
+        ventana = tk.Toplevel(self.root)
+        ventana.title("Estadísticas de Consultas")
+        ventana.configure(bg=self.bg_color)
+        ventana.geometry("1000x450")
+        
+        frame = ttk.Frame(ventana, padding=15)
+        frame.pack(fill=tk.BOTH, expand=True)
+        
+        columns = ("Origen", "Llamadas", "Total ms", "p95 ms", "Máx ms", "Filas", "Errores", "Consulta")
+        tabla = ttk.Treeview(frame, columns=columns, show="headings")
+        anchos = (200, 70, 80, 70, 70, 80, 60, 400)
+        for col, ancho in zip(columns, anchos):
+            tabla.heading(col, text=col, anchor=tk.CENTER)
+            tabla.column(col, width=ancho, anchor=tk.W if col in ("Origen", "Consulta") else tk.E)
+        tabla.tag_configure("errores", foreground=self.danger_color)
+        scrollbar = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=tabla.yview)
+        tabla.configure(yscrollcommand=scrollbar.set)
+        
+        def actualizar():
+            if not ventana.winfo_exists():
+                return
+            tabla.delete(*tabla.get_children())
+            for fila in Instrumentacion.estadisticas():
+                tabla.insert("", tk.END, values=(fila["origen"], fila["llamadas"], f"{fila['total_ms']:.1f}",
+                                                 f"{fila['p95_ms']:.2f}", f"{fila['maximo_ms']:.1f}",
+                                                 fila["filas"], fila["errores"], fila["sql"]),
+                             tags=("errores",) if fila["errores"] else ())
+            ventana.after(2000, actualizar)
+        
+        def reiniciar():
+            Instrumentacion.reiniciar()
+            tabla.delete(*tabla.get_children())
+        
+        botones = ttk.Frame(frame)
+        botones.pack(side=tk.BOTTOM, fill=tk.X, pady=(15, 0))
+        ttk.Button(botones, text="Reiniciar", style="Danger.TButton", command=reiniciar).pack(side=tk.LEFT)
+        ttk.Label(botones, text=f"Consultas lentas en {Instrumentacion.ruta_registro()}",
+                  font=("Inter", 10)).pack(side=tk.LEFT, padx=15)
+        ttk.Button(botones, text="Cerrar", style="Primary.TButton",
+                  command=ventana.destroy).pack(side=tk.RIGHT)
+        tabla.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        actualizar()
+
+    def respaldar_datos(self):
+        """Crea una copia de la base en segundo plano"""
+        def progreso(paginas, fraccion):
+            # Se llama desde el hilo de trabajo: la barra se actualiza en el hilo de Tk
+            self.trabajador.notificar(self.status_bar.config, text=f"Creando respaldo... ({fraccion:.0%})")
+        
+        def terminado(ruta):
+            self.bloquear_respaldos(False)
+            messagebox.showinfo("Éxito", f"Respaldo creado exitosamente:\n{ruta}")
+            self.status_bar.config(text=f"Respaldo creado: {os.path.basename(ruta)}")
+        
+        def fallo(ex):
+            self.bloquear_respaldos(False)
+            self.show_error("No se pudo crear el respaldo", ex)
+        
+        self.bloquear_respaldos(True)
+        self.status_bar.config(text="Creando respaldo...")
+        self.trabajador.enviar("respaldo", lambda: crear_respaldo(progreso=progreso),
+                               al_terminar=terminado, al_fallar=fallo)
+
+    def restaurar_datos(self):
+        """Restaura la base desde una copia elegida por el usuario"""
+        ruta = filedialog.askopenfilename(title="Restaurar Respaldo", initialdir=DIRECTORIO_RESPALDOS,
+                                          filetypes=[("Respaldos", "*.db"), ("Todos", "*.*")])
+        if not ruta:
+            return
+        if not messagebox.askyesno("Confirmar", "Se reemplazarán todos los datos actuales por los "
+                                                "del respaldo. Antes se guardará una copia del "
+                                                "estado actual. ¿Desea continuar?"):
+            return
+        
+        def progreso(paginas, fraccion):
+            self.trabajador.notificar(self.status_bar.config, text=f"Restaurando... ({fraccion:.0%})")
+        
+        def terminado(previa):
+            self.bloquear_respaldos(False)
+            self.mostrar_ingresos()
+            self.mostrar_gastos()
+            self.mark_dirty("todo")
+            messagebox.showinfo("Éxito", f"Datos restaurados desde {os.path.basename(ruta)}.\n"
+                                        f"El estado anterior se guardó en:\n{previa}")
+            self.status_bar.config(text=f"Datos restaurados: {os.path.basename(ruta)}")
+        
+        def fallo(ex):
+            self.bloquear_respaldos(False)
+            self.show_error("No se pudo restaurar el respaldo", ex)
+        
+        self.bloquear_respaldos(True)
+        self.status_bar.config(text=f"Restaurando {os.path.basename(ruta)}...")
+        self.trabajador.enviar("restauracion", lambda: restaurar_respaldo(ruta, progreso=progreso),
+                               al_terminar=terminado, al_fallar=fallo)
+
+    def bloquear_respaldos(self, bloqueados):
+        """Deshabilita (o vuelve a habilitar) los botones de respaldo y restauración"""
+        for boton in self.botones_respaldo:
+            boton.state(["disabled"] if bloqueados else ["!disabled"])
+
+def mostrar_perfil_arranque(marcas):
+    """Imprime la duración de cada fase del arranque"""
+    print(f"{'Fase':<45}{'ms':>10}{'acumulado':>12}")
+    inicio = anterior = marcas[0][1]
+    for fase, instante in marcas[1:]:
+        print(f"{fase:<45}{(instante - anterior) * 1000:>10.1f}{(instante - inicio) * 1000:>12.1f}")
+        anterior = instante
 
 if __name__ == "__main__":
     root = tk.Tk()
+    marcar("ventana Tk")
     app = GastoApp(root)
-    root.mainloop()
+    if "--profile-startup" in sys.argv and hasattr(app, "graficos"):
+        # Dibuja la ventana, mide la creación diferida de gráficos y sale
+        root.update()
+        marcar("primer dibujo de la ventana")
+        app.crear_graficos_reportes()
+        marcar("gráficos de reportes (diferido)")
+        app.crear_graficos_resumen()
+        marcar("gráfico de resumen (diferido)")
+        mostrar_perfil_arranque(_marcas)
+        app.on_close()
+    else:
+        root.mainloop()
@@ -0,0 +1,110 @@
+import calendar
+
+import numpy as np
+
+from Conexion import conexion
+from Funciones import cacheado, fecha_actual, meses_recientes, de_centavos
+
+# Meses completos de historia usados para pronosticar
+MESES_HISTORIA = 12
+
+# Peso del mes más reciente en el suavizado exponencial
+ALFA = 0.4
+
+# Desviaciones estándar a cada lado del pronóstico en la banda
+ANCHO_BANDA = 1.0
+
+def _mes_siguiente(mes):
+    """Devuelve el mes YYYY-MM posterior al dado"""
+    anio, numero = int(mes[:4]), int(mes[5:7])
+    return f"{anio + numero // 12}-{numero % 12 + 1:02d}"
+
+def _pesos(n_meses, alfa):
+    """Pesos del suavizado exponencial, del mes más antiguo al más reciente"""
+    pesos = alfa * (1 - alfa) ** np.arange(n_meses - 1, -1, -1)
+    return pesos / pesos.sum()
+
+def suavizar(matriz, alfa=ALFA):
+    """Suavizado exponencial de cada fila de una matriz (series × meses)
+
+    Devuelve (nivel, desviacion) por fila: el pronóstico del mes siguiente y
+    la dispersión ponderada de la historia alrededor de ese nivel.
+    """
+    if not matriz.shape[1]:
+        return np.zeros(matriz.shape[0]), np.zeros(matriz.shape[0])
+    pesos = _pesos(matriz.shape[1], alfa)
+    nivel = matriz @ pesos
+    desviacion = np.sqrt(((matriz - nivel[:, None]) ** 2) @ pesos)
+    return nivel, desviacion
+
+# La caché de Funciones se invalida con cada escritura, incluidas las que
+# cambian la categoría o el mes de un gasto pasado.
+@cacheado(lambda conn, meses, alfa: (tuple(meses), alfa))
+def _historia_suavizada(conn, meses, alfa):
+    """Devuelve el suavizado por categoría de los meses completos indicados"""
+    filas = conn.execute("""
+        SELECT categoria, mes, SUM(total)
+        FROM resumen_mensual
+        WHERE tipo = 'gasto' AND mes BETWEEN ? AND ?
+        GROUP BY categoria, mes
+    """, (meses[0], meses[-1])).fetchall()
+    categorias = sorted({categoria for categoria, _, _ in filas})
+    fila_de = {categoria: i for i, categoria in enumerate(categorias)}
+    columna_de = {mes: j for j, mes in enumerate(meses)}
+    matriz = np.zeros((len(categorias), len(meses)))
+    for categoria, mes, total in filas:
+        matriz[fila_de[categoria], columna_de[mes]] = de_centavos(total)
+    nivel, desviacion = suavizar(matriz, alfa)
+    return {"categorias": categorias, "nivel": nivel, "desviacion": desviacion}
+
+def pronosticar_gastos(n_meses=MESES_HISTORIA, alfa=ALFA, hoy=None):
+    """Proyecta el gasto del mes en curso por categoría y el total del mes siguiente
+
+    La proyección del mes suma lo ya gastado y la parte del pronóstico que
+    corresponde a los días que faltan. El mes siguiente se pronostica
+    suavizando la historia junto con esa proyección. Devuelve un diccionario
+    con las categorías, los totales y sus bandas (bajo, alto).
+    """
+    hoy = hoy or fecha_actual()
+    mes_actual = f"{hoy.year}-{hoy.month:02d}"
+    dias_mes = calendar.monthrange(hoy.year, hoy.month)[1]
+    restante = (dias_mes - hoy.day) / dias_mes
+    meses = meses_recientes(n_meses + 1, hoy)[:-1]
+
+    with conexion() as conn:
+        historia = _historia_suavizada(conn, meses, alfa)
+        gastado = {categoria: de_centavos(total) for categoria, total in conn.execute("""
+            SELECT categoria, SUM(total)
+            FROM resumen_mensual
+            WHERE tipo = 'gasto' AND mes = ?
+            GROUP BY categoria
+        """, (mes_actual,))}
+
+    categorias = sorted(set(historia["categorias"]) | set(gastado))
+    n = len(categorias)
+    nivel, desviacion = np.zeros(n), np.zeros(n)
+    indices = [categorias.index(c) for c in historia["categorias"]]
+    nivel[indices] = historia["nivel"]
+    desviacion[indices] = historia["desviacion"]
+    actual = np.array([gastado.get(c, 0.0) for c in categorias])
+
+    proyeccion = actual + nivel * restante
+    siguiente = alfa * proyeccion + (1 - alfa) * nivel
+    # Las desviaciones por categoría se combinan como independientes
+    banda_mes = ANCHO_BANDA * np.sqrt((desviacion ** 2).sum()) * restante
+    banda_siguiente = ANCHO_BANDA * np.sqrt((desviacion ** 2).sum())
+    total_mes, total_siguiente = float(proyeccion.sum()), float(siguiente.sum())
+
+    return {
+        "mes": mes_actual,
+        "mes_siguiente": _mes_siguiente(mes_actual),
+        "categorias": [
+            {"categoria": c, "gastado": float(a), "proyeccion": float(p), "promedio": float(l),
+             "siguiente": float(s)}
+            for c, a, p, l, s in zip(categorias, actual, proyeccion, nivel, siguiente)
+        ],
+        "proyeccion_mes": total_mes,
+        "banda_mes": (max(total_mes - banda_mes, float(actual.sum())), total_mes + banda_mes),
+        "siguiente_mes": total_siguiente,
+        "banda_siguiente": (max(total_siguiente - banda_siguiente, 0.0), total_siguiente + banda_siguiente),
+    }
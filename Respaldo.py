@@ -0,0 +1,148 @@
+import os
+import sqlite3
+import sys
+from datetime import datetime
+
+from BD import MIGRACIONES, migrate, schema_version
+from Conexion import ruta_actual, TIMEOUT
+from Funciones import invalidar_cache
+
+# Carpeta donde se guardan las copias con fecha y hora
+DIRECTORIO_RESPALDOS = os.path.join("MGF", "respaldos")
+
+# Copias que se conservan al rotar; las más antiguas se eliminan
+MAXIMO_RESPALDOS = 10
+
+# Páginas copiadas por paso y segundos de pausa entre pasos. Entre un paso y
+# otro la base queda libre, así la aplicación puede seguir escribiendo.
+PAGINAS_POR_PASO = 256
+PAUSA = 0.005
+
+PREFIJO = "gastos-"
+EXTENSION = ".db"
+
+# Tablas que debe tener una copia para poder restaurarla
+TABLAS_REQUERIDAS = {"ingresos", "gastos"}
+
+def _avance(progreso):
+    """Adapta progreso(paginas, fraccion) a la firma que usa Connection.backup"""
+    if progreso is None:
+        return None
+    return lambda estado, restantes, total: progreso(total - restantes, (total - restantes) / (total or 1))
+
+def crear_respaldo(directorio=DIRECTORIO_RESPALDOS, conservar=MAXIMO_RESPALDOS,
+                   paginas=PAGINAS_POR_PASO, pausa=PAUSA, progreso=None):
+    """Copia la base en uso a un archivo con fecha y hora y devuelve su ruta
+
+    La copia se hace por pasos con Connection.backup sobre una instantánea de
+    la base, por lo que puede correr mientras la aplicación sigue escribiendo.
+    Se escribe primero en un archivo temporal que solo se renombra una vez
+    validado. progreso(paginas, fraccion) se llama tras cada paso.
+    """
+    os.makedirs(directorio, exist_ok=True)
+    nombre = f"{PREFIJO}{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}{EXTENSION}"
+    destino = os.path.join(directorio, nombre)
+    temporal = destino + ".tmp"
+
+    # La conexión de origen mantiene abierta una transacción de lectura: en modo
+    # WAL eso fija una instantánea, y las escrituras de otras conexiones no
+    # reinician la copia en cada paso
+    origen = sqlite3.connect(ruta_actual(), timeout=TIMEOUT, isolation_level=None)
+    copia = sqlite3.connect(temporal)
+    try:
+        try:
+            origen.execute("BEGIN")
+            origen.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+            origen.backup(copia, pages=paginas, progress=_avance(progreso), sleep=pausa)
+            # La copia hereda el modo WAL; se deja como un único archivo autocontenido
+            copia.execute("PRAGMA journal_mode=DELETE")
+        finally:
+            copia.close()
+            origen.close()
+        validar_respaldo(temporal)
+        os.replace(temporal, destino)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+
+    if conservar:
+        rotar_respaldos(directorio, conservar)
+    return destino
+
+def listar_respaldos(directorio=DIRECTORIO_RESPALDOS):
+    """Devuelve las rutas de las copias existentes, de la más reciente a la más antigua"""
+    if not os.path.isdir(directorio):
+        return []
+    nombres = [n for n in os.listdir(directorio) if n.startswith(PREFIJO) and n.endswith(EXTENSION)]
+    # El nombre lleva la fecha y hora, así que el orden alfabético es cronológico
+    return [os.path.join(directorio, n) for n in sorted(nombres, reverse=True)]
+
+def rotar_respaldos(directorio=DIRECTORIO_RESPALDOS, conservar=MAXIMO_RESPALDOS):
+    """Elimina las copias más antiguas dejando solo las últimas 'conservar'"""
+    eliminadas = listar_respaldos(directorio)[conservar:]
+    for ruta in eliminadas:
+        os.remove(ruta)
+    return eliminadas
+
+def validar_respaldo(ruta):
+    """Verifica que el archivo sea una copia íntegra y restaurable; lanza ValueError si no"""
+    if not os.path.isfile(ruta):
+        raise ValueError(f"No existe la copia {ruta}")
+    try:
+        conn = sqlite3.connect(f"file:{ruta}?mode=ro", uri=True)
+    except sqlite3.Error as ex:
+        raise ValueError(f"No se puede abrir la copia {ruta}: {ex}")
+    try:
+        resultado = conn.execute("PRAGMA integrity_check").fetchone()[0]
+        if resultado != "ok":
+            raise ValueError(f"La copia {ruta} está dañada: {resultado}")
+        tablas = {fila[0] for fila in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        faltantes = TABLAS_REQUERIDAS - tablas
+        if faltantes:
+            raise ValueError(f"A la copia {ruta} le faltan tablas: {', '.join(sorted(faltantes))}")
+        version = schema_version(conn)
+        if version > len(MIGRACIONES):
+            raise ValueError(f"La copia {ruta} es de una versión más nueva del esquema ({version})")
+        return version
+    except sqlite3.DatabaseError as ex:
+        raise ValueError(f"La copia {ruta} no es una base de datos válida: {ex}")
+    finally:
+        conn.close()
+
+def restaurar_respaldo(ruta, directorio=DIRECTORIO_RESPALDOS, paginas=PAGINAS_POR_PASO,
+                       pausa=PAUSA, progreso=None):
+    """Reemplaza el contenido de la base en uso por el de una copia validada
+
+    Antes de restaurar se guarda una copia del estado actual, cuya ruta se
+    devuelve. Si la copia es de un esquema anterior se migra al vigente.
+    """
+    validar_respaldo(ruta)
+    # Se rota al final para no borrar la copia que se está restaurando
+    previa = crear_respaldo(directorio, conservar=None)
+
+    origen = sqlite3.connect(f"file:{ruta}?mode=ro", uri=True)
+    destino = sqlite3.connect(ruta_actual(), timeout=TIMEOUT)
+    try:
+        origen.backup(destino, pages=paginas, progress=_avance(progreso), sleep=pausa)
+        migrate(destino)
+    finally:
+        origen.close()
+        destino.close()
+    invalidar_cache()
+    rotar_respaldos(directorio)
+    return previa
+
+if __name__ == "__main__":
+    orden = sys.argv[1] if len(sys.argv) > 1 else "crear"
+    if orden == "crear":
+        print(f"Copia creada en {crear_respaldo()}")
+    elif orden == "listar":
+        for ruta in listar_respaldos():
+            print(ruta)
+    elif orden == "restaurar" and len(sys.argv) > 2:
+        previa = restaurar_respaldo(sys.argv[2])
+        print(f"Base restaurada desde {sys.argv[2]} (estado anterior guardado en {previa})")
+    else:
+        print("Uso: python Respaldo.py [crear | listar | restaurar <copia>]")
+        sys.exit(1)
@@ -0,0 +1,343 @@
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from Conexion import configurar_ruta, cerrar_todas
+from Funciones import (agregar_ingreso, agregar_gasto, agregar_ingresos_lote, agregar_gastos_lote,
+                       obtener_ingresos_pagina, obtener_gastos_pagina, obtener_resumen_periodo,
+                       obtener_total_por_categoria_periodo, obtener_tendencia_mensual,
+                       exportar_reportes, calculate_period_dates, meses_recientes, version_datos, a_centavos,
+                       TAMANO_PAGINA, ARCHIVOS_REPORTE)
+
+# Por defecto solo escucha en este equipo; con --host 0.0.0.0 queda visible en la red local
+HOST = "127.0.0.1"
+PUERTO = 8765
+
+# Hilos que atienden pedidos. Cada uno conserva su propia conexión a la base
+# (Conexion la guarda por hilo), así que no se abre una por pedido.
+HILOS = 8
+
+# Tamaño máximo del cuerpo de un POST y respuesta mínima que vale la pena comprimir
+MAXIMO_CUERPO = 1024 * 1024
+MINIMO_GZIP = 1024
+
+PERIODOS = ("Hoy", "Semana", "Mes", "Año", "Todos")
+TIPOS_EXPORTACION = ("ingresos", "gastos", "ambos")
+
+# Los ETag llevan la generación de la caché de Funciones, que vuelve a cero al
+# reiniciar; el instante de arranque evita que se repitan entre ejecuciones.
+_ARRANQUE = f"{time.time_ns():x}"
+
+class ErrorPedido(Exception):
+    """Pedido inválido; se responde con el estado y el mensaje indicados"""
+    def __init__(self, mensaje, estado=HTTPStatus.BAD_REQUEST):
+        super().__init__(mensaje)
+        self.estado = estado
+
+def _fecha(valor):
+    """Valida una fecha YYYY-MM-DD"""
+    try:
+        return date.fromisoformat(str(valor)).isoformat()
+    except ValueError:
+        raise ErrorPedido(f"Fecha inválida: {valor!r} (se espera YYYY-MM-DD)")
+
+def _monto(valor):
+    """Valida que el monto sea un número positivo y que quepa en centavos"""
+    if isinstance(valor, bool):
+        raise ErrorPedido(f"Monto inválido: {valor!r}")
+    try:
+        monto = float(valor)
+    except (TypeError, ValueError):
+        raise ErrorPedido(f"Monto inválido: {valor!r}")
+    try:
+        a_centavos(monto)
+    except ValueError:
+        monto = -1
+    if not monto >= 0:
+        raise ErrorPedido(f"Monto inválido: {valor!r}")
+    return monto
+
+def _texto(movimiento, campo, defecto=""):
+    """Lee un campo de texto opcional de un movimiento"""
+    valor = movimiento.get(campo, defecto)
+    if valor is None:
+        return defecto
+    if not isinstance(valor, str):
+        raise ErrorPedido(f"El campo {campo} debe ser texto")
+    return valor
+
+def _fila_ingreso(movimiento):
+    """Convierte un ingreso recibido en JSON en la tupla que usa Funciones"""
+    if not isinstance(movimiento, dict):
+        raise ErrorPedido("Cada ingreso debe ser un objeto")
+    return (_fecha(movimiento.get("fecha")), _monto(movimiento.get("monto")),
+            _texto(movimiento, "descripcion"), _texto(movimiento, "usuario", "Familia"),
+            _texto(movimiento, "notas"))
+
+def _fila_gasto(movimiento):
+    """Convierte un gasto recibido en JSON en la tupla que usa Funciones"""
+    if not isinstance(movimiento, dict):
+        raise ErrorPedido("Cada gasto debe ser un objeto")
+    categoria = _texto(movimiento, "categoria")
+    if not categoria:
+        raise ErrorPedido("Falta la categoría del gasto")
+    return (_fecha(movimiento.get("fecha")), categoria, _monto(movimiento.get("monto")),
+            _texto(movimiento, "descripcion"), _texto(movimiento, "usuario", "Familia"),
+            _texto(movimiento, "notas"))
+
+# Por tipo de movimiento: (convertir, agregar uno, agregar lote, página, columnas de la página)
+MOVIMIENTOS = {
+    "ingresos": (_fila_ingreso, agregar_ingreso, agregar_ingresos_lote, obtener_ingresos_pagina,
+                 ("id", "fecha", "monto", "descripcion", "usuario")),
+    "gastos": (_fila_gasto, agregar_gasto, agregar_gastos_lote, obtener_gastos_pagina,
+               ("id", "fecha", "categoria", "monto", "descripcion", "usuario")),
+}
+
+class ServidorGastos(ThreadingHTTPServer):
+    """Servidor HTTP que atiende los pedidos con un grupo fijo de hilos
+
+    ThreadingHTTPServer crea un hilo por pedido; aquí los hilos se reutilizan
+    para que cada uno conserve su conexión a la base entre pedidos.
+    """
+    def __init__(self, direccion, hilos=HILOS):
+        super().__init__(direccion, ManejadorGastos)
+        self.grupo = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="servidor")
+
+    def process_request(self, request, client_address):
+        self.grupo.submit(self.process_request_thread, request, client_address)
+
+    def server_close(self):
+        super().server_close()
+        self.grupo.shutdown(wait=True)
+        cerrar_todas()
+
+class ManejadorGastos(BaseHTTPRequestHandler):
+    """Atiende la API JSON sobre las funciones de Funciones
+
+    GET  /ingresos, /gastos   página de movimientos (periodo, despues=fecha,id, limite)
+    POST /ingresos, /gastos   agrega un movimiento o una lista de ellos
+    GET  /resumen             totales y gastos por categoría de un período (con ETag)
+    GET  /tendencia           ingresos y gastos de los últimos meses (con ETag)
+    GET  /exportar            CSV de un período (periodo, tipo)
+    """
+    server_version = "GastoApp"
+
+    def do_GET(self):
+        self.atender(self.rutas_get)
+
+    def do_POST(self):
+        self.atender(self.rutas_post)
+
+    rutas_get = {
+        "/ingresos": "listar",
+        "/gastos": "listar",
+        "/resumen": "resumen",
+        "/tendencia": "tendencia",
+        "/exportar": "exportar",
+    }
+    rutas_post = {
+        "/ingresos": "agregar",
+        "/gastos": "agregar",
+    }
+
+    def atender(self, rutas):
+        """Resuelve la ruta y responde los errores del pedido en JSON"""
+        url = urlsplit(self.path)
+        self.ruta = url.path.rstrip("/") or "/"
+        self.parametros = {clave: valores[-1] for clave, valores in parse_qs(url.query).items()}
+        try:
+            metodo = rutas.get(self.ruta)
+            if metodo is None:
+                raise ErrorPedido(f"Ruta desconocida: {self.ruta}", HTTPStatus.NOT_FOUND)
+            getattr(self, metodo)()
+        except ErrorPedido as ex:
+            self.enviar_json({"error": str(ex)}, ex.estado)
+        except Exception as ex:
+            self.log_error("Error al atender %s: %r", self.path, ex)
+            self.enviar_json({"error": "Error interno del servidor"}, HTTPStatus.INTERNAL_SERVER_ERROR)
+
+    def periodo(self, defecto="Todos"):
+        periodo = self.parametros.get("periodo", defecto)
+        if periodo not in PERIODOS:
+            raise ErrorPedido(f"Período inválido: {periodo!r} (opciones: {', '.join(PERIODOS)})")
+        return periodo
+
+    def entero(self, nombre, defecto, minimo, maximo):
+        try:
+            valor = int(self.parametros.get(nombre, defecto))
+        except ValueError:
+            raise ErrorPedido(f"El parámetro {nombre} debe ser un número entero")
+        return max(minimo, min(valor, maximo))
+
+    def acepta_gzip(self):
+        return "gzip" in self.headers.get("Accept-Encoding", "")
+
+    def enviar(self, cuerpo, tipo, estado=HTTPStatus.OK, etag=None):
+        """Envía un cuerpo en memoria, comprimido si el cliente lo acepta"""
+        comprimido = len(cuerpo) >= MINIMO_GZIP and self.acepta_gzip()
+        if comprimido:
+            cuerpo = gzip.compress(cuerpo, compresslevel=6)
+        self.send_response(estado)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.send_header("Vary", "Accept-Encoding")
+        if comprimido:
+            self.send_header("Content-Encoding", "gzip")
+        if etag:
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def enviar_json(self, datos, estado=HTTPStatus.OK, etag=None):
+        cuerpo = json.dumps(datos, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        self.enviar(cuerpo, "application/json; charset=utf-8", estado, etag)
+
+    def con_etag(self, *clave):
+        """Devuelve el ETag de la respuesta, o None si el cliente ya la tiene y se respondió 304
+
+        El ETag depende de la versión de los datos y no del cuerpo, así que se
+        calcula sin consultar la base.
+        """
+        version = version_datos()
+        resumen = hashlib.sha1(repr((self.ruta, clave)).encode("utf-8")).hexdigest()[:12]
+        etag = f'"{_ARRANQUE}-{version}-{resumen}"'
+        if etag in (e.strip() for e in self.headers.get("If-None-Match", "").split(",")):
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header("ETag", etag)
+            self.send_header("Vary", "Accept-Encoding")
+            self.end_headers()
+            return None
+        return etag
+
+    def leer_json(self):
+        try:
+            largo = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            raise ErrorPedido("Content-Length inválido")
+        if largo > MAXIMO_CUERPO:
+            raise ErrorPedido("El cuerpo del pedido es demasiado grande", HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+        try:
+            return json.loads(self.rfile.read(largo) or b"null")
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            raise ErrorPedido("El cuerpo no es JSON válido")
+
+    def listar(self):
+        tipo = self.ruta[1:]
+        _, _, _, pagina, columnas = MOVIMIENTOS[tipo]
+        despues = self.parametros.get("despues")
+        if despues is not None:
+            try:
+                fecha, ultimo_id = despues.rsplit(",", 1)
+                despues = (_fecha(fecha), int(ultimo_id))
+            except ValueError:
+                raise ErrorPedido("despues debe tener la forma YYYY-MM-DD,id")
+        limite = self.entero("limite", TAMANO_PAGINA, 1, 10 * TAMANO_PAGINA)
+        filas = pagina(self.periodo(), despues, limite)
+        siguiente = f"{filas[-1][1]},{filas[-1][0]}" if len(filas) == limite else None
+        self.enviar_json({"movimientos": [dict(zip(columnas, fila)) for fila in filas],
+                          "siguiente": siguiente})
+
+    def agregar(self):
+        tipo = self.ruta[1:]
+        convertir, agregar_uno, agregar_lote, _, _ = MOVIMIENTOS[tipo]
+        datos = self.leer_json()
+        if isinstance(datos, list):
+            filas = [convertir(movimiento) for movimiento in datos]
+            cantidad = agregar_lote(filas) if filas else 0
+            if cantidad is None or cantidad is False:
+                raise ErrorPedido(f"No se pudieron guardar los {tipo}", HTTPStatus.INTERNAL_SERVER_ERROR)
+            self.enviar_json({"agregados": cantidad}, HTTPStatus.CREATED)
+        else:
+            nuevo_id = agregar_uno(*convertir(datos))
+            if nuevo_id is None:
+                raise ErrorPedido("No se pudo guardar el movimiento", HTTPStatus.INTERNAL_SERVER_ERROR)
+            self.enviar_json({"id": nuevo_id}, HTTPStatus.CREATED)
+
+    def resumen(self):
+        periodo = self.periodo("Mes")
+        inicio, fin = calculate_period_dates(periodo)
+        etag = self.con_etag(inicio, fin)
+        if etag is None:
+            return
+        resumen = obtener_resumen_periodo(periodo)
+        categorias = obtener_total_por_categoria_periodo(inicio, fin)
+        self.enviar_json(dict(resumen, periodo=periodo, inicio=inicio, fin=fin,
+                              categorias=[{"categoria": c, "total": t} for c, t in categorias]),
+                         etag=etag)
+
+    def tendencia(self):
+        n_meses = self.entero("meses", 12, 1, 120)
+        etag = self.con_etag(tuple(meses_recientes(n_meses)))
+        if etag is None:
+            return
+        self.enviar_json([{"mes": mes, "ingresos": ingresos, "gastos": gastos}
+                          for mes, ingresos, gastos in obtener_tendencia_mensual(n_meses)],
+                         etag=etag)
+
+    def exportar(self):
+        """Exporta con exportar_reportes a un temporal y lo envía por bloques
+
+        Si el cliente acepta gzip el archivo se escribe ya comprimido y se envía
+        tal cual, sin volver a comprimirlo.
+        """
+        periodo = self.periodo()
+        tipo = self.parametros.get("tipo", "ambos")
+        if tipo not in TIPOS_EXPORTACION:
+            raise ErrorPedido(f"Tipo inválido: {tipo!r} (opciones: {', '.join(TIPOS_EXPORTACION)})")
+        comprimido = self.acepta_gzip()
+        descriptor, temporal = tempfile.mkstemp(suffix=".csv.gz" if comprimido else ".csv")
+        os.close(descriptor)
+        try:
+            if exportar_reportes(periodo, tipo, temporal, comprimir=comprimido) is None:
+                raise ErrorPedido("No se pudo generar el reporte", HTTPStatus.INTERNAL_SERVER_ERROR)
+            self.send_response(HTTPStatus.OK)
+            self.send_header("Content-Type", "text/csv; charset=utf-8")
+            self.send_header("Content-Length", str(os.path.getsize(temporal)))
+            self.send_header("Content-Disposition", f'attachment; filename="{ARCHIVOS_REPORTE[tipo]}"')
+            self.send_header("Vary", "Accept-Encoding")
+            if comprimido:
+                self.send_header("Content-Encoding", "gzip")
+            self.end_headers()
+            with open(temporal, "rb") as f:
+                try:
+                    while bloque := f.read(64 * 1024):
+                        self.wfile.write(bloque)
+                except ConnectionError:
+                    # El cliente cortó la descarga; ya no se le puede responder
+                    self.close_connection = True
+        finally:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+
+def iniciar(host=HOST, puerto=PUERTO, hilos=HILOS, ruta=None):
+    """Crea el servidor listo para serve_forever()"""
+    if ruta:
+        configurar_ruta(ruta)
+    return ServidorGastos((host, puerto), hilos)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="API JSON de GastoApp para varios equipos del hogar")
+    parser.add_argument("--host", default=HOST, help="dirección donde escuchar (0.0.0.0 para la red local)")
+    parser.add_argument("--puerto", type=int, default=PUERTO)
+    parser.add_argument("--hilos", type=int, default=HILOS)
+    parser.add_argument("--base", help="ruta de la base de datos (por defecto la de la aplicación)")
+    argumentos = parser.parse_args()
+
+    servidor = iniciar(argumentos.host, argumentos.puerto, argumentos.hilos, argumentos.base)
+    print(f"Servidor de GastoApp en http://{argumentos.host}:{argumentos.puerto}")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
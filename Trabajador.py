@@ -0,0 +1,123 @@
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+class Trabajador:
+    """Ejecuta funciones en hilos aparte y entrega los resultados en el hilo de Tk
+
+    Cada solicitud lleva una clave; al enviar otra con la misma clave, la
+    anterior queda obsoleta y su resultado se descarta. Los resultados y
+    notificaciones se entregan con root.after, nunca desde el hilo de trabajo.
+    """
+
+    def __init__(self, root, hilos=2, intervalo=30):
+        self.root = root
+        self.intervalo = intervalo
+        self._pool = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="trabajador")
+        self._cola = queue.Queue()
+        self._versiones = {}
+        self._futuros = {}
+        self._retrasos = {}
+        self._activas = 0
+        self._sondeando = False
+        self._cerrado = False
+        # Se llama con la cantidad de tareas activas cada vez que cambia
+        self.al_cambiar_actividad = None
+
+    def enviar(self, clave, funcion, *args, al_terminar=None, al_fallar=None):
+        """Ejecuta funcion(*args) en segundo plano y pasa el resultado a al_terminar"""
+        if self._cerrado:
+            return
+        version = self._versiones.get(clave, 0) + 1
+        self._versiones[clave] = version
+        anterior = self._futuros.get(clave)
+        if anterior is not None and anterior.cancel():
+            self._cambiar_actividad(-1)
+        self._futuros[clave] = self._pool.submit(
+            self._ejecutar, clave, version, funcion, args, al_terminar, al_fallar)
+        self._cambiar_actividad(1)
+        self._sondear()
+
+    def cancelar(self, clave):
+        """Descarta la solicitud en curso de una clave"""
+        self._versiones[clave] = self._versiones.get(clave, 0) + 1
+        futuro = self._futuros.pop(clave, None)
+        if futuro is not None and futuro.cancel():
+            self._cambiar_actividad(-1)
+
+    def retrasar(self, clave, milisegundos, funcion, *args):
+        """Llama a funcion(*args) cuando pasan los milisegundos sin otra llamada con la misma clave"""
+        pendiente = self._retrasos.pop(clave, None)
+        if pendiente is not None:
+            self.root.after_cancel(pendiente)
+
+        def disparar():
+            self._retrasos.pop(clave, None)
+            funcion(*args)
+
+        self._retrasos[clave] = self.root.after(milisegundos, disparar)
+
+    def notificar(self, funcion, *args, **kwargs):
+        """Programa funcion en el hilo de Tk; se puede llamar desde cualquier hilo"""
+        self._cola.put((None, None, lambda: funcion(*args, **kwargs), None, None))
+
+    def ocupado(self):
+        """Indica si hay tareas pendientes o en curso"""
+        return self._activas > 0
+
+    def cerrar(self):
+        """Detiene los hilos de trabajo descartando las tareas pendientes"""
+        self._cerrado = True
+        for pendiente in self._retrasos.values():
+            self.root.after_cancel(pendiente)
+        self._retrasos.clear()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _ejecutar(self, clave, version, funcion, args, al_terminar, al_fallar):
+        """Corre en el hilo de trabajo y deja el resultado en la cola"""
+        if self._versiones.get(clave) != version:
+            self._cola.put((clave, None, None, None, None))
+            return
+        try:
+            resultado, error = funcion(*args), None
+        except Exception as ex:
+            resultado, error = None, ex
+        self._cola.put((clave, version, resultado, error, (al_terminar, al_fallar)))
+
+    def _cambiar_actividad(self, cambio):
+        """Lleva la cuenta de tareas activas y avisa al interesado"""
+        self._activas = max(self._activas + cambio, 0)
+        if self.al_cambiar_actividad:
+            self.al_cambiar_actividad(self._activas)
+
+    def _sondear(self):
+        """Inicia el sondeo de la cola si no está en marcha"""
+        if not self._sondeando:
+            self._sondeando = True
+            self.root.after(self.intervalo, self._entregar)
+
+    def _entregar(self):
+        """Entrega en el hilo de Tk los resultados que hayan llegado"""
+        while True:
+            try:
+                clave, version, resultado, error, callbacks = self._cola.get_nowait()
+            except queue.Empty:
+                break
+            if clave is None:
+                # Notificación enviada con notificar()
+                resultado()
+                continue
+            self._cambiar_actividad(-1)
+            if version is None or self._versiones.get(clave) != version:
+                continue  # Solicitud obsoleta
+            self._futuros.pop(clave, None)
+            al_terminar, al_fallar = callbacks
+            if error is not None:
+                if al_fallar:
+                    al_fallar(error)
+            elif al_terminar:
+                al_terminar(resultado)
+
+        if self._activas > 0 or not self._cola.empty():
+            self.root.after(self.intervalo, self._entregar)
+        else:
+            self._sondeando = False
@@ -0,0 +1,70 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+import urllib.error
+import urllib.request
+
+import Conexion
+import Servidor
+
+CONSOLA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Consola.py")
+
+class ServidorTest(unittest.TestCase):
+    def setUp(self):
+        self.directorio = tempfile.TemporaryDirectory()
+        self.ruta = os.path.join(self.directorio.name, "gastos.db")
+        self.servidores = []
+
+    def tearDown(self):
+        for servidor in self.servidores:
+            servidor.shutdown()
+            servidor.server_close()
+        Conexion.cerrar_todas()
+        self.directorio.cleanup()
+
+    def arrancar(self):
+        """Arranca un servidor nuevo, con su propio grupo de hilos, y devuelve su URL"""
+        servidor = Servidor.iniciar(puerto=0, ruta=self.ruta)
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+        self.servidores.append(servidor)
+        return f"http://127.0.0.1:{servidor.server_address[1]}"
+
+    def pedir(self, url, datos=None, encabezados=None):
+        """Devuelve (estado, encabezados, cuerpo) sin lanzar excepciones por estados HTTP"""
+        cuerpo = None if datos is None else json.dumps(datos).encode()
+        pedido = urllib.request.Request(url, cuerpo, dict(encabezados or {}, **{"Content-Type": "application/json"}))
+        try:
+            with urllib.request.urlopen(pedido) as respuesta:
+                return respuesta.status, respuesta.headers, respuesta.read()
+        except urllib.error.HTTPError as ex:
+            return ex.code, ex.headers, ex.read()
+
+    def test_etag_cambia_tras_escritura_de_otro_proceso(self):
+        url = self.arrancar()
+        estado, encabezados, _ = self.pedir(url + "/resumen?periodo=Todos")
+        self.assertEqual(estado, 200)
+        etag = encabezados["ETag"]
+
+        subprocess.run([sys.executable, CONSOLA, "--base", self.ruta, "gasto", "Otros", "12.50",
+                        "--fecha", "2024-05-01"], check=True, capture_output=True)
+
+        # Un servidor nuevo atiende con un hilo que todavía no consultó la base
+        estado, encabezados, cuerpo = self.pedir(self.arrancar() + "/resumen?periodo=Todos",
+                                                 encabezados={"If-None-Match": etag})
+        self.assertEqual(estado, 200)
+        self.assertNotEqual(encabezados["ETag"], etag)
+        self.assertEqual(json.loads(cuerpo)["gastos"], 12.5)
+
+    def test_monto_no_finito_es_rechazado(self):
+        url = self.arrancar()
+        for monto in ("inf", "nan", "-inf", "1e400", float("inf"), float("nan"), 1e30, 1e17):
+            estado, _, cuerpo = self.pedir(url + "/gastos", {"fecha": "2024-05-01", "categoria": "Otros",
+                                                             "monto": monto})
+            self.assertEqual(estado, 400, (monto, cuerpo))
+
+if __name__ == "__main__":
+    unittest.main()